@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# Builds fingerprinted, precompressed copies of the files in `printapp/static`.
+#
+# Each file is copied to `printapp/static/build` with a digest of its contents
+# in its name, e.g. `css/style.css` becomes `build/css/style.1a2b3c4d5e.css`,
+# along with gzip (and brotli, if the `brotli` package is installed) variants.
+# References to other static files from CSS and JavaScript are rewritten to
+# the fingerprinted names. `build/manifest.json` maps the original paths to
+# the fingerprinted ones; the templates look them up with `asset_url`.
+#
+# Run it after changing any static file, then restart the app.
+
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import sys
+from StringIO import StringIO
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'printapp', 'static')
+BUILD_DIR = 'build'
+MANIFEST_NAME = 'manifest.json'
+DIGEST_LENGTH = 10
+
+# Files which may refer to other static files. They are built last, once
+# the names of the files they refer to are known.
+_REFERRING_EXTENSIONS = ('.css', '.js')
+# Formats which are already compressed are not worth compressing again.
+_INCOMPRESSIBLE_EXTENSIONS = ('.woff', '.woff2', '.png', '.jpg', '.gif')
+# Variants smaller than this fraction of the original are kept.
+_MIN_COMPRESSION_RATIO = 0.9
+
+_CSS_URL_PATTERN = re.compile(r'''url\((['"]?)([^'"()]+)\1\)''')
+_STATIC_PATH_PATTERN = re.compile(r'''(['"])static/([^'"?#]+)\1''')
+
+
+def build(static_dir=STATIC_DIR):
+    """Builds every static file, returning the manifest."""
+    build_dir = os.path.join(static_dir, BUILD_DIR)
+    if os.path.isdir(build_dir):
+        shutil.rmtree(build_dir)
+
+    paths = sorted(_find_static_files(static_dir))
+    paths.sort(key=lambda path: path.endswith(_REFERRING_EXTENSIONS))
+    manifest = {}
+    for path in paths:
+        with open(os.path.join(static_dir, *path.split('/')), 'rb') as f:
+            content = f.read()
+        if path.endswith('.css'):
+            content = _rewrite_css_urls(content, path, manifest)
+        if path.endswith(_REFERRING_EXTENSIONS):
+            content = _rewrite_static_paths(content, manifest)
+        manifest[path] = _write_asset(build_dir, path, content)
+
+    with open(os.path.join(build_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def _find_static_files(static_dir):
+    """Yields the paths, relative to `static_dir` and with forward slashes,
+    of the files to build.
+    """
+    for directory, subdirectories, filenames in os.walk(static_dir):
+        relative_dir = os.path.relpath(directory, static_dir)
+        if relative_dir == '.':
+            relative_dir = ''
+            subdirectories[:] = [name for name in subdirectories
+                                 if name != BUILD_DIR]
+        for filename in filenames:
+            if filename.startswith('.'):
+                continue
+            yield posixpath.join(relative_dir.replace(os.sep, '/'), filename)
+
+
+def _write_asset(build_dir, path, content):
+    """Writes the fingerprinted file and its compressed variants, returning
+    the fingerprinted path relative to the static folder.
+    """
+    digest = hashlib.md5(content).hexdigest()[:DIGEST_LENGTH]
+    root, extension = posixpath.splitext(path)
+    built_path = posixpath.join(BUILD_DIR,
+                                '{}.{}{}'.format(root, digest, extension))
+    filename = os.path.join(os.path.dirname(build_dir), *built_path.split('/'))
+    if not os.path.isdir(os.path.dirname(filename)):
+        os.makedirs(os.path.dirname(filename))
+    with open(filename, 'wb') as f:
+        f.write(content)
+
+    if extension.lower() not in _INCOMPRESSIBLE_EXTENSIONS:
+        _write_variant(filename + '.gz', content, _gzip(content))
+        if brotli is not None:
+            _write_variant(filename + '.br', content, brotli.compress(content))
+    return built_path
+
+
+def _write_variant(filename, content, compressed):
+    if len(compressed) < len(content) * _MIN_COMPRESSION_RATIO:
+        with open(filename, 'wb') as f:
+            f.write(compressed)
+
+
+def _gzip(content):
+    # A fixed mtime keeps the output the same between builds.
+    buf = StringIO()
+    with gzip.GzipFile(filename='', mode='wb', fileobj=buf, compresslevel=9,
+                       mtime=0) as f:
+        f.write(content)
+    return buf.getvalue()
+
+
+def _rewrite_css_urls(content, path, manifest):
+    """Points relative url(...) references in a stylesheet at the
+    fingerprinted files.
+    """
+    css_dir = posixpath.dirname(path)
+    built_css_dir = posixpath.join(BUILD_DIR, css_dir)
+
+    def replace(match):
+        quote, url = match.groups()
+        if ':' in url or url.startswith('/'):
+            return match.group(0)
+        target, suffix = _split_url_suffix(url)
+        target = posixpath.normpath(posixpath.join(css_dir, target))
+        if target not in manifest:
+            return match.group(0)
+        built_url = posixpath.relpath(manifest[target], built_css_dir)
+        return 'url({0}{1}{2}{0})'.format(quote, built_url, suffix)
+    return _CSS_URL_PATTERN.sub(replace, content)
+
+
+def _rewrite_static_paths(content, manifest):
+    """Points quoted 'static/...' paths at the fingerprinted files."""
+    def replace(match):
+        quote, path = match.groups()
+        if path not in manifest:
+            return match.group(0)
+        return '{0}/static/{1}{0}'.format(quote, manifest[path])
+    return _STATIC_PATH_PATTERN.sub(replace, content)
+
+
+def _split_url_suffix(url):
+    """Splits a url into its path and its query string and fragment."""
+    for i, char in enumerate(url):
+        if char in '?#':
+            return url[:i], url[i:]
+    return url, ''
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        print 'Usage: {} [static directory]'.format(sys.argv[0])
+    else:
+        static_dir = sys.argv[1] if len(sys.argv) > 1 else STATIC_DIR
+        manifest = build(static_dir)
+        print 'Built {} static files into {}'.format(
+            len(manifest), os.path.join(static_dir, BUILD_DIR))
+        if brotli is None:
+            print 'The brotli package is not installed; skipped brotli variants.'
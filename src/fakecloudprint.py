@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# A stand-in for the Google Cloud Print API.
+# For testing and load testing the print path without Google.
+#
+# Serves the /submit, /jobs, /search and /deletejob calls which
+# `printapp/client.py` makes. Point the app at it by setting
+# `CLOUDPRINT_URL = 'http://localhost:5003/cloudprint'` in a settings file.
+# Any bearer token is accepted; tokens containing 'noprinter' have no uniFLOW
+# printer.
+
+import cgi
+import json
+import random
+import socket
+import sys
+import threading
+import time
+import urlparse
+import uuid
+from StringIO import StringIO
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from printapp.cloudprint import UNIFLOW_ID
+
+API_PATH = '/cloudprint'
+
+QUEUED = 'QUEUED'
+IN_PROGRESS = 'IN_PROGRESS'
+DONE = 'DONE'
+ERROR = 'ERROR'
+
+_OTHER_PRINTERS = [
+    {'id': 'fakecloudprint-save-to-drive', 'name': 'Save to Google Drive'},
+    {'id': 'fakecloudprint-home', 'name': 'Home Printer'}
+]
+
+
+class FakeCloudPrint(object):
+    """The state of a fake cloud print service: print jobs per token.
+
+    processing_delay - seconds a job takes to go from QUEUED to DONE. It is
+        IN_PROGRESS for the second half of that time.
+    failure_rate - fraction of jobs which end in ERROR instead of DONE.
+    error_rate - fraction of requests answered with a 503.
+    latency - seconds added to every response.
+    max_jobs - newest jobs kept per token.
+    """
+
+    def __init__(self, processing_delay=2, failure_rate=0, error_rate=0,
+                 latency=0, max_jobs=100):
+        self.processing_delay = processing_delay
+        self.failure_rate = failure_rate
+        self.error_rate = error_rate
+        self.latency = latency
+        self.max_jobs = max_jobs
+        self.request_count = 0
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get_printers(self, token):
+        printers = list(_OTHER_PRINTERS)
+        if 'noprinter' not in token:
+            printers.append({'id': UNIFLOW_ID, 'name': 'Calvin uniFLOW'})
+        return printers
+
+    def submit_job(self, token, printer_id, title, content_type, size):
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'printerid': printer_id,
+            'title': title,
+            'contentType': content_type,
+            'fileSize': str(size),
+            'createTime': str(int(now * 1000)),
+            '_created': now,
+            '_fails': random.random() < self.failure_rate
+        }
+        with self._lock:
+            jobs = self._jobs.setdefault(token, [])
+            jobs.append(job)
+            del jobs[:-self.max_jobs]
+        return self._describe(job, now)
+
+    def list_jobs(self, token, printer_id=None):
+        now = time.time()
+        with self._lock:
+            jobs = list(self._jobs.get(token, []))
+        return [self._describe(job, now) for job in reversed(jobs)
+                if printer_id is None or job['printerid'] == printer_id]
+
+    def delete_job(self, token, job_id):
+        """Returns False if the token has no job with that id."""
+        with self._lock:
+            jobs = self._jobs.get(token, [])
+            for i, job in enumerate(jobs):
+                if job['id'] == job_id:
+                    del jobs[i]
+                    return True
+        return False
+
+    def _describe(self, job, now):
+        age = now - job['_created']
+        if age < self.processing_delay / 2.0:
+            status = QUEUED
+        elif age < self.processing_delay:
+            status = IN_PROGRESS
+        elif job['_fails']:
+            status = ERROR
+        else:
+            status = DONE
+        description = dict((key, value) for key, value in job.iteritems()
+                           if not key.startswith('_'))
+        description['status'] = status
+        return description
+
+
+class FakeCloudPrintHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        cloudprint = self.server.cloudprint
+        with cloudprint._lock:
+            cloudprint.request_count += 1
+        if cloudprint.latency:
+            time.sleep(cloudprint.latency)
+
+        url = urlparse.urlparse(self.path)
+        params = dict((key, values[0]) for key, values
+                      in urlparse.parse_qs(url.query).iteritems())
+        form = self._read_form()
+        params.update(form)
+
+        api_path, _, call = url.path.rpartition('/')
+        if api_path != API_PATH:
+            return self._send(404, {'success': False, 'message': 'Not found'})
+
+        authorization = self.headers.get('Authorization', '')
+        if not authorization.startswith('Bearer ') or len(authorization) == 7:
+            return self._send(403, {'success': False,
+                                    'message': 'User credentials required'})
+        token = authorization[7:]
+        if random.random() < cloudprint.error_rate:
+            return self._send(503, {'success': False,
+                                    'message': 'Service unavailable'})
+
+        if call == 'search':
+            return self._send(200, {'success': True,
+                                    'printers': cloudprint.get_printers(token)})
+        if call == 'jobs':
+            return self._send(200, {'success': True, 'jobs': cloudprint.list_jobs(
+                token, params.get('printerid'))})
+        if call == 'submit' and self.command == 'POST':
+            content = form.get('content')
+            if not params.get('printerid') or content is None:
+                return self._send(200, {'success': False,
+                                        'message': 'Missing printerid or content'})
+            job = cloudprint.submit_job(token, params['printerid'],
+                                        params.get('title', ''),
+                                        params.get('contentType'), len(content))
+            return self._send(200, {'success': True, 'job': job})
+        if call == 'deletejob' and self.command == 'POST':
+            if cloudprint.delete_job(token, params.get('jobid')):
+                return self._send(200, {'success': True})
+            return self._send(200, {'success': False,
+                                    'message': 'Job not found'})
+        return self._send(404, {'success': False, 'message': 'Not found'})
+
+    def _read_form(self):
+        """Returns the urlencoded or multipart POST data as a dict of
+        strings, keeping the first value of each field.
+        """
+        if self.command != 'POST':
+            return {}
+        body = self._read_body()
+        content_type = self.headers.get('Content-Type', '')
+        if content_type.startswith('multipart/form-data'):
+            environ = {'REQUEST_METHOD': 'POST', 'CONTENT_TYPE': content_type,
+                       'CONTENT_LENGTH': str(len(body))}
+            fields = cgi.FieldStorage(fp=StringIO(body), environ=environ)
+            return dict((key, fields.getfirst(key)) for key in fields.keys())
+        return dict((key, values[0]) for key, values
+                    in urlparse.parse_qs(body).iteritems())
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() != 'chunked':
+            return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(';')[0], 16)
+            if size == 0:
+                # Trailers end with an empty line.
+                while self.rfile.readline() not in ('\r\n', '\n', ''):
+                    pass
+                return ''.join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def _send(self, status, payload):
+        body = json.dumps(payload)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeCloudPrintServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, cloudprint):
+        HTTPServer.__init__(self, address, FakeCloudPrintHandler)
+        self.cloudprint = cloudprint
+
+    def handle_error(self, request, client_address):
+        # Clients which time out drop their connection; that is not an
+        # error of the server.
+        if not isinstance(sys.exc_info()[1], socket.error):
+            HTTPServer.handle_error(self, request, client_address)
+
+    @property
+    def url(self):
+        return 'http://{}:{}{}'.format(self.server_address[0],
+                                       self.server_address[1], API_PATH)
+
+
+def start_server(cloudprint, port=0):
+    """Serves `cloudprint` from a background thread, returning the server.
+
+    Port 0 picks a free port; see `server.url`.
+    """
+    server = FakeCloudPrintServer(('127.0.0.1', port), cloudprint)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+if __name__ == '__main__':
+    usage = ('Usage: {} [port] [processing delay] [failure rate] '
+             '[error rate] [latency]').format(sys.argv[0])
+    if len(sys.argv) > 6:
+        print usage
+    else:
+        port = int(sys.argv[1]) if len(sys.argv) > 1 else 5003
+        args = [float(arg) for arg in sys.argv[2:]]
+        server = FakeCloudPrintServer(('127.0.0.1', port), FakeCloudPrint(*args))
+        print 'Fake cloud print listening on {}'.format(server.url)
+        server.serve_forever()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# A stand-in for the uniFLOW server at uniflow.calvin.edu.
+# For testing and benchmarking the scrapers without a Calvin account.
+#
+# Speaks the sign in (NTLM), budget and print queue pages which
+# `printapp/printstatus.py` scrapes. Point the app at it by setting
+# `UNIFLOW_URL = 'http://localhost:5002/'` in a settings file.
+
+import base64
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+import urlparse
+import uuid
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from ntlm import ntlm
+from printapp.benchmark import pages
+
+CLIENT_PATH = '/pwclient/'
+RQM_PATH = '/pwrqm/'
+AUTH_PAGE = 'getuserid.asp'
+BUDGET_PAGE = 'dispBudget.asp'
+QUEUE_PAGE = 'dispObjects.asp'
+
+_CHALLENGE_FLAGS = (ntlm.NTLM_NegotiateUnicode | ntlm.NTLM_RequestTarget |
+                    ntlm.NTLM_NegotiateNTLM)
+
+
+class FakeUniflow(object):
+    """The state of a fake uniFLOW server: users, sign in tokens and print
+    queues.
+
+    jobs - number of print jobs in each user's queue.
+    latency - seconds added to every response.
+    password - if set, the only accepted password. Any password is accepted
+        otherwise. User names starting with 'invalid' are always rejected.
+    token_ttl - seconds after which tokens are rejected, or None.
+    """
+
+    def __init__(self, jobs=10, latency=0, password=None, token_ttl=None):
+        self.jobs = jobs
+        self.latency = latency
+        self.password = password
+        self.token_ttl = token_ttl
+        self.request_count = 0
+        self._tokens = {}
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def create_token(self, username):
+        token = uuid.uuid4().hex.upper()
+        with self._lock:
+            self._tokens[token] = (username, time.time())
+        return token
+
+    def get_user(self, token):
+        """Returns the user name of a token, or None if it is invalid."""
+        with self._lock:
+            entry = self._tokens.get(token)
+        if entry is None:
+            return None
+        username, created = entry
+        if self.token_ttl is not None and time.time() - created > self.token_ttl:
+            return None
+        return username
+
+    def get_queue(self, username):
+        with self._lock:
+            if username not in self._queues:
+                seed = abs(hash(username)) % 0xFFFFFFFF
+                self._queues[username] = pages.make_print_jobs(self.jobs, seed)
+            return list(self._queues[username])
+
+    def delete_jobs(self, username, job_ids):
+        self.get_queue(username)
+        with self._lock:
+            self._queues[username] = [job for job in self._queues[username]
+                                      if job['job_id'] not in job_ids]
+
+    def get_budget(self, username):
+        return 20.0 + abs(hash(username)) % 1000 / 100.0
+
+    def check_password(self, username, domain, password_response, challenge):
+        if username.lower().startswith('invalid'):
+            return False
+        if self.password is None:
+            return True
+        password_hash = ntlm.create_NT_hashed_password_v1(self.password)
+        return ntlm.calc_resp(password_hash, challenge) == password_response
+
+
+class FakeUniflowHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def _handle(self):
+        uniflow = self.server.uniflow
+        with uniflow._lock:
+            uniflow.request_count += 1
+        if uniflow.latency:
+            time.sleep(uniflow.latency)
+
+        url = urlparse.urlparse(self.path)
+        query = urlparse.parse_qs(url.query)
+        length = int(self.headers.get('Content-Length') or 0)
+        form = urlparse.parse_qs(self.rfile.read(length), keep_blank_values=True)
+
+        app_path, _, page = url.path.rpartition('/')
+        app_path += '/'
+        if app_path not in (CLIENT_PATH, RQM_PATH):
+            return self._send(404, 'Not found')
+        if page == '':
+            return self._send(200, '<html><head><title>uniFLOW</title></head></html>')
+        if page == AUTH_PAGE:
+            if self.command == 'POST':
+                return self._sign_in(app_path)
+            return self._send(200, '<html><head><title>Sign in</title></head></html>')
+
+        token = (query.get('token') or form.get('token') or [''])[0]
+        username = uniflow.get_user(token)
+        if username is None:
+            return self._send(302, '', {'Location': app_path + AUTH_PAGE})
+
+        if app_path == CLIENT_PATH and page == BUDGET_PAGE:
+            return self._send(200, pages.make_budget_page(
+                uniflow.get_budget(username), token))
+        if app_path == RQM_PATH and page == QUEUE_PAGE:
+            if self.command == 'POST' and 'Action_IncReleaseQueue' in form:
+                job_ids = [key for key, value in form.iteritems()
+                           if value == ['yes']]
+                uniflow.delete_jobs(username, job_ids)
+            return self._send(200, pages.make_queue_page(
+                uniflow.get_queue(username), token))
+        return self._send(404, 'Not found')
+
+    def _sign_in(self, app_path):
+        """NTLM challenge/response, then a page with a new token."""
+        authorization = self.headers.get('Authorization', '')
+        if not authorization.startswith('NTLM '):
+            return self._send(401, '', {'WWW-Authenticate': 'NTLM'})
+
+        message = base64.b64decode(authorization[5:])
+        message_type = struct.unpack('<I', message[8:12])[0]
+        if message_type == 1:
+            challenge = ''.join(chr(random.getrandbits(8)) for i in range(8))
+            self.server.challenges[self.client_address] = challenge
+            return self._send(401, '', {
+                'WWW-Authenticate': 'NTLM ' + _make_challenge_message(challenge)})
+
+        challenge = self.server.challenges.pop(self.client_address, None)
+        nt_response = _read_field(message, 20)
+        domain = _read_field(message, 28).decode('utf-16-le')
+        username = _read_field(message, 36).decode('utf-16-le')
+        if (message_type != 3 or challenge is None or
+                not self.server.uniflow.check_password(username, domain,
+                                                       nt_response, challenge)):
+            return self._send(401, 'Access denied')
+
+        token = self.server.uniflow.create_token(username)
+        if app_path == CLIENT_PATH:
+            script = 'top.c_updateToken("{}");'.format(token)
+        else:
+            script = 'var g_strUrl = "dispObjects.asp?token={}";'.format(token)
+        return self._send(200, '<html><head><title>uniFLOW</title>'
+                               '<script>{}</script></head></html>'.format(script))
+
+    def _send(self, status, body, headers=None):
+        if isinstance(body, unicode):
+            body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).iteritems():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeUniflowServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, uniflow):
+        HTTPServer.__init__(self, address, FakeUniflowHandler)
+        self.uniflow = uniflow
+        # NTLM authenticates connections, so challenges are kept per client
+        # address (host and port) until the response arrives.
+        self.challenges = {}
+
+    def handle_error(self, request, client_address):
+        # Clients which time out drop their connection; that is not an
+        # error of the server.
+        if not isinstance(sys.exc_info()[1], socket.error):
+            HTTPServer.handle_error(self, request, client_address)
+
+    @property
+    def url(self):
+        return 'http://{}:{}/'.format(*self.server_address)
+
+
+def start_server(uniflow, port=0):
+    """Serves `uniflow` from a background thread, returning the server.
+
+    Port 0 picks a free port; see `server.url`.
+    """
+    server = FakeUniflowServer(('127.0.0.1', port), uniflow)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def _make_challenge_message(challenge):
+    target = u'CALVIN'.encode('utf-16-le')
+    header_length = 48
+    message = ('NTLMSSP\0' + struct.pack('<I', 2) +
+               struct.pack('<HHI', len(target), len(target), header_length) +
+               struct.pack('<I', _CHALLENGE_FLAGS) + challenge + '\0' * 8 +
+               struct.pack('<HHI', 0, 0, header_length + len(target)) +
+               target)
+    return base64.b64encode(message)
+
+
+def _read_field(message, offset):
+    length, _, field_offset = struct.unpack('<HHI', message[offset:offset + 8])
+    return message[field_offset:field_offset + length]
+
+
+if __name__ == '__main__':
+    usage = 'Usage: {} [port] [jobs] [latency]'.format(sys.argv[0])
+    if len(sys.argv) > 4:
+        print usage
+    else:
+        port = int(sys.argv[1]) if len(sys.argv) > 1 else 5002
+        jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+        latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+        server = FakeUniflowServer(('127.0.0.1', port), FakeUniflow(jobs, latency))
+        print 'Fake uniFLOW listening on {}'.format(server.url)
+        server.serve_forever()
@@ -12,11 +12,33 @@ app.config.from_envvar('PRINTAPP_SETTINGS', silent=True)
 mongo = PyMongo(app)
 with app.app_context():
     mongo.db.credentials.ensure_index('email')
+    import printapp.printjobs
+    printapp.printjobs.ensure_indexes()
 
 import printapp.util
+import printapp.profiling
+# Registered after `util`, so that rejected requests are still timed.
+import printapp.ratelimit
+with app.app_context():
+    printapp.ratelimit.ensure_indexes()
+import printapp.assets
 import printapp.routes
 import printapp.api
 
+printapp.printstatus.set_base_url(app.config['UNIFLOW_URL'])
+import printapp.httpsessions
+printapp.httpsessions.configure_pools(maxsize=app.config['HTTP_POOL_MAXSIZE'],
+                                      sizes=app.config['HTTP_POOL_SIZES'])
+printapp.client.set_base_url(app.config['CLOUDPRINT_URL'])
+printapp.cloudprint.configure_job_polling(
+    initial_interval=app.config['CLOUDPRINT_POLL_INITIAL_INTERVAL'],
+    max_interval=app.config['CLOUDPRINT_POLL_MAX_INTERVAL'],
+    timeout=app.config['CLOUDPRINT_POLL_TIMEOUT'])
+printapp.printstatus.configure_session_pool(
+    max_size=app.config['UNIFLOW_SESSION_POOL_SIZE'],
+    idle_ttl=app.config['UNIFLOW_SESSION_IDLE_TTL'])
+printapp.printstatus.configure_fetch_workers(app.config['UNIFLOW_FETCH_WORKERS'])
+
 import logging
 from logging.handlers import RotatingFileHandler
 file_handler = RotatingFileHandler(app.config['LOGFILE'], 'a', 1 * 1024 * 1024, 10)
@@ -3,10 +3,50 @@ import printstatus
 import cloudprint
 import oauthcredentials
 import document
+import cache
+import workerpool
+import poller
+import prices
+import printjobs
+import printers
+import httpsessions
+import deadline
+import threading
+import Queue
+import hashlib
+import os
 import werkzeug
 from flask import make_response, abort, session, request, redirect
 import flask
 
+_price_index = prices.PriceIndex(app.config.get('PRINTPRICES'))
+
+_printer_directory = printers.PrinterDirectory(
+    os.path.join(app.static_folder, 'printers.json'))
+
+# (budget, print queue) tuples keyed by email.
+_uniflow_cache = cache.TTLCache(ttl=app.config['UNIFLOW_CACHE_TTL'])
+
+# The oauth token of users whose uniFLOW printer was found, keyed by email.
+_printer_cache = cache.TTLCache(ttl=app.config['PRINTER_CACHE_TTL'])
+
+# Fetches the budget and print queue of users who just signed in.
+_warmup_pool = workerpool.WorkerPool(app.config['UNIFLOW_WARMUP_WORKERS'])
+_warming_up = set()
+_warming_up_lock = threading.Lock()
+
+# One poller per user with an open /api/uniflowstream.
+_pollers = poller.PollerRegistry(
+    min_interval=app.config['UNIFLOW_STREAM_MIN_INTERVAL'],
+    max_interval=app.config['UNIFLOW_STREAM_MAX_INTERVAL'])
+_STREAM_KEEPALIVE_INTERVAL = 15
+
+# Asks Google about cloud print while /api/status scrapes uniFLOW.
+_status_pool = workerpool.WorkerPool(app.config['STATUS_WORKERS'])
+
+# Submits print jobs to Google; see /api/print.
+_print_pool = workerpool.WorkerPool(app.config['PRINT_WORKERS'])
+
 @app.route('/api/login', methods=['POST'])
 def login():
     """API endpoint to login.
@@ -36,7 +76,7 @@ def login():
         abort(401)
 
     try:
-        printstatus.get_uniflow_client(username, password)
+        uniflow = printstatus.get_uniflow_client(username, password)
     except printstatus.InvalidCredentialsError:
         abort(401)
     except printstatus.NetworkError:
@@ -44,6 +84,8 @@ def login():
     except printstatus.ScrapingError:
         abort(502)
 
+    _uniflow_cache.invalidate(email)
+    _start_warm_up(email, uniflow)
     session['email'] = email
     session['password'] = password
     session.permanent = True
@@ -56,6 +98,10 @@ def logout():
 
     Redirects to '/'
     """
+    email = session.get('email')
+    if email is not None:
+        printstatus.discard_uniflow_client(email.split('@')[0])
+        _uniflow_cache.invalidate(email)
     session.clear()
     return redirect('/')
 
@@ -64,39 +110,49 @@ def cloudprintstatus():
     """API endpoint with status concerning whether printing with cloudprint is possible.
 
     Response body is a JSON string.
+    The response has an ETag; see `_conditional_jsonify`.
     Response codes:
         200 - successful
+        304 - not modified since the response with the ETag in If-None-Match
         401 - invalid credentials
-        504 - database error
+        502 - error response from Google
+        504 - database error, or timeout connecting to Google
     """
     try:
         email, password = util.get_current_user_credentials()
     except ValueError:
         abort(401)
-    oauth_url = oauthcredentials.get_authentication_prompt_url(email)
-    token_found = False
-    printer_installed = None
+
     try:
-        token = oauthcredentials.get_token(email)
-    except oauthcredentials.WebServiceError:
+        response = _get_cloudprint_status(email)
+    except (oauthcredentials.WebServiceError, cloudprint.UpstreamTimeoutError):
         abort(504)
+    except cloudprint.UpstreamError:
+        abort(502)
 
-    if token is not None:
-        token_found = True
-        printer_installed = cloudprint.has_uniflow_printer(token)
-
-    return flask.jsonify(haveCloudPrintPermission=token_found, 
-                         isPrinterInstalled=printer_installed, 
-                         cloudPrintPermissionUrl=oauth_url), 200
+    return _conditional_jsonify(**response)
 
 
 @app.route('/api/uniflowstatus', methods=['GET'])
 def uniflowstatus():
     """API endpoint to get a user's print budget and print queue.
 
-    Response body is JSON.
+    Response body is JSON:
+    {
+        budget: 12.5,
+        queue: [{job_id, name, pages, copies, price, printer_name, date,
+                 color, price_per_page, printer_class,
+                 printer: {building, room, color, type}}],
+        totals: [{printer_class, jobs, pages, price}]
+    }
+    The color, price per page and printer class of a job are estimated from
+    its price; see `prices.PriceIndex.classify`. `printer` is looked up in
+    printers.json, and is null for unknown printers.
+    Responses are served from a short lived cache and have an ETag; see
+    `_conditional_jsonify`.
     Response codes:
         200 - budget and print queue retrieved successfully
+        304 - not modified since the response with the ETag in If-None-Match
         401 - invalid credentials
         504 - error connecting to uniflow
         502 - unexpected response from uniflow; the scraper is broken
@@ -105,12 +161,9 @@ def uniflowstatus():
         email, password = util.get_current_user_credentials()
     except ValueError:
         abort(401)
-    username = email.split('@')[0]
-    
+
     try:
-        uniflow = printstatus.get_uniflow_client(username, password)
-        queue = uniflow.get_print_queue()
-        budget = uniflow.get_budget()
+        response = _get_uniflow_status(email, password)
     except printstatus.InvalidCredentialsError:
         abort(401)
     except printstatus.NetworkError:
@@ -118,29 +171,192 @@ def uniflowstatus():
     except printstatus.ScrapingError:
         abort(502)
 
-    jobs = []
-    for job in queue:
-        parsed_job = job._asdict()
-        parsed_job['color'] = _is_color_job(job)
-        jobs.append(parsed_job)
-    
-    response = {}
-    response['queue'] = jobs
-    response['budget'] = budget
+    return _conditional_jsonify(**response)
+
+
+@app.route('/api/status', methods=['GET'])
+def status():
+    """API endpoint combining /api/cloudprintstatus and /api/uniflowstatus.
+
+    Google and uniFLOW are queried in parallel, so the response takes as long
+    as the slower of the two rather than both.
+
+    Response body is JSON:
+    {
+        cloudprint: {status: 200, haveCloudPrintPermission,
+                     isPrinterInstalled, cloudPrintPermissionUrl},
+        uniflow: {status: 200, budget, queue, totals}
+    }
+    Each section has the response body of its endpoint, and a status with
+    the response code that endpoint would have returned. A section which
+    failed only has its status, e.g. {status: 504}.
+    The response has an ETag; see `_conditional_jsonify`.
+    Response codes:
+        200 - successful, though sections may have failed
+        304 - not modified since the response with the ETag in If-None-Match
+        401 - invalid credentials
+    """
+    try:
+        email, password = util.get_current_user_credentials()
+    except ValueError:
+        abort(401)
 
-    return flask.jsonify(**response), 200
+    cloudprint_result = _status_pool.submit(_with_app_context,
+                                            _get_cloudprint_status, email)
+    uniflow_section = _get_status_section(_get_uniflow_status, email, password)
+    cloudprint_section = _get_status_section(cloudprint_result.get)
+
+    return _conditional_jsonify(cloudprint=cloudprint_section,
+                                uniflow=uniflow_section)
+
+
+@app.route('/api/uniflowstream', methods=['GET'])
+def uniflowstream():
+    """API endpoint which streams changes to a user's print budget and print
+    queue as server-sent events.
+
+    The queue is polled on the server; all streams of a user share one
+    poller. Events:
+        snapshot - {budget: 12.5, queue: [...]}, sent first. The queue is
+            in the format of /api/uniflowstatus.
+        diff - {budget: 12.5, added: [...], changed: [...], removed: [job_id]}
+        failure - {status: 401, 502 or 504}, with the meaning of the
+            /api/uniflowstatus response codes. The stream ends after a 401.
+
+    Each open stream holds a server worker; see UNIFLOW_STREAM_MIN_INTERVAL.
+    Response codes:
+        200 - streaming
+        401 - invalid credentials
+    """
+    try:
+        email, password = util.get_current_user_credentials()
+    except ValueError:
+        abort(401)
+    username = email.split('@')[0]
+
+    def fetch_budget_and_print_queue():
+        uniflow = printstatus.get_uniflow_client(username, password)
+        status = uniflow.get_budget_and_print_queue()
+        _uniflow_cache.set(email, status)
+        return status
+
+    events = _pollers.subscribe(email, fetch_budget_and_print_queue)
+
+    def stream():
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=_STREAM_KEEPALIVE_INTERVAL)
+                except Queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+                if event[0] == 'closed':
+                    return
+                yield _format_stream_event(event)
+        finally:
+            _pollers.unsubscribe(email, events)
+
+    return flask.Response(stream(), mimetype='text/event-stream',
+                          headers={'Cache-Control': 'no-cache'})
+
+
+class _UploadRequest(flask.Request):
+    """Streams files uploaded to /api/upload straight into the database,
+    instead of spooling them to memory or a temporary file first.
+
+    Uploads with an unsupported file name are rejected before any of the
+    file is read.
+    """
+
+    document_writer = None
+
+    def _get_file_stream(self, total_content_length, content_type,
+                         filename=None, content_length=None):
+        if self.endpoint != 'upload_file':
+            return super(_UploadRequest, self)._get_file_stream(
+                total_content_length, content_type, filename, content_length)
+        # Only one document may be uploaded at a time.
+        if self.document_writer is not None:
+            abort(400)
+
+        document_name = werkzeug.secure_filename(filename or '')
+        if not _has_supported_filetype(document_name):
+            abort(400)
+        try:
+            email, password = util.get_current_user_credentials()
+        except ValueError:
+            abort(401)
+
+        self.document_writer = document.DocumentWriter(
+            document_name, email, max_size=self.max_content_length)
+        return self.document_writer
+
+    def _load_form_data(self):
+        try:
+            super(_UploadRequest, self)._load_form_data()
+        except Exception:
+            if self.document_writer is not None:
+                self.document_writer.abort()
+            raise
+        # Werkzeug completes the writer once the whole file has arrived;
+        # anything else is a failed or truncated upload. Werkzeug does not
+        # pass the field name to `_get_file_stream`, so a file sent under
+        # another name than 'file' is only discarded here.
+        writer = self.document_writer
+        if writer is not None:
+            uploaded = self.files.get('file')
+            if (writer.complete and uploaded is not None
+                    and uploaded.stream is writer):
+                writer.close()
+            else:
+                writer.abort()
+
+app.request_class = _UploadRequest
+
+
+@app.route('/api/printers', methods=['GET'])
+def printer_list():
+    """API endpoint to look up printers on campus.
+
+    Optional query parameters filter the printers:
+        building - a building id from printers.json, e.g. 'library'
+        color - true or false
+        type - e.g. 'MFD' or 'Laser'
+        public - true or false
+    Response body is JSON:
+    {
+        printers: [{name, room, building, building_id, public, color, type}]
+    }
+    The response has an ETag; see `_conditional_jsonify`.
+    Response codes:
+        200 - successful
+        304 - not modified since the response with the ETag in If-None-Match
+        400 - invalid color or public parameter
+    """
+    filters = {'building_id': request.args.get('building'),
+               'type': request.args.get('type')}
+    try:
+        for name in ('color', 'public'):
+            if name in request.args:
+                filters[name] = _parse_bool(request.args[name])
+    except ValueError:
+        abort(400)
+
+    return _conditional_jsonify(printers=_printer_directory.find(**filters))
 
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     '''API endpoint to upload a file to be printed.
 
-    Expects file as POST data.
+    Expects file as POST data. The file is written to the database as it
+    arrives; see `_UploadRequest`.
     Response body is the file_id of the saved file.
     Response codes:
         201 - upload successful
         400 - invalid request - missing file parameter or invalid file name
         401 - invalid credentials
+        413 - file larger than the MAX_CONTENT_LENGTH setting
         504 - database error
     '''
     try:
@@ -148,20 +364,16 @@ def upload_file():
     except ValueError:
         abort(401)
 
-    file_handle = request.files['file']
-    if file_handle is None:
-        abort(400)
-    
-    document_name = werkzeug.secure_filename(file_handle.filename)
-    if not _has_supported_filetype(document_name):
-        abort(400)
     try:
-        document_id = document.save_document(file_handle, 
-                                             document_name, email)
+        file_handle = request.files.get('file')
+    except document.DocumentTooLargeError:
+        abort(413)
     except document.DatabaseError:
         abort(504)
+    if file_handle is None:
+        abort(400)
 
-    return flask.jsonify(file_id=document_id), 201
+    return flask.jsonify(file_id=file_handle.stream.document_id), 201
 
 
 @app.route('/api/revokecloudprint', methods=['POST'])
@@ -178,6 +390,7 @@ def revoke_cloudprint():
     except ValueError:
         abort(401)
 
+    _printer_cache.invalidate(email)
     try:
         token = oauthcredentials.delete_credentials(email, revoke=True)
     except oauthcredentials.WebServiceError:
@@ -201,14 +414,18 @@ def printjob():
     }
     where oid is the string representation of the objectid returned by Mongo.
 
-    Response body is empty.
+    The job is submitted to Google in the background. Response body is
+    JSON with the id of the print job, whose progress is reported by
+    /api/printstatus/<print_id>:
+    {
+        print_id: id
+    }
     Response codes:
-        201 - print job submission successful
+        202 - print job accepted
         400 - invalid request - missing parameter(s) or file not found in database
         401 - invalid credentials
         409 - token not found
-        504 - database error
-        502 - error submitting job to Google
+        504 - database error, or timeout connecting to Google
     '''
     try:
         file_id = request.form.get('file_id')
@@ -243,16 +460,59 @@ def printjob():
     if file_handle is None:
         abort(400)
 
-    try: 
-        cloudprint.submit_job(token, file_handle, color=color, duplex=double_sided,
-                              copies=copies, collate=collate, staple=staple)
-    except cloudprint.JobSubmissionError:
-        abort(502)
-    finally:
-        document.delete_document(file_id, email)
+    try:
+        print_id = printjobs.create_print_job(email)
+    except printjobs.DatabaseError:
+        file_handle.close()
+        abort(504)
+
+    options = {'color': color, 'duplex': double_sided, 'copies': copies,
+               'collate': collate, 'staple': staple}
+    _print_pool.submit(_with_app_context, _run_print_job, print_id, email,
+                       token, file_id, file_handle, options)
+
+    response = flask.jsonify(print_id=print_id)
+    response.status_code = 202
+    response.headers['Location'] = flask.url_for('print_job_status',
+                                                 print_id=print_id)
+    return response
+
+
+@app.route('/api/printstatus/<print_id>', methods=['GET'])
+def print_job_status(print_id):
+    """API endpoint to follow the progress of a print job submitted to
+    /api/print.
 
-    file_handle.close()
-    return '', 201
+    Response body is JSON:
+    {
+        id: print_id,
+        state: 'queued', 'submitting', 'processing', 'done' or 'failed',
+        status: null, or the response code of a failed job: 502 if Google
+            rejected the job, 504 on timeout or if the job has not moved on
+            for PRINT_JOB_DEADLINE seconds (e.g. the server was restarted),
+        created: date,
+        updated: date
+    }
+    Response codes:
+        200 - successful
+        401 - invalid credentials
+        404 - no such print job
+        504 - database error
+    """
+    try:
+        email, password = util.get_current_user_credentials()
+    except ValueError:
+        abort(401)
+
+    try:
+        print_job = printjobs.get_print_job(
+            print_id, email, stale_after=app.config['PRINT_JOB_DEADLINE'])
+    except printjobs.DatabaseError:
+        abort(504)
+    if print_job is None:
+        abort(404)
+
+    return flask.jsonify(**print_job)
 
 @app.route('/api/deletejob/<job_id>', methods=['POST'])
 def deletejob(job_id):
@@ -281,11 +541,210 @@ def deletejob(job_id):
     except printstatus.InvalidCredentialsError:
         abort(401)
     except printstatus.NetworkError:
+        _uniflow_cache.invalidate(email)
         abort(504)
     except printstatus.ScrapingError:
+        _uniflow_cache.invalidate(email)
         abort(502)
+
+    _uniflow_cache.update(email, lambda status: _without_jobs(status, [job_id]))
     return '', 200
 
+@app.route('/api/deletejobs', methods=['POST'])
+def deletejobs():
+    '''API endpoint to delete several print jobs at once.
+
+    Expects one or more `job_id` values as POST data.
+    The ids are checked against the current print queue, and the jobs which
+    are in the queue are deleted in a single request to uniFLOW.
+
+    Response body is JSON, with the result for each id:
+    {
+        results: {
+            <job_id>: 'deleted' or 'not_found'
+        }
+    }
+    Response codes:
+        200 - request processed, see the results for each print job
+        400 - invalid request - missing print job ids
+        401 - invalid credentials
+        504 - error connecting to uniflow
+        502 - scraping error
+    '''
+    job_ids = request.form.getlist('job_id')
+    if not job_ids:
+        abort(400, 'Missing print job ids.')
+
+    try:
+        email, password = util.get_current_user_credentials()
+    except ValueError:
+        abort(401)
+    username = email.split('@')[0]
+
+    try:
+        uniflow = printstatus.get_uniflow_client(username, password)
+        queued_ids = set(job.job_id for job in uniflow.get_print_queue())
+        found_ids = [job_id for job_id in job_ids if job_id in queued_ids]
+        if found_ids:
+            uniflow.delete_print_jobs(found_ids)
+    except printstatus.InvalidCredentialsError:
+        abort(401)
+    except printstatus.NetworkError:
+        _uniflow_cache.invalidate(email)
+        abort(504)
+    except printstatus.ScrapingError:
+        _uniflow_cache.invalidate(email)
+        abort(502)
+
+    _uniflow_cache.update(email, lambda status: _without_jobs(status, found_ids))
+    results = {}
+    for job_id in job_ids:
+        results[job_id] = 'deleted' if job_id in queued_ids else 'not_found'
+    return flask.jsonify(results=results), 200
+
+@app.route('/api/cachestats', methods=['GET'])
+def cachestats():
+    """API endpoint with hit and miss counters of the uniFLOW status and
+    printer caches, and the connection pools to Google; see
+    `httpsessions.stats`.
+
+    Only clients in the STATS_ALLOWED_IPS setting may read it.
+    Response body is JSON.
+    Response codes:
+        200 - successful
+        403 - client address not in STATS_ALLOWED_IPS
+    """
+    if not util.is_stats_client():
+        abort(403)
+    return flask.jsonify(uniflow=_uniflow_cache.stats(),
+                         printer=_printer_cache.stats(),
+                         http=httpsessions.stats()), 200
+
+def _get_cloudprint_status(email):
+    """Returns the response body of /api/cloudprintstatus as a dict.
+
+    Raises oauthcredentials.WebServiceError, cloudprint.UpstreamTimeoutError
+    or cloudprint.UpstreamError on error.
+    """
+    oauth_url = oauthcredentials.get_authentication_prompt_url(email)
+    token_found = False
+    printer_installed = None
+    token = oauthcredentials.get_token(email)
+
+    if token is not None:
+        token_found = True
+        printer_installed = _has_uniflow_printer(email, token)
+
+    return {'haveCloudPrintPermission': token_found,
+            'isPrinterInstalled': printer_installed,
+            'cloudPrintPermissionUrl': oauth_url}
+
+def _has_uniflow_printer(email, token):
+    """Returns `cloudprint.has_uniflow_printer(token)`, remembering a printer
+    which was found until the token changes or PRINTER_CACHE_TTL passes.
+    """
+    if _printer_cache.get(email) == token:
+        return True
+    in_database = app.config['PRINTER_CACHE_STORAGE'] == 'mongo'
+    if in_database:
+        try:
+            if oauthcredentials.has_cached_printer(
+                    email, token, app.config['PRINTER_CACHE_TTL']):
+                _printer_cache.set(email, token)
+                return True
+        except oauthcredentials.WebServiceError as err:
+            app.logger.error('Could not read cached printer: {}'.format(
+                repr(err)))
+
+    if not cloudprint.has_uniflow_printer(token):
+        return False
+    _printer_cache.set(email, token)
+    if in_database:
+        try:
+            oauthcredentials.cache_printer(email, token)
+        except oauthcredentials.WebServiceError as err:
+            app.logger.error('Could not cache printer: {}'.format(repr(err)))
+    return True
+
+def _get_uniflow_status(email, password):
+    """Returns the response body of /api/uniflowstatus as a dict.
+
+    Raises the errors of `printstatus.get_uniflow_client`.
+    """
+    username = email.split('@')[0]
+
+    def fetch_budget_and_print_queue():
+        uniflow = printstatus.get_uniflow_client(username, password)
+        return uniflow.get_budget_and_print_queue()
+
+    budget, queue = _uniflow_cache.get_or_load(email,
+                                               fetch_budget_and_print_queue)
+    response = {}
+    response['queue'], response['totals'] = _describe_queue(queue)
+    response['budget'] = budget
+    return response
+
+def _get_status_section(func, *args):
+    """Returns `func(*args)` with a status of 200, or only the status
+    matching the error it raised. Unexpected errors are logged and give a
+    status of 500, so the other sections are still answered.
+    """
+    try:
+        section = func(*args)
+    except printstatus.InvalidCredentialsError:
+        return {'status': 401}
+    except (printstatus.NetworkError, oauthcredentials.WebServiceError,
+            cloudprint.UpstreamTimeoutError):
+        return {'status': 504}
+    except (printstatus.ScrapingError, cloudprint.UpstreamError):
+        return {'status': 502}
+    except Exception:
+        app.logger.exception('Getting a status section failed.')
+        return {'status': 500}
+    section['status'] = 200
+    return section
+
+def _with_app_context(func, *args):
+    """Calls `func(*args)` from a worker thread which needs the database."""
+    with app.app_context():
+        return func(*args)
+
+def _run_print_job(print_id, email, token, file_id, file_handle, options):
+    """Submits a print job accepted by /api/print to Google, recording its
+    progress, then deletes the printed document.
+    """
+    deadline.start(app.config['PRINT_JOB_DEADLINE'])
+
+    def set_state(state, status=None):
+        try:
+            printjobs.update_print_job(print_id, state, status)
+        except printjobs.DatabaseError as err:
+            app.logger.error('Could not update print job {}: {}'.format(
+                print_id, repr(err)))
+
+    set_state(printjobs.SUBMITTING)
+    try:
+        cloudprint.submit_job(
+            token, file_handle,
+            on_submitted=lambda: set_state(printjobs.PROCESSING), **options)
+    except cloudprint.JobSubmissionError:
+        set_state(printjobs.FAILED, 502)
+    except cloudprint.UpstreamTimeoutError:
+        set_state(printjobs.FAILED, 504)
+    except Exception:
+        app.logger.exception('Print job {} failed.'.format(print_id))
+        set_state(printjobs.FAILED, 500)
+    else:
+        set_state(printjobs.DONE)
+    finally:
+        file_handle.close()
+        try:
+            document.delete_document(file_id, email)
+        except document.DatabaseError as err:
+            app.logger.error('Could not delete document {}: {}'.format(
+                file_id, repr(err)))
+        _uniflow_cache.invalidate(email)
+
 def _parse_bool(string):
     if string is None:
         raise ValueError('None is not a valid boolean')
@@ -297,36 +756,107 @@ def _parse_bool(string):
         return False
     raise ValueError('{} is not a valid boolean.'.format(string))
 
-def _is_color_job(print_job):
-    """Return True if the PrintJob is a color job.
+def _start_warm_up(email, uniflow):
+    """Starts fetching the budget and print queue of a user who just signed
+    in, so that their first status request is served from the cache.
 
-    The price is used to determine whether or not it is a color job.
+    The signed in client stays in the printstatus pool. Warm ups beyond
+    what the pool's threads can handle soon are skipped.
+    """
+    max_pending = 4 * _warmup_pool.size
+    with _warming_up_lock:
+        if email in _warming_up or len(_warming_up) >= max_pending:
+            return
+        _warming_up.add(email)
+    _warmup_pool.submit(_warm_up, email, uniflow)
+
+def _warm_up(email, uniflow):
+    try:
+        _uniflow_cache.get_or_load(email, uniflow.get_budget_and_print_queue)
+    except (printstatus.InvalidCredentialsError, printstatus.NetworkError,
+            printstatus.ScrapingError) as err:
+        app.logger.info('Warm up for {} failed: {}'.format(email, repr(err)))
+    finally:
+        with _warming_up_lock:
+            _warming_up.discard(email)
 
-    Expects the Flask configuration to have a 'PRINTPRICES' setting:
-        PRINTPRICES is a list of dictionaries which hold information on the 
-        prices of printers.
-            {
-                'color': 0.2675,
-                'black': 0.0245
-            }
+def _conditional_jsonify(**payload):
+    """Returns a JSON response whose ETag is a digest of the payload.
 
-    The printer with the closest price match is used. Returns False if
-    the 'PRINTPRICES' setting is missing.
+    If the request's If-None-Match header has that ETag, the client already
+    has the same payload and the response is an empty 304 Not Modified.
+    Clients must revalidate every time, so they never show stale data.
     """
-    price_per_page = print_job.price / float(print_job.pages * print_job.copies)
-    prices = []
-    print_prices = app.config.get('PRINTPRICES')
-    if print_prices is None:
-        return False
+    digest = hashlib.sha1(flask.json.dumps(payload, sort_keys=True)).hexdigest()
+    if request.if_none_match.contains(digest):
+        response = flask.Response(status=304)
+    else:
+        response = flask.jsonify(**payload)
+    response.set_etag(digest)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _describe_queue(queue):
+    """Returns a list of job dicts and a list of totals per printer class
+    for a list of PrintJob objects, as returned by the api.
+    """
+    job_infos, totals = _price_index.classify(queue)
+    jobs = []
+    for job, job_info in zip(queue, job_infos):
+        parsed_job = job._asdict()
+        parsed_job.update(job_info)
+        parsed_job['printer'] = _describe_printer(job.printer_name)
+        jobs.append(parsed_job)
 
-    for price_info in print_prices:
-        prices.append((True, price_info['color']))
-        prices.append((False, price_info['black']))
-    
-    return min(prices, key=lambda x: abs(price_per_page - x[1]))[0]
+    total_list = []
+    for printer_class in sorted(totals):
+        total = dict(totals[printer_class], printer_class=printer_class)
+        total_list.append(total)
+    return jobs, total_list
 
+def _make_job_dicts(queue):
+    """Converts PrintJob objects to dicts, as returned by the api."""
+    return _describe_queue(queue)[0]
+
+def _describe_printer(printer_name):
+    """Returns the building, room, color and type of a printer as a dict,
+    or None for printers missing from printers.json.
+    """
+    printer = _printer_directory.get(printer_name)
+    if printer is None:
+        return None
+    return {'building': printer.get('building'), 'room': printer.get('room'),
+            'color': printer.get('color'), 'type': printer.get('type')}
+
+def _format_stream_event(event):
+    """Formats a poller event as a server-sent event."""
+    name = event[0]
+    if name == 'snapshot':
+        _, budget, queue = event
+        data = {'budget': budget, 'queue': _make_job_dicts(queue)}
+    elif name == 'diff':
+        _, budget, added, removed, changed = event
+        data = {'budget': budget, 'added': _make_job_dicts(added),
+                'removed': removed, 'changed': _make_job_dicts(changed)}
+    else:
+        name = 'failure'
+        error = event[1]
+        status = 502
+        if isinstance(error, printstatus.InvalidCredentialsError):
+            status = 401
+        elif isinstance(error, printstatus.NetworkError):
+            status = 504
+        data = {'status': status}
+    return 'event: {}\ndata: {}\n\n'.format(name, flask.json.dumps(data))
+
+def _without_jobs(uniflow_status, job_ids):
+    """Removes jobs from a cached (budget, print queue) tuple."""
+    budget, queue = uniflow_status
+    return budget, [job for job in queue if job.job_id not in job_ids]
 
 def _has_supported_filetype(filename):
     filename = filename.lower()
+    if '.' not in filename:
+        return False
     return filename.rsplit('.', 1)[1] in ['txt', 'pdf', 'docx', 'doc', 'xps',
                                           'odt', 'png', 'jpg', 'jpeg', 'gif']
@@ -0,0 +1,71 @@
+"""Serves the fingerprinted, precompressed static files built by
+`buildassets.py`.
+
+Templates refer to static files with `asset_url('css/style.css')`. Once the
+assets are built that is the fingerprinted file, which never changes and is
+cached by browsers for a year; otherwise it is the plain static file.
+"""
+import os
+import json
+import mimetypes
+import flask
+from flask import request, abort
+from printapp import app
+
+BUILD_DIR = 'build'
+MANIFEST_NAME = 'manifest.json'
+# Fingerprinted files never change, so they are cached for a year.
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+# (content coding, file suffix) of the precompressed variants, most
+# preferred first.
+_ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def load_manifest():
+    """Returns the manifest written by `buildassets.py`, which maps static
+    paths to fingerprinted ones, or an empty dict if the assets are not built.
+    """
+    filename = os.path.join(app.static_folder, BUILD_DIR, MANIFEST_NAME)
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except IOError:
+        return {}
+
+_manifest = load_manifest()
+
+
+@app.template_global()
+def asset_url(path):
+    """Returns the url of a static file, given its path in the static folder.
+    """
+    return flask.url_for('static', filename=_manifest.get(path, path))
+
+
+@app.route('/static/build/<path:filename>')
+def send_asset(filename):
+    """Sends a fingerprinted static file, precompressed with the best
+    coding the client accepts.
+    """
+    build_dir = os.path.join(app.static_folder, BUILD_DIR)
+    path = flask.safe_join(build_dir, filename)
+    if not os.path.isfile(path):
+        abort(404)
+
+    encoding = None
+    for coding, suffix in _ENCODINGS:
+        if request.accept_encodings[coding] and os.path.isfile(path + suffix):
+            encoding = coding
+            path += suffix
+            break
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = flask.send_file(path, mimetype=mimetype, conditional=True,
+                               cache_timeout=ASSET_MAX_AGE)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'public, max-age={}, immutable'.format(
+        ASSET_MAX_AGE)
+    return response
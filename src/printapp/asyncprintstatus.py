@@ -0,0 +1,95 @@
+"""Cooperative counterpart of `printstatus` for event loop deployments.
+
+Python 2 has no asyncio, so this is built on gevent: run the app under a
+gevent server (e.g. `gunicorn -k gevent`) or call
+`gevent.monkey.patch_all()` first. Sockets then yield to the event loop
+instead of blocking a thread, and a single process can keep hundreds of
+slow uniFLOW requests in flight.
+
+The clients have the same methods as `printstatus` clients, but each call
+returns a greenlet at once. Its `get()` method waits for the result or
+raises the same exceptions as `printstatus`. Sessions, tokens and page
+parsing are shared with `printstatus`.
+"""
+try:
+    import gevent
+    import gevent.monkey
+    import gevent.pool
+except ImportError:
+    gevent = None
+
+import deadline
+import printstatus
+from printstatus import (InvalidCredentialsError, NetworkError, ScrapingError,
+                         PrintJob)
+
+_pool = None
+_pool_size = 500
+
+
+def get_uniflow_client(username, password):
+    """Returns a greenlet which signs in, and resolves to a client.
+
+    Like `printstatus.get_uniflow_client`, signed in clients are pooled per
+    user.
+    """
+    return _spawn(_make_client, username, password)
+
+
+def configure(pool_size):
+    """Sets the maximum number of uniFLOW calls in flight at once."""
+    global _pool, _pool_size
+    _pool_size = pool_size
+    _pool = None
+
+
+class _AsyncUniflowClient(object):
+
+    def __init__(self, client):
+        self._client = client
+
+    def get_budget(self):
+        return _spawn(self._client.get_budget)
+
+    def get_print_queue(self):
+        return _spawn(self._client.get_print_queue)
+
+    def get_budget_and_print_queue(self):
+        """Returns a greenlet which resolves to a `(budget, print_queue)`
+        tuple. Errors are merged as in `printstatus`.
+        """
+        return _spawn(self._get_budget_and_print_queue)
+
+    def delete_print_jobs(self, job_ids):
+        return _spawn(self._client.delete_print_jobs, job_ids)
+
+    def _get_budget_and_print_queue(self):
+        budget = gevent.spawn(deadline.bind(self._client.get_budget))
+        queue = gevent.spawn(deadline.bind(self._client.get_print_queue))
+        gevent.joinall([budget, queue])
+        errors = [greenlet.exception for greenlet in (budget, queue)
+                  if greenlet.exception is not None]
+        if errors:
+            printstatus._raise_most_severe(errors)
+        return budget.value, queue.value
+
+
+def _make_client(username, password):
+    return _AsyncUniflowClient(printstatus.get_uniflow_client(username,
+                                                              password))
+
+
+def _spawn(func, *args):
+    return _get_pool().spawn(deadline.bind(func), *args)
+
+
+def _get_pool():
+    global _pool
+    if gevent is None:
+        raise RuntimeError('gevent is required for asynchronous uniFLOW clients.')
+    if not gevent.monkey.is_module_patched('socket'):
+        raise RuntimeError('Sockets must be patched by gevent.monkey, or '
+                           'uniFLOW requests would block the event loop.')
+    if _pool is None:
+        _pool = gevent.pool.Pool(_pool_size)
+    return _pool
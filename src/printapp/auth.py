@@ -3,6 +3,8 @@
 import threading
 from time import sleep, time
 import requests
+import deadline
+import httpsessions
 
 class ClientLoginAuth(object):
     """
@@ -123,11 +125,12 @@ class OAuth2(object):
         with self.lock:
             if not self.expired:
                 return
-        r = requests.post(self.token_endpoint, data={
+        r = httpsessions.post(self.token_endpoint, data={
             "client_id": self.client_id,
             "client_secret": self.client_secret,
             "refresh_token": self.refresh_token,
-            "grant_type": "refresh_token"}).json
+            "grant_type": "refresh_token"},
+            timeout=deadline.timeout()).json()
         self.access_token = r['access_token']
         self.expired = False
         self.token_type = r['token_type']
@@ -163,9 +166,9 @@ class OAuth2(object):
             }
 
         """
-        r = requests.post(cls.device_code_endpoint, data={
+        r = httpsessions.post(cls.device_code_endpoint, data={
                 "client_id": client_id,
-                "scope": cls.scope}).json
+                "scope": cls.scope}).json()
         yield (r['verification_url'], r['user_code'])
 
         previous = 0
@@ -181,12 +184,12 @@ class OAuth2(object):
             sleep(max(interval - (now - previous), 0))
             previous = now
 
-            r = requests.post(cls.token_endpoint, data={
+            r = httpsessions.post(cls.token_endpoint, data={
                     "client_id": client_id,
                     "client_secret": client_secret,
                     "code": device_code,
                     "grant_type": "http://oauth.net/grant_type/device/1.0",
-                }).json
+                }).json()
 
             if "error" in r:
                 # Either we're polling too fast, or the user hasn't accepted yet.
@@ -0,0 +1,168 @@
+"""Load tests the whole print path of the app against the fake uniFLOW
+server in `fakeuniflow.py` and the fake cloud print server in
+`fakecloudprint.py`.
+
+Each client thread signs in as its own user and repeats a session: log in,
+upload a document, print it, poll its status until it is done, fetch the
+print queue and delete a job from it. The throughput and latency of each
+endpoint are reported at the end.
+
+Usage (from the `src` directory):
+
+    python -m printapp.benchmark.loadtest [sessions] [concurrency] [processing delay] [failure rate]
+
+sessions - sessions in total (default 50)
+concurrency - number of client threads (default 8)
+processing delay - seconds the fake cloud print takes per job (default 2)
+failure rate - fraction of print jobs which fail (default 0)
+"""
+import sys
+import threading
+import time
+from StringIO import StringIO
+import flask
+from oauth2client.client import OAuth2Credentials
+import fakecloudprint
+import fakeuniflow
+from printapp import app, mongo, oauthcredentials, printstatus, client
+from printapp.benchmark import stats
+
+DOCUMENT = 'Load test page.\n' * 2000
+POLL_INTERVAL = 0.25
+POLL_LIMIT = 240
+
+
+def _make_email(thread_number):
+    return 'loadtest{}@students.calvin.edu'.format(thread_number)
+
+
+class LoadTest(object):
+    """Runs sessions through the Flask test client, with one client and user
+    per thread, and records the latency of each request by endpoint.
+    """
+
+    def __init__(self, concurrency):
+        self.latencies = {}
+        self.errors = {}
+        self.print_states = {}
+        self._lock = threading.Lock()
+        self._clients = [app.test_client() for i in range(concurrency)]
+        with app.app_context():
+            for i in range(concurrency):
+                token = 'loadtest{}'.format(i)
+                credentials = OAuth2Credentials(token, token, token, token,
+                                                None, token, token)
+                oauthcredentials._save_credentials(_make_email(i), credentials)
+
+    def remove_users(self):
+        with app.app_context():
+            for i in range(len(self._clients)):
+                mongo.db.credentials.remove({'email': _make_email(i)})
+
+    def __call__(self, thread_number):
+        app_client = self._clients[thread_number]
+        self._request(app_client, 'login', 200, 'post', '/api/login', data={
+            'email': _make_email(thread_number), 'password': 'password'})
+
+        response = self._request(app_client, 'upload', 201, 'post',
+                                 '/api/upload', data={
+            'file': (StringIO(DOCUMENT), 'loadtest.txt')})
+        file_id = flask.json.loads(response.data)['file_id']
+
+        response = self._request(app_client, 'print', 202, 'post', '/api/print',
+                                 data={'file_id': file_id, 'copies': '1',
+                                       'color': 'false', 'collate': 'true',
+                                       'double_sided': 'false',
+                                       'staple': 'false'})
+        print_id = flask.json.loads(response.data)['print_id']
+        state = self._wait_for_print_job(app_client, print_id)
+        with self._lock:
+            self.print_states[state] = self.print_states.get(state, 0) + 1
+
+        response = self._request(app_client, 'uniflowstatus', 200, 'get',
+                                 '/api/uniflowstatus')
+        queue = flask.json.loads(response.data)['queue']
+        if queue:
+            self._request(app_client, 'deletejob', 200, 'post',
+                          '/api/deletejob/{}'.format(queue[0]['job_id']))
+
+    def _wait_for_print_job(self, app_client, print_id):
+        for i in range(POLL_LIMIT):
+            response = self._request(app_client, 'printstatus', 200, 'get',
+                                     '/api/printstatus/{}'.format(print_id))
+            state = flask.json.loads(response.data)['state']
+            if state in ('done', 'failed'):
+                return state
+            time.sleep(POLL_INTERVAL)
+        return 'timed out'
+
+    def _request(self, app_client, name, expected_status, method, url, **kwargs):
+        """Makes a request, recording its latency under `name`.
+
+        Raises a RuntimeError, ending the session, if the response does not
+        have the expected status code.
+        """
+        start = time.time()
+        response = getattr(app_client, method)(url, **kwargs)
+        latency = time.time() - start
+        with self._lock:
+            if response.status_code == expected_status:
+                self.latencies.setdefault(name, []).append(latency)
+            else:
+                self.errors.setdefault(name, []).append(response.status_code)
+        if response.status_code != expected_status:
+            raise RuntimeError('{} {} returned {}'.format(
+                method.upper(), url, response.status_code))
+        return response
+
+
+def main(sessions=50, concurrency=8, processing_delay=2, failure_rate=0):
+    uniflow_server = fakeuniflow.start_server(fakeuniflow.FakeUniflow(jobs=20))
+    cloudprint = fakecloudprint.FakeCloudPrint(processing_delay=processing_delay,
+                                               failure_rate=failure_rate)
+    cloudprint_server = fakecloudprint.start_server(cloudprint)
+    printstatus.set_base_url(uniflow_server.url)
+    client.set_base_url(cloudprint_server.url)
+    app.config['TESTING'] = True
+    # Every session logs in again, which the login rate limit would reject.
+    rate_limits = app.config['RATE_LIMITS']
+    app.config['RATE_LIMITS'] = {}
+
+    print '{} sessions, {} threads, {}s processing delay, {} failure rate'.format(
+        sessions, concurrency, processing_delay, failure_rate)
+    load_test = LoadTest(concurrency)
+    try:
+        latencies, errors, elapsed = stats.run(load_test, sessions, concurrency)
+    finally:
+        load_test.remove_users()
+        app.config['RATE_LIMITS'] = rate_limits
+
+    print stats.format_header()
+    print stats.format_report('session', latencies, errors, elapsed)
+    for name in sorted(set(load_test.latencies) | set(load_test.errors)):
+        print stats.format_report('  ' + name,
+                                  sorted(load_test.latencies.get(name, [])),
+                                  load_test.errors.get(name, []), elapsed)
+    print 'Print jobs: {}'.format(', '.join(
+        '{} {}'.format(count, state)
+        for state, count in sorted(load_test.print_states.items())))
+    print '{} cloud print requests, {} uniFLOW requests'.format(
+        cloudprint.request_count, uniflow_server.uniflow.request_count)
+    for err in errors[:5]:
+        print 'Error: {}'.format(err)
+
+    uniflow_server.shutdown()
+    cloudprint_server.shutdown()
+
+
+if __name__ == '__main__':
+    usage = ('Usage: {} [sessions] [concurrency] [processing delay] '
+             '[failure rate]').format(sys.argv[0])
+    if len(sys.argv) > 5:
+        print usage
+    else:
+        args = [int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+                int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+                float(sys.argv[3]) if len(sys.argv) > 3 else 2,
+                float(sys.argv[4]) if len(sys.argv) > 4 else 0]
+        main(*args)
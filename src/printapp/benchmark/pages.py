@@ -0,0 +1,89 @@
+"""Generates pages which look like the pages served by uniFLOW.
+
+Used by the benchmarks to exercise the scrapers without a uniFLOW server.
+"""
+import random
+
+_PRINTERS = ['HL102-ITC-LSR1', 'HL102-ITC-LSRCOLOR', 'HL102-ITC-MFDCOLOR',
+             'HL120-CIT-LSR1', 'HL121-CIT-LSRCOLOR']
+
+_QUEUE_PAGE = u'''<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.01 Transitional//EN">
+<html>
+<head>
+<title>uniFLOW Print Queue</title>
+<meta http-equiv="Content-Type" content="text/html; charset=utf-8">
+<script type="text/javascript">
+  var g_strUrl = "dispObjects.asp?mmtype=login&smtype=&token={token}";
+  function c_OnSelectJob(id) {{ document.forms[0][id].checked = true; }}
+</script>
+</head>
+<body>
+<div id="divHeader"><table><tr><td class="Header">uniFLOW</td></tr></table></div>
+<div id="divMenu">{menu}</div>
+<div id="divMain">
+<form method="post" action="dispObjects.asp">
+<table class="List">
+<tr><td class="Title">Name</td><td class="Title">Pages</td><td class="Title">Copies</td><td class="Title">Price</td><td class="Title">Printer</td><td class="Title">Status</td><td class="Title">Date</td></tr>
+{rows}
+</table>
+</form>
+</div>
+<div id="divFooter">{footer}</div>
+</body>
+</html>
+'''
+
+_QUEUE_ROW = (u'<tr><td class="Middle" onclick="c_OnSelectJob(\'{job_id}\')">{name}</td>'
+              u'<td class="Middle">{pages}</td><td class="Middle">{copies}</td>'
+              u'<td class="Middle">{price:.4f}</td><td class="Middle">{printer}</td>'
+              u'<td class="Middle">Waiting</td><td class="Middle">{date}</td></tr>')
+
+_BUDGET_PAGE = u'''<!DOCTYPE HTML PUBLIC "-//W3C//DTD HTML 4.01 Transitional//EN">
+<html>
+<head>
+<title>uniFLOW Budget</title>
+<script type="text/javascript">top.c_updateToken("{token}");</script>
+</head>
+<body>
+<div id="divMain">
+<p>Your current budget is: <font class="editHeadline">{budget:.2f}</font></p>
+</div>
+</body>
+</html>
+'''
+
+
+def make_print_jobs(num_jobs, seed=0):
+    """Returns a list of `num_jobs` dicts describing random print jobs."""
+    rand = random.Random(seed)
+    jobs = []
+    for i in range(num_jobs):
+        pages = rand.randint(1, 40)
+        copies = rand.randint(1, 3)
+        price_per_page = rand.choice([0.0255, 0.0205, 0.255, 0.25])
+        jobs.append({
+            'job_id': '{{{:08X}-0000-0000-0000-{:012X}}}'.format(seed, i),
+            'name': 'document-{}.pdf'.format(i),
+            'pages': pages,
+            'copies': copies,
+            'price': price_per_page * pages * copies,
+            'printer': rand.choice(_PRINTERS),
+            'date': '10/{:02d}/2014 {:02d}:{:02d}'.format(rand.randint(1, 30),
+                                                        rand.randint(0, 23),
+                                                        rand.randint(0, 59)),
+        })
+    return jobs
+
+
+def make_queue_page(jobs, token='TOKEN'):
+    """Returns the html of a print queue page (dispObjects.asp)."""
+    rows = u'\n'.join(_QUEUE_ROW.format(**job) for job in jobs)
+    padding = u'\n'.join(u'<a href="#">Menu item {}</a>'.format(i)
+                         for i in range(50))
+    return _QUEUE_PAGE.format(token=token, rows=rows, menu=padding,
+                              footer=padding)
+
+
+def make_budget_page(budget, token='TOKEN'):
+    """Returns the html of a budget page (dispBudget.asp)."""
+    return _BUDGET_PAGE.format(token=token, budget=budget)
@@ -0,0 +1,60 @@
+"""Compares the print queue parser against the BeautifulSoup based parser
+it replaced.
+
+Usage:
+
+    python -m printapp.benchmark.queueparser
+"""
+import re
+import timeit
+from bs4 import BeautifulSoup
+from printapp import printstatus
+from printapp.benchmark import pages
+
+JOB_COUNTS = [10, 100, 1000]
+
+
+def parse_with_beautifulsoup(text):
+    """The original parser of `_QueueScraper.fetch_data`."""
+    soup = BeautifulSoup(text, 'lxml')
+    title = soup.find('title')
+    if title is None:
+        raise printstatus.ScrapingError("Page has no title.")
+    print_job_tags = soup.select('#divMain tr td.Middle')
+    print_jobs = []
+    for j in range(0, len(print_job_tags) / 7 * 7, 7):
+        job_id = re.search(r"c_OnSelectJob\('(.*)'\)", unicode(print_job_tags[0 + j]['onclick'])).group(1)
+        name = unicode(print_job_tags[0 + j].string)
+        pages = int(print_job_tags[1 + j].string)
+        copies = int(print_job_tags[2 + j].string)
+        price = float(print_job_tags[3 + j].string)
+        printer_name = unicode(print_job_tags[4 + j].string)
+        date = unicode(print_job_tags[6 + j].string)
+        print_jobs.append(printstatus.PrintJob(job_id, name, pages, copies,
+                                               price, printer_name, date))
+    return print_jobs
+
+
+def _best_time(func, text, repeat=5):
+    number = max(1, 2000 / (len(text) / 1000 + 1))
+    timer = timeit.Timer(lambda: func(text))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    print '{:>6} {:>14} {:>14} {:>8}'.format('jobs', 'soup (ms)', 'parser (ms)',
+                                             'speedup')
+    for count in JOB_COUNTS:
+        text = pages.make_queue_page(pages.make_print_jobs(count))
+        expected = parse_with_beautifulsoup(text)
+        if printstatus._parse_print_queue(text) != expected:
+            raise AssertionError('Parsers disagree for {} jobs.'.format(count))
+
+        soup_time = _best_time(parse_with_beautifulsoup, text)
+        parser_time = _best_time(printstatus._parse_print_queue, text)
+        print '{:>6} {:>14.3f} {:>14.3f} {:>7.1f}x'.format(
+            count, soup_time * 1000, parser_time * 1000, soup_time / parser_time)
+
+
+if __name__ == '__main__':
+    main()
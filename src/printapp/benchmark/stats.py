@@ -0,0 +1,74 @@
+"""Runs a function from several threads and reports its throughput and
+latency percentiles.
+"""
+import threading
+import time
+
+PERCENTILES = [50, 90, 99]
+
+
+def percentile(sorted_values, percent):
+    """Returns the value below which `percent` percent of the values fall.
+    """
+    if not sorted_values:
+        return None
+    index = int(round(percent / 100.0 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def run(func, requests, concurrency):
+    """Calls `func(thread_number)` `requests` times from `concurrency`
+    threads.
+
+    Returns a `(latencies, errors, elapsed)` tuple, where latencies is a
+    sorted list of seconds per successful call.
+    """
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker(thread_number):
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            start = time.time()
+            try:
+                func(thread_number)
+            except Exception as err:
+                with lock:
+                    errors.append(err)
+                continue
+            latency = time.time() - start
+            with lock:
+                latencies.append(latency)
+
+    threads = [threading.Thread(target=worker, args=(i,))
+               for i in range(concurrency)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), errors, time.time() - start
+
+
+def format_header():
+    columns = ['{:>7}'.format('p{}'.format(p)) for p in PERCENTILES]
+    return '{:<32} {:>8} {:>7} {} {:>6}'.format(
+        'benchmark', 'req/s', 'mean', ' '.join(columns), 'errors')
+
+
+def format_report(name, latencies, errors, elapsed):
+    """Returns a line with the throughput, and the mean and percentile
+    latencies in milliseconds.
+    """
+    count = len(latencies)
+    throughput = count / elapsed if elapsed else 0
+    mean = sum(latencies) / count * 1000 if count else 0
+    columns = ['{:>7.1f}'.format((percentile(latencies, p) or 0) * 1000)
+               for p in PERCENTILES]
+    return '{:<32} {:>8.1f} {:>7.1f} {} {:>6}'.format(
+        name, throughput, mean, ' '.join(columns), len(errors))
@@ -0,0 +1,124 @@
+"""Benchmarks the uniFLOW scrapers and the `/api/uniflowstatus` endpoint
+against the fake uniFLOW server in `fakeuniflow.py`.
+
+Usage (from the `src` directory):
+
+    python -m printapp.benchmark.uniflow [jobs] [latency] [requests] [concurrency]
+
+jobs - print jobs in each queue (default 100)
+latency - seconds of latency the fake server adds to each response (default 0.05)
+requests - requests per benchmark (default 200)
+concurrency - number of client threads (default 8)
+"""
+import sys
+import fakeuniflow
+import printapp
+from printapp import app, api, printstatus
+from printapp.benchmark import stats
+
+
+def _make_username(thread_number):
+    return 'benchmark{}'.format(thread_number)
+
+
+def bench_sign_in(thread_number):
+    """A new client for every call: signs in to both uniFLOW apps."""
+    username = _make_username(thread_number)
+    printstatus.discard_uniflow_client(username)
+    printstatus.get_uniflow_client(username, 'password')
+
+
+def bench_cold_status(thread_number):
+    """Signs in, then fetches the budget and queue."""
+    username = _make_username(thread_number)
+    printstatus.discard_uniflow_client(username)
+    uniflow = printstatus.get_uniflow_client(username, 'password')
+    uniflow.get_budget_and_print_queue()
+
+
+def bench_pooled_status(thread_number):
+    """Fetches the budget and queue with a pooled client."""
+    uniflow = printstatus.get_uniflow_client(_make_username(thread_number),
+                                             'password')
+    uniflow.get_budget_and_print_queue()
+
+
+def bench_pooled_sequential_status(thread_number):
+    """Fetches the budget and then the queue with a pooled client."""
+    uniflow = printstatus.get_uniflow_client(_make_username(thread_number),
+                                             'password')
+    uniflow.get_budget()
+    uniflow.get_print_queue()
+
+
+class EndpointBenchmark(object):
+    """Calls `/api/uniflowstatus` through the Flask test client, with one
+    signed in client per thread.
+    """
+
+    def __init__(self, concurrency):
+        self._clients = []
+        for i in range(concurrency):
+            client = app.test_client()
+            client.post('/api/login', data={
+                'email': '{}@students.calvin.edu'.format(_make_username(i)),
+                'password': 'password'})
+            self._clients.append(client)
+
+    def __call__(self, thread_number):
+        response = self._clients[thread_number].get('/api/uniflowstatus')
+        if response.status_code != 200:
+            raise RuntimeError('Status code {}'.format(response.status_code))
+
+
+def main(jobs=100, latency=0.05, requests=200, concurrency=8):
+    uniflow = fakeuniflow.FakeUniflow(jobs=jobs, latency=latency)
+    server = fakeuniflow.start_server(uniflow)
+    printstatus.set_base_url(server.url)
+    app.config['TESTING'] = True
+    cache_ttl = api._uniflow_cache.ttl
+    # Every thread fetches its status repeatedly, which the rate limits
+    # would reject.
+    rate_limits = app.config['RATE_LIMITS']
+    app.config['RATE_LIMITS'] = {}
+
+    print '{} jobs per queue, {}s upstream latency, {} requests, {} threads'.format(
+        jobs, latency, requests, concurrency)
+    print stats.format_header()
+    benchmarks = [
+        ('sign in', bench_sign_in),
+        ('status, new client', bench_cold_status),
+        ('status, pooled client', bench_pooled_status),
+        ('status, pooled, sequential', bench_pooled_sequential_status),
+    ]
+    for name, func in benchmarks:
+        start_count = uniflow.request_count
+        latencies, errors, elapsed = stats.run(func, requests, concurrency)
+        print '{}  ({:.1f} upstream requests each)'.format(
+            stats.format_report(name, latencies, errors, elapsed),
+            (uniflow.request_count - start_count) / float(requests))
+
+    endpoint = EndpointBenchmark(concurrency)
+    for name, ttl in [('/api/uniflowstatus, no cache', 0),
+                      ('/api/uniflowstatus, cached', cache_ttl)]:
+        api._uniflow_cache.ttl = ttl
+        start_count = uniflow.request_count
+        latencies, errors, elapsed = stats.run(endpoint, requests, concurrency)
+        print '{}  ({:.1f} upstream requests each)'.format(
+            stats.format_report(name, latencies, errors, elapsed),
+            (uniflow.request_count - start_count) / float(requests))
+    api._uniflow_cache.ttl = cache_ttl
+    app.config['RATE_LIMITS'] = rate_limits
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    usage = 'Usage: {} [jobs] [latency] [requests] [concurrency]'.format(sys.argv[0])
+    if len(sys.argv) > 5:
+        print usage
+    else:
+        args = [int(sys.argv[1]) if len(sys.argv) > 1 else 100,
+                float(sys.argv[2]) if len(sys.argv) > 2 else 0.05,
+                int(sys.argv[3]) if len(sys.argv) > 3 else 200,
+                int(sys.argv[4]) if len(sys.argv) > 4 else 8]
+        main(*args)
@@ -0,0 +1,147 @@
+"""A small in-process cache with expiring entries.
+"""
+import threading
+import time
+
+
+class TTLCache(object):
+    """A thread safe mapping whose entries expire `ttl` seconds after they
+    were stored.
+
+    Lookups are counted as hits or misses; see `stats()`.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # key -> (value, time stored)
+        self._entries = {}
+        # key -> number of times the entry was invalidated or updated while
+        # it was being loaded
+        self._generations = {}
+        # key -> number of loads running
+        self._running = {}
+        # key -> Event which is set when a running load finishes
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the value stored for `key`, or None if there is none or
+        it has expired.
+        """
+        with self._lock:
+            return self._get(key, time.time())
+
+    def get_or_load(self, key, load):
+        """Returns the value stored for `key`, calling `load()` to produce
+        and store it if it is missing.
+
+        Concurrent calls for the same key share one call to `load()`; the
+        others wait for it and return the value it stored.
+
+        `load` is called without holding the lock. If the entry is
+        invalidated or updated while `load` runs, the loaded value is
+        returned but not stored, so a stale value never overwrites a newer
+        change.
+        """
+        with self._lock:
+            value = self._get(key, time.time())
+            if value is not None:
+                return value
+            loading = self._loading.get(key)
+            if loading is None:
+                self._loading[key] = threading.Event()
+                generation = self._start_load(key)
+
+        if loading is not None:
+            loading.wait()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and time.time() - entry[1] <= self.ttl:
+                    return entry[0]
+                generation = self._start_load(key)
+            # The shared load failed or its value was dropped.
+            return self._load(key, load, generation)
+
+        try:
+            return self._load(key, load, generation)
+        finally:
+            with self._lock:
+                self._loading.pop(key).set()
+
+    def set(self, key, value):
+        with self._lock:
+            self._bump(key)
+            self._evict(time.time())
+            self._entries[key] = (value, time.time())
+
+    def update(self, key, func):
+        """Replaces the stored value with `func(value)`, if there is one.
+
+        The entry keeps its original expiry time.
+        """
+        with self._lock:
+            self._bump(key)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (func(entry[0]), entry[1])
+
+    def invalidate(self, key):
+        with self._lock:
+            self._bump(key)
+            self._entries.pop(key, None)
+
+    def stats(self):
+        """Returns a dict with the number of hits, misses and entries."""
+        with self._lock:
+            self._evict(time.time())
+            return {'hits': self.hits, 'misses': self.misses,
+                    'size': len(self._entries)}
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and now - entry[1] <= self.ttl:
+            self.hits += 1
+            return entry[0]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def _start_load(self, key):
+        """Counts a load of `key` as running, returning its generation."""
+        self._running[key] = self._running.get(key, 0) + 1
+        return self._generations.get(key, 0)
+
+    def _load(self, key, load, generation):
+        """Calls `load()` for a load counted by `_start_load`."""
+        try:
+            value = load()
+        except Exception:
+            with self._lock:
+                self._end_load(key)
+            raise
+        with self._lock:
+            if self._generations.get(key, 0) == generation:
+                self._evict(time.time())
+                self._entries[key] = (value, time.time())
+            self._end_load(key)
+        return value
+
+    def _end_load(self, key):
+        self._running[key] -= 1
+        if not self._running[key]:
+            # Generations only matter to running loads.
+            del self._running[key]
+            self._generations.pop(key, None)
+
+    def _bump(self, key):
+        if key in self._running:
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def _evict(self, now):
+        expired = [key for key, (_, stored) in self._entries.iteritems()
+                   if now - stored > self.ttl]
+        for key in expired:
+            del self._entries[key]
@@ -4,11 +4,25 @@ import json
 import mimetypes
 from os.path import basename
 import requests
+import httpsessions
+import multipart
 
 
 CLOUDPRINT_URL = "https://www.google.com/cloudprint"
 
 
+def set_base_url(url):
+    """
+    Points the client at another cloud print server, such as the one in
+    `fakecloudprint.py`.
+
+    :param url: base URL of the API, without a trailing slash
+    :type  url: string
+    """
+    global CLOUDPRINT_URL
+    CLOUDPRINT_URL = url.rstrip("/")
+
+
 def get_job(id, printer=None, **kwargs):
     """
     Returns the data for a single job.
@@ -38,7 +52,7 @@ def delete_job(id, **kwargs):
     :returns: API response data as `dict`, or the HTTP response on failure
     """
     url = CLOUDPRINT_URL + "/deletejob"
-    r = requests.post(url, data={"jobid": id}, **kwargs)
+    r = httpsessions.post(url, data={"jobid": id}, **kwargs)
     return r.json() if r.status_code == requests.codes.ok else r
 
 
@@ -61,7 +75,7 @@ def list_jobs(printer=None, **kwargs):
     if printer is not None:
         params["printerid"] = printer
     url = CLOUDPRINT_URL + "/jobs"
-    r = requests.get(url, params=params, **kwargs)
+    r = httpsessions.get(url, params=params, **kwargs)
     if r.status_code != requests.codes.ok:
         raise PrintingError("Invalid HTTP status code: {}".format(r.status_code))
     # At the time of writing, the `/jobs` API returns `Content-Type:
@@ -82,7 +96,7 @@ def list_printers(**kwargs):
 
     """
     url = CLOUDPRINT_URL + "/search"
-    r = requests.get(url, **kwargs)
+    r = httpsessions.get(url, **kwargs)
     if r.status_code != requests.codes.ok:
         return r
     return r.json()
@@ -114,27 +128,35 @@ def submit_job(printer, content, ticket, title=None, tags=None,
     See https://developers.google.com/cloud-print/docs/appInterfaces#submit for
     details.
     """
-    # normalise *content* to bytes, and *name* to a string
+    # normalise *content* to a file, and *name* to a string. The file is
+    # read as the request is sent; see `multipart.MultipartEncoder`.
     if isinstance(content, (list, tuple)):
         name = content[0]
-        content = content[1].read()
+        content = content[1]
+        opened = None
     else:
         name = basename(content)
-        with open(content, 'rb') as f:
-            content = f.read()
+        content = opened = open(content, 'rb')
 
     if title is None:
         title = name
 
-    files = {"content": (name, content)}
-    data = {"printerid": printer,
-            "title": title,
-            "ticket": ticket,
-            "contentType": mimetypes.guess_type(name)[0]}
+    content_type = mimetypes.guess_type(name)[0]
+    fields = [("printerid", printer),
+              ("title", title),
+              ("ticket", ticket),
+              ("contentType", content_type)]
     if tags:
-        data['tag'] = tags
+        fields.append(("tag", tags))
     url = CLOUDPRINT_URL + "/submit"
-    r = requests.post(url, data=data, files=files, **kwargs)
+    try:
+        body = multipart.MultipartEncoder(
+            fields, [("content", name, content, content_type)])
+        headers = {"Content-Type": body.content_type}
+        r = httpsessions.post(url, data=body, headers=headers, **kwargs)
+    finally:
+        if opened is not None:
+            opened.close()
     if r.status_code != requests.codes.ok:
         raise PrintingError("Invalid HTTP status code: {}".format(r.status_code))
     return r.json()
@@ -2,18 +2,31 @@
 import os
 import json
 import time
+import random
+import requests
 import client
 import auth
+import deadline
+import metrics
 
-CLOUDPRINT_URL = 'https://www.google.com/cloudprint'
 UNIFLOW_ID = '7b30c56e-08f1-e90a-7fc8-ed11099a4a72'
 
-def submit_job(token, file, color=False, duplex=False, copies=1, collate=True, staple=False):
+# Seconds between polls for the status of a submitted job, and the seconds
+# after which a job which is still queued is left to Google.
+_polling = {'initial_interval': 0.5, 'max_interval': 5, 'timeout': 30}
+
+def submit_job(token, file, color=False, duplex=False, copies=1, collate=True, staple=False,
+               on_submitted=None):
     """Submits a print job to the uniFLOW printer.
 
     Token is an oauth token.
     File is a file-like object to be printed.
     Duplex means double sided.
+    on_submitted is an optional function, called without arguments once
+    Google has accepted the job and before waiting for Google to process it.
+
+    Raises JobSubmissionError if Google rejects the job, and
+    UpstreamTimeoutError on timeout or if Google cannot be reached.
     """
     file_name = os.path.basename(file.name)
     content = [file_name, file]
@@ -22,10 +35,16 @@ def submit_job(token, file, color=False, duplex=False, copies=1, collate=True, s
                                       copies=copies, collate=collate,
                                       staple=staple)
     try:
-        job = client.submit_job(printer=UNIFLOW_ID, content=content, 
-                                ticket=print_ticket, auth=oauth)
+        with metrics.time_upstream('google', 'submit_job'):
+            job = client.submit_job(printer=UNIFLOW_ID, content=content, 
+                                    ticket=print_ticket, auth=oauth,
+                                    timeout=deadline.timeout())
     except client.PrintingError as err:
         raise JobSubmissionError(err)
+    except (deadline.DeadlineExceededError,
+            requests.exceptions.RequestException) as err:
+        # Timeouts, and Google being unreachable.
+        raise UpstreamTimeoutError(err)
 
     if job.get('success', False) == False:
         raise JobSubmissionError('Error submitting the print job to Google.')
@@ -35,6 +54,8 @@ def submit_job(token, file, color=False, duplex=False, copies=1, collate=True, s
     except KeyError as err:
         raise JobSubmissionError(err)
 
+    if on_submitted is not None:
+        on_submitted()
     _wait_for_job_processing(auth=oauth, job_id=job_id)
 
 
@@ -44,6 +65,9 @@ def has_uniflow_printer(token):
 
         Params:
     token - oauth token.
+
+    Raises UpstreamTimeoutError on timeout or if Google cannot be reached, and
+    UpstreamError if Google answers with an error.
     """
     # for use with 'fakeoauth.py' testing utility
     if token == 'fakeoauth.py':
@@ -52,12 +76,32 @@ def has_uniflow_printer(token):
         return False
 
     oauth = auth.OAuth2(access_token=token, token_type='Bearer')
-    printers = client.list_printers(auth=oauth)['printers']
-    for printer in printers:
-        id = printer.get('id')
-        if id == UNIFLOW_ID:
-            return True
-    return False
+    try:
+        with metrics.time_upstream('google', 'list_printers'):
+            response = client.list_printers(auth=oauth,
+                                            timeout=deadline.timeout())
+    except (deadline.DeadlineExceededError,
+            requests.exceptions.RequestException) as err:
+        # Timeouts, and Google being unreachable.
+        raise UpstreamTimeoutError(err)
+    # On HTTP errors, list_printers returns the response instead of a dict.
+    if not isinstance(response, dict) or 'printers' not in response:
+        raise UpstreamError('Error listing printers: {}'.format(
+            getattr(response, 'status_code', response)))
+    return any(printer.get('id') == UNIFLOW_ID
+               for printer in response['printers'])
+
+
+def configure_job_polling(initial_interval=None, max_interval=None,
+                          timeout=None):
+    """Sets how often the status of a submitted job is polled: first after
+    `initial_interval` seconds, then backing off to every `max_interval`
+    seconds, for at most `timeout` seconds.
+    """
+    for key, value in [('initial_interval', initial_interval),
+                       ('max_interval', max_interval), ('timeout', timeout)]:
+        if value is not None:
+            _polling[key] = value
 
 
 def _make_print_ticket(color=False, duplex=False, copies=1, collate=True, staple=False):
@@ -114,35 +158,68 @@ def _wait_for_job_processing(auth, job_id):
     """Check the print history to see if Google correctly processed
     the print job with corresponding 'job_id'.
 
+    Polls the jobs of the uniFLOW printer with exponentially growing, jittered
+    intervals (see `configure_job_polling`). Returns once the job is done, or
+    when the polling timeout passes with the job still in Google's queue.
+
         Params:
     auth - OAuth2 object
     job_id - string, id of print job.
     """
-    time.sleep(1)
-    error_free = False
-    num_tried = 0
-    while num_tried < 29 and error_free == False:
-        time.sleep(1)
-        num_tried += 1
+    stop_polling = time.time() + _polling['timeout']
+    for interval in _poll_intervals(_polling['initial_interval'],
+                                    _polling['max_interval']):
+        try:
+            wait = min(interval, stop_polling - time.time(), deadline.remaining())
+        except deadline.DeadlineExceededError as err:
+            raise UpstreamTimeoutError(err)
+        if wait <= 0:
+            return
+        time.sleep(wait)
+
         try:
-            job_history = client.list_jobs(auth=auth)['jobs']
+            with metrics.time_upstream('google', 'list_jobs'):
+                jobs = client.list_jobs(printer=UNIFLOW_ID, auth=auth,
+                                        timeout=deadline.timeout())['jobs']
         except client.PrintingError as err:
             raise JobSubmissionError(err)
+        except (deadline.DeadlineExceededError,
+                requests.exceptions.RequestException) as err:
+            raise UpstreamTimeoutError(err)
         except KeyError as err:
             raise JobSubmissionError(err)
-        for job in job_history:
-            try:
-                id = job['id']
-            except KeyError as err:
-                raise JobSubmissionError(err)
-            if id == job_id:
-                if job.get('status', 'ERROR') == 'ERROR':
-                    raise JobSubmissionError('Google could not correctly ' 
-                                             + 'process the file submitted.')
-                elif job.get('status') == 'DONE':
-                    error_free = True
-                    break
+
+        # Jobs are listed newest first, so the scan usually stops at the
+        # first job.
+        job = next((job for job in jobs if job.get('id') == job_id), None)
+        if job is None:
+            continue
+        if job.get('status', 'ERROR') == 'ERROR':
+            raise JobSubmissionError('Google could not correctly '
+                                     + 'process the file submitted.')
+        elif job.get('status') == 'DONE':
+            return
+
+
+def _poll_intervals(initial_interval, max_interval):
+    """Yields the seconds to wait before each poll: `initial_interval`, then
+    twice as long each time up to `max_interval`. Each interval is shortened
+    by up to half at random, so that jobs submitted together are not polled
+    together.
+    """
+    interval = initial_interval
+    while True:
+        yield interval * random.uniform(0.5, 1)
+        interval = min(interval * 2, max_interval)
 
 
 class JobSubmissionError(Exception):
     pass
+
+class UpstreamTimeoutError(Exception):
+    """Google did not answer before the request deadline."""
+    pass
+
+class UpstreamError(Exception):
+    """Google answered with an error."""
+    pass
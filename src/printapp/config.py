@@ -8,6 +8,98 @@ PRINTPRICES = [
 
 LOGFILE = 'calvinwebprint.log'
 
+# Seconds a request may spend waiting on uniFLOW, Google and the database
+# before failing with a 504.
+REQUEST_DEADLINE = 45
+
+UNIFLOW_URL = 'https://uniflow.calvin.edu/'
+# Base URL of the Google Cloud Print API. Point it at `fakecloudprint.py`,
+# e.g. 'http://localhost:5003/cloudprint', to test without Google.
+CLOUDPRINT_URL = 'https://www.google.com/cloudprint'
+# Connections to Google are kept alive and shared between threads:
+# HTTP_POOL_MAXSIZE per host, or the size in HTTP_POOL_SIZES for URLs which
+# start with its key. Cloud print is called from the status and print threads.
+HTTP_POOL_MAXSIZE = 10
+HTTP_POOL_SIZES = {
+    'https://www.google.com/': 24
+}
+# Once the uniFLOW printer is found on a user's cloud print account, it is
+# not looked for again with the same oauth token for PRINTER_CACHE_TTL seconds.
+# 'memory' remembers it per process; 'mongo' also records it with the user's
+# credentials, shared between processes. Missing printers are not cached, so
+# a newly installed printer is found right away.
+PRINTER_CACHE_TTL = 60 * 60
+PRINTER_CACHE_STORAGE = 'memory'
+# Signed in uniFLOW sessions are pooled per user. Sessions unused for
+# UNIFLOW_SESSION_IDLE_TTL seconds are dropped, and the least recently used
+# session is dropped when the pool is full.
+UNIFLOW_SESSION_POOL_SIZE = 200
+UNIFLOW_SESSION_IDLE_TTL = 600
+# Number of threads used to fetch print queues while the budget is fetched.
+UNIFLOW_FETCH_WORKERS = 16
+# Seconds for which a user's budget and print queue are served from a cache.
+UNIFLOW_CACHE_TTL = 10
+# Threads which fetch the budget and print queue right after a user signs
+# in, bounding how hard a burst of logins hits uniFLOW.
+UNIFLOW_WARMUP_WORKERS = 4
+# Threads which check cloud print for /api/status while it waits on uniFLOW.
+STATUS_WORKERS = 16
+# Threads which submit print jobs to Google in the background, and the
+# seconds each job may take, including waiting for Google to process it.
+PRINT_WORKERS = 8
+PRINT_JOB_DEADLINE = 60
+# Google is asked whether a submitted job is done after
+# CLOUDPRINT_POLL_INITIAL_INTERVAL seconds, then at intervals which double up
+# to CLOUDPRINT_POLL_MAX_INTERVAL seconds. Jobs still queued after
+# CLOUDPRINT_POLL_TIMEOUT seconds are left to Google.
+CLOUDPRINT_POLL_INITIAL_INTERVAL = 0.5
+CLOUDPRINT_POLL_MAX_INTERVAL = 5
+CLOUDPRINT_POLL_TIMEOUT = 30
+
+# Rate limits per user, or per client IP address without one, keyed by endpoint:
+# (requests per minute, burst). Endpoints which are not listed are not limited.
+RATE_LIMITS = {
+    'login': (10, 5),
+    'uniflowstatus': (60, 20),
+    'status': (60, 20),
+    'uniflowstream': (10, 5),
+    'deletejob': (60, 20),
+    'deletejobs': (20, 5),
+    'printjob': (20, 10)
+}
+# 'memory' keeps rate limits per process; 'mongo' shares them between
+# processes through the database.
+RATE_LIMIT_STORAGE = 'memory'
+# Sign in attempts per client IP address, over every email:
+# (requests per minute, burst).
+LOGIN_IP_RATE_LIMIT = (30, 20)
+
+# With PROFILING_ENABLED, a PROFILE_SAMPLE_RATE fraction of requests is
+# profiled, as is every request with an X-Profile header made by
+# `python profilereport.py token`. PROFILE_DIR keeps the newest
+# PROFILE_MAX_FILES profiles; summarize them with `python profilereport.py`.
+PROFILING_ENABLED = False
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_DIR = 'profiles'
+PROFILE_MAX_FILES = 200
+PROFILE_TOKEN_MAX_AGE = 24 * 60 * 60
+# /api/uniflowstream polls uniFLOW every UNIFLOW_STREAM_MIN_INTERVAL seconds
+# while the queue changes, backing off to UNIFLOW_STREAM_MAX_INTERVAL seconds.
+# Each open stream (one per browser tab) holds a WSGI worker thread or process
+# until the tab closes, so run enough workers for the expected number of open
+# tabs, or an asynchronous worker class such as `gunicorn -k gevent`.
+UNIFLOW_STREAM_MIN_INTERVAL = 3
+UNIFLOW_STREAM_MAX_INTERVAL = 30
+
+# Largest request body, in bytes, which is accepted; uploaded documents are
+# streamed into the database and rejected with a 413 once they grow larger.
+MAX_CONTENT_LENGTH = 25 * 1024 * 1024
+
+# Client IP addresses which may read /metrics and /api/cachestats; others
+# get a 403.
+# Behind a reverse proxy, list the addresses the proxy connects from.
+STATS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
 # Override these in a configuration file, then set the `PRINTAPP_SETTINGS`
 # environment variable to that file.
 # If these variables are not set, communication with google cloud print will
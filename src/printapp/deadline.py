@@ -0,0 +1,85 @@
+"""Deadlines for the calls a request makes to other services.
+
+Each request gets a deadline when it starts (see `util.py`). Calls to
+uniFLOW, Google and the oauth endpoints take their timeouts from the time
+left, so a request never waits on other services for longer than its
+deadline.
+
+The deadline is kept per thread. Work handed to other threads must be
+wrapped with `bind` to keep the deadline of the request.
+"""
+import threading
+import time
+
+# Timeouts used outside of a request, e.g. by scripts and tests.
+DEFAULT_TIMEOUT = 30
+CONNECT_TIMEOUT = 5
+
+_local = threading.local()
+
+
+class Deadline(object):
+
+    def __init__(self, seconds):
+        self.expires = time.time() + seconds
+
+    def remaining(self):
+        return self.expires - time.time()
+
+
+def start(seconds):
+    """Sets a deadline `seconds` from now for the current thread."""
+    _local.deadline = Deadline(seconds)
+    return _local.deadline
+
+
+def clear():
+    _local.deadline = None
+
+
+def current():
+    """Returns the Deadline of the current thread, or None."""
+    return getattr(_local, 'deadline', None)
+
+
+def remaining():
+    """Returns the number of seconds left.
+
+    Raises DeadlineExceededError if the deadline has passed.
+    """
+    deadline = current()
+    if deadline is None:
+        return DEFAULT_TIMEOUT
+    seconds = deadline.remaining()
+    if seconds <= 0:
+        raise DeadlineExceededError('Request deadline exceeded.')
+    return seconds
+
+
+def timeout():
+    """Returns a `(connect, read)` timeout for `requests` calls.
+
+    Raises DeadlineExceededError if the deadline has passed.
+    """
+    seconds = remaining()
+    return (min(CONNECT_TIMEOUT, seconds), seconds)
+
+
+def bind(func):
+    """Returns a function which calls `func` with the deadline of the
+    calling thread, for running `func` in another thread.
+    """
+    deadline = current()
+
+    def bound(*args, **kwargs):
+        previous = current()
+        _local.deadline = deadline
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.deadline = previous
+    return bound
+
+
+class DeadlineExceededError(Exception):
+    pass
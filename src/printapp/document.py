@@ -3,6 +3,7 @@ import pymongo
 import gridfs
 from printapp import mongo
 from bson.objectid import ObjectId
+import metrics
 
 
 def delete_document(document_id, email):
@@ -16,8 +17,9 @@ def delete_document(document_id, email):
     except TypeError as err:
         raise DatabaseError(err)
 
-    if fs.exists(_id=document_id, email=email):
-        fs.delete(document_id)
+    with metrics.time_upstream('gridfs', 'delete'):
+        if fs.exists(_id=document_id, email=email):
+            fs.delete(document_id)
 
 
 def get_document(document_id, email):
@@ -34,9 +36,10 @@ def get_document(document_id, email):
     except TypeError as err:
         raise DatabaseError(err)
     
-    if fs.exists(_id=document_id, email=email):
-        file_handle = fs.get(document_id)
-        return file_handle
+    with metrics.time_upstream('gridfs', 'get'):
+        if fs.exists(_id=document_id, email=email):
+            file_handle = fs.get(document_id)
+            return file_handle
 
 
 def save_document(file_handle, document_name, email):
@@ -55,16 +58,103 @@ def save_document(file_handle, document_name, email):
         raise DatabaseError(err)
 
     # Remove old documents until only 2 remain.
+    _remove_old_documents(fs, email, keep=2)
+
+    with metrics.time_upstream('gridfs', 'put'):
+        document_id = fs.put(file_handle, email=email, filename=document_name,
+                             timestamp=datetime.now())
+    return str(document_id)
+
+
+class DocumentWriter(object):
+    """A writable file-like object which streams a document into GridFS as
+    it is uploaded, instead of buffering the whole document first.
+
+    The document is saved when the writer is closed; its id is then
+    available as `document_id`. Like `save_document`, old documents are
+    deleted so that each user stores at most three documents.
+
+    Werkzeug seeks an uploaded file back to its start once all of it has
+    arrived; that seek marks the writer `complete`, after which nothing more
+    can be written. Any other seek raises IOError.
+
+    max_size - the largest number of bytes which may be written, or None.
+
+    Raises DatabaseError on error.
+    """
+
+    def __init__(self, document_name, email, max_size=None):
+        try:
+            self._fs = gridfs.GridFS(mongo.db, 'document_fs')
+            self._file = self._fs.new_file(email=email,
+                                           filename=document_name,
+                                           timestamp=datetime.now())
+        except TypeError as err:
+            raise DatabaseError(err)
+        self.email = email
+        self.max_size = max_size
+        self.size = 0
+        self.document_id = None
+        self.complete = False
+        self.closed = False
+
+    def write(self, data):
+        """Writes a chunk of the document.
+
+        Raises DocumentTooLargeError, after discarding everything written so
+        far, if the document grows larger than `max_size`. Raises IOError
+        once the writer is complete or closed.
+        """
+        if self.complete or self.closed:
+            raise IOError('The document is no longer writable.')
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            self.abort()
+            raise DocumentTooLargeError(self.max_size)
+        self._file.write(data)
+
+    def seek(self, offset, whence=0):
+        """Marks the writer complete. Only seeking to the start is allowed."""
+        if offset != 0 or whence != 0 or self.closed:
+            raise IOError('Documents being written can only seek to their start.')
+        self.complete = True
+
+    def close(self):
+        """Saves the document. Closing a writer more than once is allowed."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            with metrics.time_upstream('gridfs', 'put'):
+                self._file.close()
+        except TypeError as err:
+            raise DatabaseError(err)
+        self.document_id = str(self._file._id)
+        _remove_old_documents(self._fs, self.email, keep=3)
+
+    def abort(self):
+        """Discards the document and everything written so far."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            with metrics.time_upstream('gridfs', 'delete'):
+                self._fs.delete(self._file._id)
+        except TypeError as err:
+            raise DatabaseError(err)
+
+
+def _remove_old_documents(fs, email, keep):
+    """Deletes all but the `keep` most recent documents of a user."""
     try:
-        documents = fs.find( {'email': email } ).sort('timestamp', pymongo.DESCENDING).skip(2)
+        documents = fs.find( {'email': email } ).sort('timestamp', pymongo.DESCENDING).skip(keep)
     except TypeError as err:
         raise DatabaseError(err)
     for document in documents:
         fs.delete(document._id)
 
-    document_id = fs.put(file_handle, email=email, filename=document_name,
-                         timestamp=datetime.now())
-    return str(document_id)
-
 class DatabaseError(Exception):
     pass
+
+class DocumentTooLargeError(Exception):
+    pass
@@ -0,0 +1,99 @@
+"""A process wide HTTP session for the calls to Google, which keeps
+connections alive between calls and threads.
+
+`get` and `post` take the arguments of `requests.get` and `requests.post`.
+Connections are pooled per host: POOL_MAXSIZE connections are kept for each
+host, unless `configure_pools` gives the host's URL prefix another size.
+Cookies are not kept, since the session is shared by every user.
+"""
+import cookielib
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# Hosts with a connection pool; the least recently used host's pool is closed
+# beyond this.
+POOL_CONNECTIONS = 10
+# Idle connections kept per host.
+POOL_MAXSIZE = 10
+
+_session = None
+_lock = threading.Lock()
+
+
+def get(url, **kwargs):
+    return _get_session().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return _get_session().post(url, **kwargs)
+
+
+def configure_pools(maxsize=None, sizes=None):
+    """Replaces the session, with `maxsize` connections kept per host and
+    the sizes in `sizes`, a dict keyed by URL prefix such as
+    'https://www.google.com/', for the hosts which need more or fewer.
+    """
+    global _session
+    session = requests.Session()
+    session.cookies.set_policy(cookielib.DefaultCookiePolicy(allowed_domains=[]))
+    _mount_adapter(session, 'https://', maxsize or POOL_MAXSIZE)
+    _mount_adapter(session, 'http://', maxsize or POOL_MAXSIZE)
+    for prefix, size in (sizes or {}).iteritems():
+        _mount_adapter(session, prefix, size)
+    with _lock:
+        previous, _session = _session, session
+    if previous is not None:
+        previous.close()
+
+
+def close_connections():
+    """Closes the pooled connections, e.g. before the process forks or once a
+    test server stops. Later calls open new ones.
+    """
+    _get_session().close()
+
+
+def stats():
+    """Returns a dict of connection pool statistics, keyed by host:
+    {
+        'https://www.google.com:443': {
+            maxsize: connections kept,
+            idle: connections waiting for a request,
+            connections: connections opened,
+            requests: requests sent
+        }
+    }
+    """
+    session = _get_session()
+    result = {}
+    for adapter in set(session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        with pools.lock:
+            keys = list(pools._container.keys())
+        for key in keys:
+            pool = pools._container.get(key)
+            if pool is None or pool.pool is None:
+                continue
+            scheme, host, port = key
+            result['{}://{}:{}'.format(scheme, host, port)] = {
+                'maxsize': pool.pool.maxsize,
+                'idle': len([conn for conn in list(pool.pool.queue)
+                             if conn is not None]),
+                'connections': pool.num_connections,
+                'requests': pool.num_requests
+            }
+    return result
+
+
+def _get_session():
+    with _lock:
+        return _session
+
+
+def _mount_adapter(session, prefix, maxsize):
+    session.mount(prefix, HTTPAdapter(pool_connections=POOL_CONNECTIONS,
+                                      pool_maxsize=maxsize))
+
+
+configure_pools()
@@ -0,0 +1,173 @@
+"""Latency histograms and error counters, exported in the Prometheus text
+format on /metrics.
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30, 60)
+
+
+class Counter(object):
+    """A count for each combination of label values."""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_values(self.labels, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        """Yields (name, labels, value) tuples."""
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, zip(self.labels, key), value
+
+
+class Histogram(object):
+    """Counts of observations in cumulative buckets, with their sum, for
+    each combination of label values.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket, +Inf count, sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_values(self.labels, labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * len(self.buckets) + [0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def samples(self):
+        """Yields (name, labels, value) tuples."""
+        with self._lock:
+            values = sorted((key, list(counts))
+                            for key, counts in self._values.items())
+        for key, counts in values:
+            labels = zip(self.labels, key)
+            for bound, count in zip(self.buckets, counts):
+                yield (self.name + '_bucket',
+                       labels + [('le', _format_value(bound))], count)
+            yield self.name + '_bucket', labels + [('le', '+Inf')], counts[-2]
+            yield self.name + '_count', labels, counts[-2]
+            yield self.name + '_sum', labels, counts[-1]
+
+
+class Registry(object):
+    """A set of metrics which are exported together."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(u'# HELP {} {}'.format(metric.name, metric.help))
+            lines.append(u'# TYPE {} {}'.format(metric.name, metric.type))
+            for name, labels, value in metric.samples():
+                lines.append(u'{}{} {}'.format(name, _format_labels(labels),
+                                               _format_value(value)))
+        return u'\n'.join(lines) + u'\n'
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    'printapp_request_duration_seconds',
+    'Time spent handling requests, by endpoint.',
+    labels=('endpoint', 'method', 'status'))
+UPSTREAM_DURATION = REGISTRY.histogram(
+    'printapp_upstream_duration_seconds',
+    'Time spent in calls to uniFLOW, Google, Mongo and GridFS.',
+    labels=('upstream', 'operation'))
+UPSTREAM_ERRORS = REGISTRY.counter(
+    'printapp_upstream_errors_total',
+    'Failed calls to uniFLOW, Google, Mongo and GridFS, by error class.',
+    labels=('upstream', 'operation', 'error'))
+
+
+@contextmanager
+def time_upstream(upstream, operation):
+    """Times a call to an upstream service, counting the errors it raises.
+    """
+    start = time.time()
+    try:
+        yield
+    except Exception as err:
+        UPSTREAM_ERRORS.inc(upstream=upstream, operation=operation,
+                            error=type(err).__name__)
+        raise
+    finally:
+        UPSTREAM_DURATION.observe(time.time() - start, upstream=upstream,
+                                  operation=operation)
+
+
+def timed_upstream(upstream, operation):
+    """Decorates a function which calls an upstream service; see
+    `time_upstream`.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            with time_upstream(upstream, operation):
+                return func(*args, **kwargs)
+        return timed
+    return decorate
+
+
+def _label_values(names, labels):
+    return tuple(unicode(labels.get(name, '')) for name in names)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(u'{}="{}"'.format(name, _escape(value))
+                          for name, value in labels) + '}'
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
@@ -0,0 +1,136 @@
+"""A multipart/form-data request body which reads its files as it is sent.
+
+`requests` reads every file of a multipart upload into memory, and then
+copies it into the body. `MultipartEncoder` is passed to `requests` as the
+body instead: it has a known length, so it is sent with a Content-Length,
+and its files are read a block at a time while the body is sent. Sending a
+document from GridFS then holds at most one GridFS chunk in memory.
+"""
+import os
+import uuid
+from requests.packages.urllib3.fields import format_header_param
+
+# Bytes read at a time when the body is iterated.
+BLOCK_SIZE = 64 * 1024
+
+
+class MultipartEncoder(object):
+    """A file-like multipart/form-data body.
+
+    fields - a list of (name, value) tuples. Values are strings, or lists of
+        strings for repeated fields. Fields whose value is None are left out.
+    files - a list of (name, filename, file, content type) tuples. Files are
+        read from their current position to their end, which must not move
+        until the body has been sent.
+
+    Send it with its `content_type` as the Content-Type header.
+    """
+
+    def __init__(self, fields, files):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary={}'.format(
+            self.boundary)
+        # Strings, and (file, length) tuples.
+        self._parts = []
+        for name, value in fields:
+            values = value if isinstance(value, (list, tuple)) else [value]
+            for value in values:
+                if value is None:
+                    continue
+                self._add_part(self._make_headers(name), _to_bytes(value))
+        for name, filename, file, content_type in files:
+            headers = self._make_headers(name, filename, content_type)
+            self._add_part(headers, (file, _get_remaining_length(file)))
+        self._parts.append('--{}--\r\n'.format(self.boundary))
+
+        self.len = sum(len(part) if isinstance(part, str) else part[1]
+                       for part in self._parts)
+        self._index = 0
+        self._part_remaining = None
+
+    def __len__(self):
+        return self.len
+
+    def __iter__(self):
+        while True:
+            block = self.read(BLOCK_SIZE)
+            if not block:
+                return
+            yield block
+
+    def read(self, size=-1):
+        """Returns up to `size` bytes of the body, or the rest of it if size
+        is negative. Returns an empty string at the end.
+
+        Raises IOError if a file ends before its length when the encoder was
+        made.
+        """
+        if size is None or size < 0:
+            size = self.len
+        blocks = []
+        while size > 0 and self._index < len(self._parts):
+            block = self._read_part(size)
+            blocks.append(block)
+            size -= len(block)
+        return ''.join(blocks)
+
+    def _read_part(self, size):
+        """Reads up to `size` bytes of the current part, moving to the next
+        part at its end.
+        """
+        part = self._parts[self._index]
+        if self._part_remaining is None:
+            self._part_remaining = (len(part) if isinstance(part, str)
+                                    else part[1])
+
+        if self._part_remaining == 0:
+            block = ''
+        elif isinstance(part, str):
+            start = len(part) - self._part_remaining
+            block = part[start:start + size]
+        else:
+            block = part[0].read(min(size, self._part_remaining))
+            if not block:
+                raise IOError('File ended {} bytes early.'.format(
+                    self._part_remaining))
+
+        self._part_remaining -= len(block)
+        if self._part_remaining == 0:
+            self._index += 1
+            self._part_remaining = None
+        return block
+
+    def _add_part(self, headers, content):
+        self._parts.append('--{}\r\n{}\r\n'.format(self.boundary, headers))
+        self._parts.append(content)
+        self._parts.append('\r\n')
+
+    def _make_headers(self, name, filename=None, content_type=None):
+        disposition = 'form-data; ' + _to_bytes(format_header_param('name', name))
+        if filename is not None:
+            disposition += '; ' + _to_bytes(format_header_param('filename',
+                                                                filename))
+        headers = 'Content-Disposition: {}\r\n'.format(disposition)
+        if filename is not None:
+            headers += 'Content-Type: {}\r\n'.format(
+                content_type or 'application/octet-stream')
+        return headers
+
+
+def _get_remaining_length(file):
+    """Returns the number of bytes from the position of a file to its end."""
+    length = getattr(file, 'length', None)
+    if length is not None:
+        # GridFS files.
+        return length - file.tell()
+    position = file.tell()
+    file.seek(0, os.SEEK_END)
+    length = file.tell() - position
+    file.seek(position)
+    return length
+
+
+def _to_bytes(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
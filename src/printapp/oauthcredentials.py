@@ -1,12 +1,18 @@
 import urlparse
 import json
 import os
+import socket
+import hashlib
+from datetime import datetime, timedelta
 import requests
 import httplib2
 from urllib import urlencode
 from pymongo.errors import PyMongoError
 import oauth2client.client as oauth
 from printapp import mongo, app
+import deadline
+import metrics
+import httpsessions
 
 def get_token(email):
     """Fetches the authorization token for the given email address.
@@ -22,12 +28,17 @@ def get_token(email):
 
     if credentials.access_token_expired:
         try:
-            credentials.refresh(httplib2.Http())
+            with metrics.time_upstream('google', 'refresh_token'):
+                credentials.refresh(httplib2.Http(timeout=deadline.remaining()))
         except oauth.AccessTokenRefreshError:
             delete_credentials(email)
             return None
         except oauth.Error as err:
             raise WebServiceError(err)
+        except deadline.DeadlineExceededError as err:
+            raise WebServiceError(err)
+        except socket.error as err:
+            raise WebServiceError(err)
         
         try:
             _save_credentials(email, credentials)
@@ -86,11 +97,18 @@ def authorize_user_by_code(authorization_code, email):
     flow = _get_flow()
 
     try:
-        credentials = flow.step2_exchange(authorization_code)
+        with metrics.time_upstream('google', 'exchange_code'):
+            credentials = flow.step2_exchange(
+                authorization_code,
+                http=httplib2.Http(timeout=deadline.remaining()))
     except oauth.FlowExchangeError as err:
         raise ValueError('Invalid authorization code: {}'.format(err))
     except oauth.Error as err:
         raise WebServiceError(err)
+    except deadline.DeadlineExceededError as err:
+        raise WebServiceError(err)
+    except socket.error as err:
+        raise WebServiceError(err)
 
     try:
         _save_credentials(email, credentials)
@@ -107,9 +125,47 @@ def delete_credentials(email, revoke=True):
             pass
 
     try:
-        mongo.db.credentials.remove({'email': email})
+        with metrics.time_upstream('mongo', 'delete_credentials'):
+            mongo.db.credentials.remove({'email': email})
+    except PyMongoError as err:
+        raise WebServiceError(err)
+
+def has_cached_printer(email, token, max_age):
+    """Returns True if the database records that the uniFLOW printer was
+    found on the user's cloud print account with this token, less than
+    `max_age` seconds ago.
+
+    Raises WebServiceError on database error.
+    """
+    since = datetime.utcnow() - timedelta(seconds=max_age)
+    try:
+        with metrics.time_upstream('mongo', 'read_printer'):
+            result = mongo.db.credentials.find_one({
+                'email': email,
+                'uniflow_printer.token': _hash_token(token),
+                'uniflow_printer.checked': {'$gt': since}
+            }, fields={'_id': True})
     except PyMongoError as err:
         raise WebServiceError(err)
+    return result is not None
+
+def cache_printer(email, token):
+    """Records that the uniFLOW printer was found on the user's cloud print
+    account with this token. The record is dropped when the user's
+    credentials are saved again or deleted.
+
+    Raises WebServiceError on database error.
+    """
+    try:
+        with metrics.time_upstream('mongo', 'write_printer'):
+            mongo.db.credentials.update({'email': email}, {'$set': {
+                'uniflow_printer': {'token': _hash_token(token),
+                                    'checked': datetime.utcnow()}}})
+    except PyMongoError as err:
+        raise WebServiceError(err)
+
+def _hash_token(token):
+    return hashlib.sha1(token).hexdigest()
 
 def _db_record_to_credentials(db_record):
     if 'credentials' not in db_record:
@@ -118,9 +174,14 @@ def _db_record_to_credentials(db_record):
     credentials = oauth.OAuth2Credentials.from_json(json.dumps(db_record['credentials']))
     return credentials
 
+@metrics.timed_upstream('mongo', 'write_credentials')
 def _save_credentials(email, credentials):
     db_record = _make_db_record(email, credentials)
-    mongo.db.credentials.update({'email': email}, {'$set': db_record}, upsert=True)
+    # A new token has to find the printer again; see `cache_printer`.
+    mongo.db.credentials.update({'email': email},
+                                {'$set': db_record,
+                                 '$unset': {'uniflow_printer': ''}},
+                                upsert=True)
 
 def _make_db_record(email, credentials):
     record = {
@@ -131,7 +192,8 @@ def _make_db_record(email, credentials):
 
 def _get_credentials(email):
     try:
-        result = mongo.db.credentials.find_one({'email': email})
+        with metrics.time_upstream('mongo', 'read_credentials'):
+            result = mongo.db.credentials.find_one({'email': email})
     except PyMongoError as err:
         raise WebServiceError(err)
 
@@ -173,12 +235,16 @@ def _revoke_access(email):
     url = 'https://accounts.google.com/o/oauth2/revoke'
     post_data = {'token': credentials.access_token}
     try:
-        response = requests.post(url, params=post_data)
+        with metrics.time_upstream('google', 'revoke_token'):
+            response = httpsessions.post(url, params=post_data,
+                                         timeout=deadline.timeout())
+    except deadline.DeadlineExceededError as err:
+        raise WebServiceError(err)
     except requests.exceptions.ConnectionError as err:
         raise WebServiceError(err)
     except requests.exceptions.HTTPError as err:
         raise WebServiceError(err)
-    except requests.exceptions.RequestException:
+    except requests.exceptions.RequestException as err:
         raise WebServiceError(err)
     if response.status_code != 200:
         raise WebServiceError("Error revoking oauth token.")
@@ -0,0 +1,153 @@
+"""Polls the print queue and budget of users who have open status streams,
+and pushes the changes to every stream of that user.
+
+There is at most one poller thread per user, however many streams (e.g.
+browser tabs) the user has open. A poller polls every `min_interval`
+seconds while the queue is changing, backs off to `max_interval` while
+nothing changes, and stops when the last stream of its user closes.
+
+A poller also stops once uniFLOW rejects the user's password, since
+signing in again and again with it could lock the account. It then sends
+a ('closed',) event to its streams.
+"""
+import Queue
+import threading
+import printstatus
+
+# Events waiting to be sent to a stream which reads too slowly are dropped,
+# oldest first, and replaced by a snapshot.
+_MAX_PENDING_EVENTS = 20
+
+
+class PollerRegistry(object):
+    """The running pollers, keyed by email."""
+
+    def __init__(self, min_interval, max_interval):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._pollers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, email, fetch):
+        """Returns a Queue of events for a new stream of a user.
+
+        fetch - called with no arguments to get a `(budget, print_queue)`
+            tuple. Only used if no poller is running for the user yet.
+
+        The first event is a snapshot, once one is available. Events are
+        tuples:
+            ('snapshot', budget, print_queue)
+            ('diff', budget, added_jobs, removed_job_ids, changed_jobs)
+            ('error', exception)
+            ('closed',) - the poller stopped; no more events follow.
+        """
+        with self._lock:
+            poller = self._pollers.get(email)
+            if poller is None or poller.is_stopped():
+                poller = _Poller(fetch, self.min_interval, self.max_interval)
+                self._pollers[email] = poller
+            events = poller.subscribe()
+            if not poller.is_alive():
+                poller.start()
+        return events
+
+    def unsubscribe(self, email, events):
+        with self._lock:
+            poller = self._pollers.get(email)
+            if poller is None:
+                return
+            if poller.unsubscribe(events) == 0:
+                poller.stop()
+                del self._pollers[email]
+
+    def __len__(self):
+        return len(self._pollers)
+
+
+class _Poller(threading.Thread):
+
+    def __init__(self, fetch, min_interval, max_interval):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self._fetch = fetch
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._subscribers = set()
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def subscribe(self):
+        events = Queue.Queue()
+        with self._lock:
+            self._subscribers.add(events)
+            if self._snapshot is not None:
+                events.put(('snapshot',) + self._snapshot)
+        return events
+
+    def unsubscribe(self, events):
+        """Removes a subscriber, returning the number left."""
+        with self._lock:
+            self._subscribers.discard(events)
+            return len(self._subscribers)
+
+    def stop(self):
+        self._stopped.set()
+
+    def is_stopped(self):
+        return self._stopped.is_set()
+
+    def run(self):
+        interval = self._min_interval
+        while not self._stopped.is_set():
+            try:
+                budget, queue = self._fetch()
+            except printstatus.InvalidCredentialsError as err:
+                self._publish(('error', err))
+                self._publish(('closed',))
+                self.stop()
+                return
+            except (printstatus.NetworkError, printstatus.ScrapingError) as err:
+                self._publish(('error', err))
+                interval = self._max_interval
+            else:
+                if self._update(budget, queue):
+                    interval = self._min_interval
+                else:
+                    interval = min(interval * 2, self._max_interval)
+            self._stopped.wait(interval)
+
+    def _update(self, budget, queue):
+        """Stores a new snapshot and publishes what changed. Returns True if
+        anything did.
+        """
+        with self._lock:
+            previous, self._snapshot = self._snapshot, (budget, queue)
+        if previous is None:
+            self._publish(('snapshot', budget, queue))
+            return True
+
+        previous_budget, previous_queue = previous
+        previous_jobs = dict((job.job_id, job) for job in previous_queue)
+        jobs = dict((job.job_id, job) for job in queue)
+        added = [job for job in queue if job.job_id not in previous_jobs]
+        changed = [job for job in queue if job.job_id in previous_jobs
+                   and previous_jobs[job.job_id] != job]
+        removed = [job_id for job_id in previous_jobs if job_id not in jobs]
+        if not (added or changed or removed) and budget == previous_budget:
+            return False
+        self._publish(('diff', budget, added, removed, changed))
+        return True
+
+    def _publish(self, event):
+        with self._lock:
+            for events in self._subscribers:
+                if events.qsize() >= _MAX_PENDING_EVENTS and self._snapshot:
+                    while not events.empty():
+                        events.get_nowait()
+                    events.put(('snapshot',) + self._snapshot)
+                    # Errors and the end of the stream are never dropped.
+                    if event[0] != 'diff':
+                        events.put(event)
+                else:
+                    events.put(event)
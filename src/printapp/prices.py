@@ -0,0 +1,76 @@
+"""Classifies print jobs by the price per page uniFLOW charged for them.
+"""
+import bisect
+
+
+class PriceIndex(object):
+    """The per page prices of the PRINTPRICES setting, sorted for nearest
+    neighbour lookups.
+
+    PRINTPRICES is a list of dictionaries with the prices of a class of
+    printers:
+        {
+            'name': 'mfd-single-sided',
+            'color': 0.255,
+            'black': 0.0255
+        }
+    """
+
+    def __init__(self, print_prices):
+        # (price per page, is color, printer class), cheapest first
+        self._entries = []
+        for price_info in print_prices or []:
+            name = price_info.get('name')
+            self._entries.append((price_info['color'], True, name))
+            self._entries.append((price_info['black'], False, name))
+        self._entries.sort()
+        self._prices = [entry[0] for entry in self._entries]
+
+    def nearest(self, price_per_page):
+        """Returns the `(price, is_color, printer_class)` entry with the
+        closest price, or None if there are no prices.
+        """
+        i = bisect.bisect_left(self._prices, price_per_page)
+        candidates = self._entries[max(i - 1, 0):i + 1]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda entry: abs(price_per_page - entry[0]))
+
+    def classify(self, print_jobs):
+        """Classifies a list of PrintJob objects in one pass.
+
+        Returns a `(job_infos, totals)` tuple. `job_infos` has a dict for
+        each job, in order:
+            {
+                'color': True,
+                'price_per_page': 0.255,
+                'printer_class': 'mfd-single-sided'
+            }
+        A job without pages has no price per page or printer class, and is
+        not color. `totals` maps each printer class (None for jobs without
+        one) to the number of jobs, pages (times copies) and their price:
+            {'jobs': 2, 'pages': 14, 'price': 0.357}
+        """
+        job_infos = []
+        totals = {}
+        for job in print_jobs:
+            pages = job.pages * job.copies
+            entry = None
+            price_per_page = None
+            if pages > 0:
+                price_per_page = job.price / float(pages)
+                entry = self.nearest(price_per_page)
+            if entry is None:
+                is_color, printer_class = False, None
+            else:
+                _, is_color, printer_class = entry
+            job_infos.append({'color': is_color,
+                              'price_per_page': price_per_page,
+                              'printer_class': printer_class})
+
+            total = totals.setdefault(printer_class,
+                                      {'jobs': 0, 'pages': 0, 'price': 0.0})
+            total['jobs'] += 1
+            total['pages'] += pages
+            total['price'] += job.price
+        return job_infos, totals
@@ -0,0 +1,95 @@
+"""An in-memory directory of the printers on campus, loaded from
+`static/printers.json`.
+"""
+import os
+import json
+import threading
+
+
+class PrinterDirectory(object):
+    """Indexes the printers in a printers.json file by name, building and
+    capability, reloading the file whenever its mtime changes.
+
+    printers.json is a list of buildings:
+        {
+            'id': 'library',
+            'displayName': 'Hekman Library',
+            'printers': [{'name': 'HL102-ITC-LSR1', 'room': '102',
+                          'building': 'Hekman Library', 'public': True,
+                          'color': False, 'type': 'Laser'}]
+        }
+    Printers are returned as those dicts, with the building's id added as
+    'building_id'. They are shared, so callers must not modify them.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._mtime = None
+        self._lock = threading.Lock()
+        # A dict of printers by name, and a dict of sets of printer names
+        # keyed by (field, value), e.g. ('building_id', 'library') or
+        # ('color', True). Replaced together on reload.
+        self._indexes = ({}, {})
+
+    def get(self, name):
+        """Returns the printer with the given name, or None."""
+        self._reload_if_changed()
+        return self._indexes[0].get(name)
+
+    def find(self, building_id=None, color=None, type=None, public=None):
+        """Returns the printers matching all of the given filters, sorted by
+        name. Types are matched case insensitively.
+        """
+        self._reload_if_changed()
+        by_name, by_field = self._indexes
+
+        filters = [('building_id', building_id), ('color', color),
+                   ('type', type.lower() if type is not None else None),
+                   ('public', public)]
+        names = None
+        for key in filters:
+            if key[1] is None:
+                continue
+            matches = by_field.get(key, frozenset())
+            names = matches if names is None else names & matches
+        if names is None:
+            names = by_name
+        return [by_name[name] for name in sorted(names)]
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.filename)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            try:
+                with open(self.filename) as f:
+                    buildings = json.load(f)
+            except (IOError, ValueError):
+                # Keep the printers of the last good file until it changes
+                # again.
+                self._mtime = mtime
+                return
+            self._indexes = _index(buildings)
+            self._mtime = mtime
+
+
+def _index(buildings):
+    """Returns `(by_name, by_field)` indexes of a list of buildings."""
+    by_name = {}
+    by_field = {}
+    for building in buildings:
+        for printer in building.get('printers', []):
+            printer = dict(printer, building_id=building.get('id'))
+            by_name[printer['name']] = printer
+            for field in ('building_id', 'color', 'public'):
+                key = (field, printer.get(field))
+                by_field.setdefault(key, set()).add(printer['name'])
+            key = ('type', (printer.get('type') or '').lower())
+            by_field.setdefault(key, set()).add(printer['name'])
+    return by_name, by_field
@@ -0,0 +1,116 @@
+"""Tracks print jobs which are submitted to Google in the background.
+
+Each print job has a record in the `printjobs` collection:
+    {
+        '_id': ObjectId,
+        'email': 'user@students.calvin.edu',
+        'state': 'queued',
+        'status': None,
+        'created': datetime,
+        'updated': datetime
+    }
+`status` is the response code /api/print used to return when the job
+failed, and None otherwise.
+"""
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from pymongo.errors import PyMongoError
+from printapp import mongo
+
+# Waiting for a worker thread.
+QUEUED = 'queued'
+# Being sent to Google.
+SUBMITTING = 'submitting'
+# Accepted by Google; waiting for Google to process the document.
+PROCESSING = 'processing'
+# Processed by Google and sent to the printer.
+DONE = 'done'
+# Failed; the record's status says why.
+FAILED = 'failed'
+
+# Records are removed this many seconds after they are created.
+RECORD_TTL = 24 * 60 * 60
+
+
+def ensure_indexes():
+    """Creates the indexes of the `printjobs` collection, which expire old
+    records.
+    """
+    mongo.db.printjobs.ensure_index('created', expireAfterSeconds=RECORD_TTL)
+
+
+def create_print_job(email):
+    """Records a new print job in the QUEUED state, returning its id.
+
+    Raises DatabaseError on error.
+    """
+    now = datetime.utcnow()
+    record = {
+        'email': email,
+        'state': QUEUED,
+        'status': None,
+        'created': now,
+        'updated': now
+    }
+    try:
+        print_job_id = mongo.db.printjobs.insert(record)
+    except PyMongoError as err:
+        raise DatabaseError(err)
+    return str(print_job_id)
+
+
+def update_print_job(print_job_id, state, status=None):
+    """Moves a print job to a new state.
+
+    Raises DatabaseError on error.
+    """
+    update = {'state': state, 'status': status, 'updated': datetime.utcnow()}
+    try:
+        mongo.db.printjobs.update({'_id': ObjectId(print_job_id)},
+                                  {'$set': update})
+    except PyMongoError as err:
+        raise DatabaseError(err)
+
+
+def get_print_job(print_job_id, email, stale_after=None):
+    """Returns the record of a print job as a dict with 'id', 'state',
+    'status', 'created' and 'updated' keys.
+
+    Returns None if no such print job exists for the given email.
+
+    stale_after - seconds after which a job which has not finished is
+        reported as FAILED with a status of 504, e.g. because the process
+        running it was restarted. The record itself is not changed.
+
+    Raises DatabaseError on error.
+    """
+    try:
+        print_job_id = ObjectId(print_job_id)
+    except (InvalidId, TypeError):
+        return None
+
+    try:
+        record = mongo.db.printjobs.find_one({'_id': print_job_id,
+                                              'email': email})
+    except PyMongoError as err:
+        raise DatabaseError(err)
+    if record is None:
+        return None
+
+    state, status = record['state'], record['status']
+    if (stale_after is not None and state in (QUEUED, SUBMITTING, PROCESSING)
+            and datetime.utcnow() - record['updated'] > timedelta(seconds=stale_after)):
+        state, status = FAILED, 504
+
+    return {
+        'id': str(record['_id']),
+        'state': state,
+        'status': status,
+        'created': record['created'],
+        'updated': record['updated']
+    }
+
+
+class DatabaseError(Exception):
+    pass
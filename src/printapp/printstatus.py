@@ -1,8 +1,14 @@
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 import re
+import threading
+import time
 import requests
 from requests_ntlm import HttpNtlmAuth
 from bs4 import BeautifulSoup
+from lxml import etree
+from workerpool import WorkerPool
+import deadline
+import metrics
 
 BASE_URL = 'https://uniflow.calvin.edu/'
 CLIENT_PATH = 'pwclient/'
@@ -12,7 +18,38 @@ PRINT_BUDGET_PATH = 'dispBudget.asp'
 PRINT_QUEUE_PATH = 'dispObjects.asp'
 
 def get_uniflow_client(username, password):
-    return _UniflowClient(username, password)
+    """Returns a signed in uniFLOW client for the given user.
+
+    Clients are pooled per user, so repeated calls reuse the signed in
+    sessions (token and cookies) instead of doing a new NTLM handshake.
+    The credentials are only checked against uniFLOW when no pooled client
+    exists for them.
+    """
+    if username is None or username == '':
+        # blank user name leads to an invalid ntlm domain
+        raise InvalidCredentialsError('User name must not be blank.')
+    return _client_pool.get(username, password)
+
+def discard_uniflow_client(username):
+    """Drops the pooled sessions of a user, e.g. when they log out."""
+    _client_pool.discard(username)
+
+def set_base_url(url):
+    """Points the scrapers at another uniFLOW server, such as the one in
+    `fakeuniflow.py`.
+    """
+    global BASE_URL
+    BASE_URL = url
+
+def configure_session_pool(max_size=None, idle_ttl=None):
+    """Sets the maximum number of pooled clients and the number of seconds
+    an unused client is kept around.
+    """
+    _client_pool.configure(max_size=max_size, idle_ttl=idle_ttl)
+
+def configure_fetch_workers(size):
+    """Sets the number of threads shared by all concurrent fetches."""
+    _fetch_pool.resize(size)
 
 
 class _UniflowClient:
@@ -25,21 +62,181 @@ class _UniflowClient:
         self._password = password
         self._budget_scraper = _BudgetScraper()
         self._queue_scraper = _QueueScraper()
+        self.is_valid = True
         # Verify the credentials
         self._budget_scraper.sign_in(self._username, self._password)
         self._queue_scraper.sign_in(self._username, self._password)
 
+    def has_credentials(self, username, password):
+        return self._username == username and self._password == password
+
     def get_budget(self):
-        self._budget_scraper.sign_in(self._username, self._password)
-        return self._budget_scraper.fetch_data()
+        return self._with_session(self._budget_scraper,
+                                  self._budget_scraper.fetch_data)
 
     def get_print_queue(self):
-        self._queue_scraper.sign_in(self._username, self._password)
-        return self._queue_scraper.fetch_data()
+        return self._with_session(self._queue_scraper,
+                                  self._queue_scraper.fetch_data)
+
+    def get_budget_and_print_queue(self):
+        """Returns a `(budget, print_queue)` tuple.
+
+        The budget and the print queue come from two separate uniFLOW apps,
+        so they are fetched at the same time; the queue in a worker thread
+        and the budget in the calling thread.
+
+        If either fetch fails, the most severe error is raised:
+        InvalidCredentialsError, then NetworkError, then ScrapingError.
+        """
+        pending_queue = _fetch_pool.submit(self.get_print_queue)
+        budget, queue = None, None
+        errors = []
+        try:
+            budget = self.get_budget()
+        except Exception as err:
+            errors.append(err)
+        try:
+            queue = pending_queue.get()
+        except Exception as err:
+            errors.append(err)
+
+        if errors:
+            _raise_most_severe(errors)
+        return budget, queue
 
     def delete_print_jobs(self, job_ids):
-        self._queue_scraper.sign_in(self._username, self._password)
-        self._queue_scraper.delete_print_jobs(job_ids)
+        self._with_session(self._queue_scraper,
+                           self._queue_scraper.delete_print_jobs, job_ids)
+
+    def _with_session(self, scraper, operation, *args):
+        """Runs `operation` with the scraper's current token.
+
+        The token is reused for as long as uniFLOW accepts it. If uniFLOW
+        rejects a token that was not fresh, the scraper signs in again and
+        the call is retried once. Other errors are raised right away.
+        """
+        with scraper.lock:
+            try:
+                if not scraper.is_signed_in():
+                    scraper.sign_in(self._username, self._password)
+                    return operation(*args)
+                try:
+                    return operation(*args)
+                except SessionExpiredError:
+                    scraper.sign_in(self._username, self._password)
+                    return operation(*args)
+            except InvalidCredentialsError:
+                # The password was changed since this client was pooled.
+                self.is_valid = False
+                raise
+
+
+def _raise_most_severe(errors):
+    """Raises the most severe of a list of exceptions:
+    InvalidCredentialsError, then NetworkError, then ScrapingError.
+    """
+    for error_type in (InvalidCredentialsError, NetworkError, ScrapingError):
+        for err in errors:
+            if isinstance(err, error_type):
+                raise err
+    raise errors[0]
+
+
+class _ClientPool:
+    """Signed in uniFLOW clients, keyed by user name.
+
+    Clients which have not been used for `idle_ttl` seconds are dropped.
+    When the pool is full, the least recently used client is dropped.
+    """
+
+    def __init__(self, max_size, idle_ttl, factory=_UniflowClient):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._factory = factory
+        # user name -> (client, time last used), least recently used first
+        self._clients = OrderedDict()
+        # user name -> [lock held while signing in, number of waiters]
+        self._sign_in_locks = {}
+        self._lock = threading.Lock()
+
+    def configure(self, max_size=None, idle_ttl=None):
+        with self._lock:
+            if max_size is not None:
+                self.max_size = max_size
+            if idle_ttl is not None:
+                self.idle_ttl = idle_ttl
+            self._evict(time.time())
+
+    def get(self, username, password):
+        """Returns the pooled client of a user, or signs in a new one.
+
+        A pooled client is only replaced once a new client has signed in,
+        so failed sign ins (e.g. a wrong password) leave it in the pool.
+        Concurrent calls for the same user share one sign in.
+        """
+        client = self._get_pooled(username, password)
+        if client is not None:
+            return client
+
+        with self._lock:
+            sign_in_lock = self._sign_in_locks.get(username)
+            if sign_in_lock is None:
+                sign_in_lock = self._sign_in_locks[username] = [threading.Lock(), 0]
+            sign_in_lock[1] += 1
+        try:
+            # Signing in is slow, so it happens outside of the pool lock.
+            with sign_in_lock[0]:
+                client = self._get_pooled(username, password)
+                if client is None:
+                    client = self._factory(username, password)
+                    self._put(username, client)
+                return client
+        finally:
+            with self._lock:
+                sign_in_lock[1] -= 1
+                if sign_in_lock[1] == 0:
+                    del self._sign_in_locks[username]
+
+    def discard(self, username):
+        with self._lock:
+            self._clients.pop(username, None)
+
+    def __len__(self):
+        return len(self._clients)
+
+    def _get_pooled(self, username, password):
+        """Returns the pooled client of a user if it is valid and has the
+        same credentials, marking it as used; None otherwise.
+        """
+        with self._lock:
+            self._evict(time.time())
+            entry = self._clients.get(username)
+            if entry is None:
+                return None
+            client = entry[0]
+            if not (client.is_valid and client.has_credentials(username, password)):
+                return None
+            del self._clients[username]
+            self._clients[username] = (client, time.time())
+            return client
+
+    def _put(self, username, client):
+        with self._lock:
+            self._clients.pop(username, None)
+            self._clients[username] = (client, time.time())
+            self._evict(time.time())
+
+    def _evict(self, now):
+        expired = [username for username, (_, last_used)
+                   in self._clients.iteritems()
+                   if now - last_used > self.idle_ttl]
+        for username in expired:
+            del self._clients[username]
+        while len(self._clients) > self.max_size:
+            self._clients.popitem(last=False)
+
+_client_pool = _ClientPool(max_size=200, idle_ttl=600)
+_fetch_pool = WorkerPool(16)
 
 PrintJob = namedtuple('PrintJob',['job_id', 'name', 'pages', 'copies',
                                   'price', 'printer_name', 'date'])
@@ -48,15 +245,19 @@ class _PrintScraper:
     """Parent class of BudgetScraper and QueueScraper.
     """
     
+    @metrics.timed_upstream('uniflow', 'sign_in')
     def sign_in(self, path, username, password):
         domain = ''
         try:
-            self._session.get(BASE_URL + path)
+            self._session.get(BASE_URL + path, timeout=deadline.timeout())
             self._session.auth = HttpNtlmAuth(domain + '\\' + username,
                                               password, self._session)
             post_data = {'theAction': 'ntlogin'}
             response = self._session.post(BASE_URL + path + AUTH_PATH,
-                                          data=post_data)
+                                          data=post_data,
+                                          timeout=deadline.timeout())
+        except deadline.DeadlineExceededError as err:
+            raise NetworkError(err)
         except requests.exceptions.ConnectionError as err:
             raise NetworkError(err)
         except requests.exceptions.HTTPError as err:
@@ -68,6 +269,23 @@ class _PrintScraper:
             raise InvalidCredentialsError
         self.update_token(response.text)
 
+    def is_signed_in(self):
+        return self._token is not None
+
+    def _check_response(self, response):
+        """Raises a ScrapingError if uniFLOW did not answer with a page.
+
+        A rejected token shows up as an authentication error or as a
+        redirect to the sign in page; the token is forgotten in that case.
+        """
+        if (response.status_code in (requests.codes.unauthorized,
+                                     requests.codes.forbidden)
+                or (response.history and AUTH_PATH in response.url)):
+            self._token = None
+            raise SessionExpiredError("Session expired.")
+        if response.status_code != requests.codes.ok:
+            raise ScrapingError("Invalid HTTP status code: {}".format(response.status_code))
+
 
 class _BudgetScraper(_PrintScraper):
     """Stores a session with print.calvin.edu/pwclient, and a token.
@@ -76,17 +294,16 @@ class _BudgetScraper(_PrintScraper):
     def __init__(self):
         self.path = CLIENT_PATH
         self._session = requests.Session()
+        self._token = None
+        self.lock = threading.Lock()
 
     def update_token(self, text):
-        match = re.search(r"\.c_updateToken\(\"(.*)\"\)", text)
-        if match is not None:
-            self._token = match.group(1)
-            return
-        raise ScrapingError("No token found.")
+        self._token = _parse_budget_token(text)
 
     def sign_in(self, username, password):
         _PrintScraper.sign_in(self, self.path, username, password)
     
+    @metrics.timed_upstream('uniflow', 'fetch_budget')
     def fetch_data(self):
         """Returns the budget of the user.
         """
@@ -98,29 +315,18 @@ class _BudgetScraper(_PrintScraper):
 
         try:
             response = self._session.get(BASE_URL + self.path + PRINT_BUDGET_PATH,
-                                         params=query_parameters)
+                                         params=query_parameters,
+                                         timeout=deadline.timeout())
+        except deadline.DeadlineExceededError as err:
+            raise NetworkError(err)
         except requests.exceptions.ConnectionError as err:
             raise NetworkError(err)
         except requests.exceptions.HTTPError as err:
             raise NetworkError(err)
         except requests.exceptions.RequestException as err:
             raise NetworkError(err)
-        if response.status_code != requests.codes.ok:
-            raise ScrapingError("Invalid HTTP status code: {}".format(response.status_code))
-        soup = BeautifulSoup(response.text, 'lxml')
-        title = soup.find('title')
-        if title is None:
-            raise ScrapingError("Page has no title.")
-        budget_tag = soup.find('font', class_= 'editHeadline')
-        parent_tag = soup.find('font', class_= 'editHeadline').parent
-        match = re.search(r"Your current budget is:", str(parent_tag))
-        if match is None:
-            raise ScrapingError("Budget not found.")
-        try:
-            budget = float(budget_tag.string)
-        except ValueError:
-            raise ScrapingError("Budget is not a valid float: {}".format(budget_tag.string))
-        return budget
+        self._check_response(response)
+        return _parse_budget(response.text)
 
 
 class _QueueScraper(_PrintScraper):
@@ -129,17 +335,16 @@ class _QueueScraper(_PrintScraper):
     def __init__(self):
         self.path = RQM_PATH
         self._session = requests.Session()
+        self._token = None
+        self.lock = threading.Lock()
 
     def sign_in(self, username, password):
         _PrintScraper.sign_in(self, self.path, username, password)
 
     def update_token(self, text):
-        match = re.search(r"token=(.*)\";", text)
-        if match is not None:
-            self._token = match.group(1)
-            return
-        raise ScrapingError("No token found.")
+        self._token = _parse_queue_token(text)
     
+    @metrics.timed_upstream('uniflow', 'fetch_queue')
     def fetch_data(self):
         """Returns a list of _PrintJob objects to represent a user's print queue."""
         query_parameters = {
@@ -150,42 +355,20 @@ class _QueueScraper(_PrintScraper):
 
         try:
             response = self._session.get(BASE_URL + self.path + PRINT_QUEUE_PATH,
-                                         params=query_parameters)
+                                         params=query_parameters,
+                                         timeout=deadline.timeout())
+        except deadline.DeadlineExceededError as err:
+            raise NetworkError(err)
         except requests.exceptions.ConnectionError as err:
             raise NetworkError(err)
         except requests.exceptions.HTTPError as err:
             raise NetworkError(err)
         except requests.exceptions.RequestException as err:
             raise NetworkError(err)
-        if response.status_code != requests.codes.ok:
-            raise ScrapingError("Invalid HTTP status code: {}".format(response.status_code))
-        soup = BeautifulSoup(response.text, 'lxml')
-        #TODO: Come up with a better way for checking for scraping errors
-        title = soup.find('title')
-        if title is None:
-            raise ScrapingError("Page has no title.")
-        print_job_tags = soup.select('#divMain tr td.Middle')
-        print_jobs = []
-        numberOfJobs = len(print_job_tags) / 7
-        for i in range(numberOfJobs):
-            j = i * 7
-            try:
-                job_id = re.search(r"c_OnSelectJob\('(.*)'\)", unicode(print_job_tags[0 + j]['onclick'])).group(1)
-                name = unicode(print_job_tags[0 + j].string)
-                pages = int(print_job_tags[1 + j].string)
-                copies = int(print_job_tags[2 + j].string)
-                price = float(print_job_tags[3 + j].string)
-                printer_name = unicode(print_job_tags[4 + j].string)
-                date = unicode(print_job_tags[6 + j].string)
-            except IndexError as err:
-                raise ScrapingError(err)
-            except ValueError as err:
-                raise ScrapingError(err)
-            if job_id is None:
-                raise ScrapingError("Print job id not found for document: {}".format(name))
-            print_jobs.append(PrintJob(job_id, name, pages, copies, price, printer_name, date))
-        return print_jobs
+        self._check_response(response)
+        return _parse_print_queue(response.text)
 
+    @metrics.timed_upstream('uniflow', 'delete_print_jobs')
     def delete_print_jobs(self, job_ids):
         """Deletes print jobs from a user's print queue."""
         post_data = {
@@ -202,20 +385,146 @@ class _QueueScraper(_PrintScraper):
 
         try:
             response = self._session.post(BASE_URL + self.path + PRINT_QUEUE_PATH,
-                                          data=post_data)
+                                          data=post_data,
+                                          timeout=deadline.timeout())
+        except deadline.DeadlineExceededError as err:
+            raise NetworkError(err)
         except requests.exceptions.ConnectionError as err:
             raise NetworkError(err)
         except requests.exceptions.HTTPError as err:
             raise NetworkError(err)
         except requests.exceptions.RequestException as err:
             raise NetworkError(err)
-        if response.status_code != requests.codes.ok:
-            raise ScrapingError("Invalid HTTP status code: {}".format(response.status_code))
+        self._check_response(response)
+
+
+def _parse_budget_token(text):
+    """Returns the token on a page of the budget app (pwclient)."""
+    match = _BUDGET_TOKEN_PATTERN.search(text)
+    if match is None:
+        raise ScrapingError("No token found.")
+    return match.group(1)
+
+def _parse_queue_token(text):
+    """Returns the token on a page of the print queue app (pwrqm)."""
+    match = _QUEUE_TOKEN_PATTERN.search(text)
+    if match is None:
+        raise ScrapingError("No token found.")
+    return match.group(1)
+
+def _parse_budget(text):
+    """Returns the budget on a budget page as a float."""
+    soup = BeautifulSoup(text, 'lxml')
+    title = soup.find('title')
+    if title is None:
+        raise ScrapingError("Page has no title.")
+    budget_tag = soup.find('font', class_= 'editHeadline')
+    if budget_tag is None:
+        raise ScrapingError("Budget not found.")
+    match = _BUDGET_LABEL_PATTERN.search(str(budget_tag.parent))
+    if match is None:
+        raise ScrapingError("Budget not found.")
+    try:
+        budget = float(budget_tag.string)
+    except (TypeError, ValueError):
+        raise ScrapingError("Budget is not a valid float: {}".format(budget_tag.string))
+    return budget
+
+_BUDGET_TOKEN_PATTERN = re.compile(r"\.c_updateToken\(\"(.*)\"\)")
+_QUEUE_TOKEN_PATTERN = re.compile(r"token=(.*)\";")
+_BUDGET_LABEL_PATTERN = re.compile(r"Your current budget is:")
+_TITLE_PATTERN = re.compile(r"<title[\s>]", re.IGNORECASE)
+_DIV_MAIN_PATTERN = re.compile(r"<div\b[^>]*\bid\s*=\s*[\"']?divMain\b",
+                               re.IGNORECASE)
+_JOB_ID_PATTERN = re.compile(r"c_OnSelectJob\('(.*)'\)")
+_CELLS_PER_JOB = 7
+_PARSER_CHUNK_SIZE = 16 * 1024
+
+def _parse_print_queue(text):
+    """Returns the list of PrintJob objects on a print queue page.
+
+    Only the `#divMain` part of the page is parsed, without building a
+    tree; parsing stops as soon as the `#divMain` element is closed.
+    Every job is a row of seven `td.Middle` cells.
+    """
+    if _TITLE_PATTERN.search(text) is None:
+        raise ScrapingError("Page has no title.")
+    match = _DIV_MAIN_PATTERN.search(text)
+    if match is None:
+        return []
+
+    target = _QueueTableTarget()
+    parser = etree.HTMLParser(target=target)
+    position = match.start()
+    while position < len(text) and not target.done:
+        parser.feed(text[position:position + _PARSER_CHUNK_SIZE])
+        position += _PARSER_CHUNK_SIZE
+    cells = parser.close()
+
+    print_jobs = []
+    for j in range(0, len(cells) - _CELLS_PER_JOB + 1, _CELLS_PER_JOB):
+        onclick, name = cells[j]
+        try:
+            pages = int(cells[1 + j][1])
+            copies = int(cells[2 + j][1])
+            price = float(cells[3 + j][1])
+        except ValueError as err:
+            raise ScrapingError(err)
+        match = _JOB_ID_PATTERN.search(onclick or '')
+        if match is None:
+            raise ScrapingError("Print job id not found for document: {}".format(name))
+        print_jobs.append(PrintJob(match.group(1), name, pages, copies, price,
+                                   cells[4 + j][1], cells[6 + j][1]))
+    return print_jobs
+
+
+class _QueueTableTarget(object):
+    """lxml parser target which collects the `td.Middle` cells inside of
+    `#divMain` as `(onclick, text)` tuples.
+    """
+
+    def __init__(self):
+        self.done = False
+        self._cells = []
+        self._div_depth = 0
+        self._cell_text = None
+        self._onclick = None
+
+    def start(self, tag, attrib):
+        if tag == 'div':
+            if self._div_depth > 0:
+                self._div_depth += 1
+            elif not self.done and attrib.get('id') == 'divMain':
+                self._div_depth = 1
+        elif (tag == 'td' and self._div_depth > 0
+              and 'Middle' in attrib.get('class', '').split()):
+            self._cell_text = []
+            self._onclick = attrib.get('onclick')
+
+    def end(self, tag):
+        if tag == 'td' and self._cell_text is not None:
+            self._cells.append((self._onclick, u''.join(self._cell_text)))
+            self._cell_text = None
+        elif tag == 'div' and self._div_depth > 0:
+            self._div_depth -= 1
+            if self._div_depth == 0:
+                self.done = True
+
+    def data(self, data):
+        if self._cell_text is not None:
+            self._cell_text.append(data)
+
+    def close(self):
+        return self._cells
 
 
 class ScrapingError(Exception):
     pass
 
+class SessionExpiredError(ScrapingError):
+    """uniFLOW rejected the token of a signed in session."""
+    pass
+
 class NetworkError(Exception):
     pass
 
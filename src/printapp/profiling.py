@@ -0,0 +1,164 @@
+"""Profiles sampled requests with cProfile.
+
+With the PROFILING_ENABLED setting on, a PROFILE_SAMPLE_RATE fraction of
+requests is profiled, along with every request which has an X-Profile header
+holding a token from `make_token()`. Each profile is written to PROFILE_DIR
+with a JSON file of its endpoint, status and duration; only the newest
+PROFILE_MAX_FILES profiles are kept. `profilereport.py` summarizes them.
+
+When PROFILING_ENABLED is off no request hooks are installed at all.
+"""
+import os
+import json
+import time
+import random
+import uuid
+import cProfile
+from datetime import datetime
+from itsdangerous import TimestampSigner, BadSignature
+from flask import request, g
+from printapp import app
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_EXTENSION = '.prof'
+METADATA_EXTENSION = '.json'
+
+_TOKEN_SALT = 'printapp-profile'
+_TOKEN_VALUE = 'profile'
+
+
+class ProfileStore(object):
+    """A directory of profiles which keeps the newest `max_files` of them.
+
+    Profiles are `<name>.prof` files in the `pstats` format, next to a
+    `<name>.json` file of their metadata. Names start with the time the
+    profile was saved, so they sort oldest first.
+    """
+
+    def __init__(self, directory, max_files):
+        self.directory = directory
+        self.max_files = max_files
+
+    def save(self, profile, metadata):
+        """Writes a cProfile.Profile and a dict of metadata, then removes
+        the oldest profiles beyond `max_files`.
+        """
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                # Another thread created it.
+                pass
+        name = '{:%Y%m%dT%H%M%S.%f}-{}'.format(datetime.utcnow(),
+                                               uuid.uuid4().hex[:8])
+        path = os.path.join(self.directory, name)
+        profile.dump_stats(path + PROFILE_EXTENSION)
+        with open(path + METADATA_EXTENSION, 'w') as f:
+            json.dump(metadata, f)
+        self._evict()
+
+    def load(self):
+        """Returns a list of `(metadata, profile filename)` tuples, oldest
+        first.
+        """
+        profiles = []
+        for name in self._names():
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path + METADATA_EXTENSION) as f:
+                    metadata = json.load(f)
+            except (IOError, ValueError):
+                continue
+            profiles.append((metadata, path + PROFILE_EXTENSION))
+        return profiles
+
+    def _names(self):
+        try:
+            filenames = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(filename[:-len(PROFILE_EXTENSION)]
+                      for filename in filenames
+                      if filename.endswith(PROFILE_EXTENSION))
+
+    def _evict(self):
+        names = self._names()
+        for name in names[:max(len(names) - self.max_files, 0)]:
+            for extension in (PROFILE_EXTENSION, METADATA_EXTENSION):
+                try:
+                    os.remove(os.path.join(self.directory, name + extension))
+                except OSError:
+                    # Evicted by another thread.
+                    pass
+
+
+def make_token():
+    """Returns a value for the X-Profile header, which has any request
+    profiled for PROFILE_TOKEN_MAX_AGE seconds.
+    """
+    return _get_signer().sign(_TOKEN_VALUE)
+
+
+def _is_valid_token(token):
+    try:
+        value = _get_signer().unsign(
+            token, max_age=app.config['PROFILE_TOKEN_MAX_AGE'])
+    except BadSignature:
+        return False
+    return value == _TOKEN_VALUE
+
+
+def _get_signer():
+    return TimestampSigner(app.secret_key, salt=_TOKEN_SALT)
+
+
+def _should_profile():
+    token = request.headers.get(PROFILE_HEADER)
+    if token is not None and _is_valid_token(token):
+        return True
+    return random.random() < app.config['PROFILE_SAMPLE_RATE']
+
+
+def start_profile():
+    if _should_profile():
+        g.profile_start = time.time()
+        g.profile = cProfile.Profile()
+        g.profile.enable()
+
+
+def save_profile(response):
+    profile = getattr(g, 'profile', None)
+    if profile is None:
+        return response
+    profile.disable()
+    g.profile = None
+
+    metadata = {
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration': time.time() - g.profile_start,
+        'time': g.profile_start
+    }
+    try:
+        _store.save(profile, metadata)
+    except (IOError, OSError) as err:
+        app.logger.error('Could not save profile: {}'.format(repr(err)))
+    return response
+
+
+def stop_profile(exception=None):
+    # Requests which failed with an exception skip `save_profile`.
+    profile = getattr(g, 'profile', None)
+    if profile is not None:
+        profile.disable()
+        g.profile = None
+
+
+_store = ProfileStore(app.config['PROFILE_DIR'], app.config['PROFILE_MAX_FILES'])
+
+if app.config['PROFILING_ENABLED']:
+    app.before_request(start_profile)
+    app.after_request(save_profile)
+    app.teardown_request(stop_profile)
@@ -0,0 +1,174 @@
+"""Token bucket rate limits for the endpoints which call uniFLOW and Google.
+
+Each endpoint in the RATE_LIMITS setting has a bucket per user, or per client
+IP address for requests without a user. Signing in is limited per attempted
+email, and separately per client IP address over every email. Requests
+beyond the limit get a 429 with a Retry-After header.
+With `RATE_LIMIT_STORAGE = 'mongo'` the buckets are kept in the database,
+so the limits hold across worker processes.
+"""
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from pymongo.errors import PyMongoError, DuplicateKeyError
+from flask import request, session, make_response
+from printapp import app, mongo
+
+# Buckets which have not been used for this many seconds are dropped.
+BUCKET_TTL = 60 * 60
+# A Mongo bucket changed by another process is retried this many times
+# before the request is let through.
+_MAX_MONGO_ATTEMPTS = 3
+
+
+class TokenBucketLimiter(object):
+    """Thread safe token buckets, kept in this process and keyed by string.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        # key -> (tokens, time updated)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._next_sweep = clock() + BUCKET_TTL
+
+    def acquire(self, key, rate, burst):
+        """Takes a token from the bucket for `key`, which holds up to `burst`
+        tokens and gains `rate` tokens per second.
+
+        Returns 0 if a token was taken, or else the seconds until one is
+        available.
+        """
+        with self._lock:
+            now = self._clock()
+            if now >= self._next_sweep:
+                self._sweep(now)
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens, retry_after = _take_token(tokens, now - updated,
+                                              rate, burst)
+            self._buckets[key] = (tokens, now)
+            return retry_after
+
+    def _sweep(self, now):
+        self._buckets = dict((key, bucket)
+                             for key, bucket in self._buckets.iteritems()
+                             if now - bucket[1] < BUCKET_TTL)
+        self._next_sweep = now + BUCKET_TTL
+
+
+class MongoTokenBucketLimiter(object):
+    """Token buckets kept in a Mongo collection, shared by every process.
+
+    Buckets are documents with `tokens`, `updated` and `expires` fields. A
+    bucket is only changed if nobody else changed it since it was read, so
+    concurrent requests cannot both spend the last token.
+
+    If the database fails, requests are let through.
+    """
+
+    def __init__(self, get_collection, clock=time.time):
+        self._get_collection = get_collection
+        self._clock = clock
+
+    def ensure_indexes(self):
+        """Creates an index which removes unused buckets."""
+        self._get_collection().ensure_index('expires', expireAfterSeconds=0)
+
+    def acquire(self, key, rate, burst):
+        """Like `TokenBucketLimiter.acquire`."""
+        try:
+            return self._acquire(key, rate, burst)
+        except PyMongoError as err:
+            app.logger.error('Rate limit check failed: {}'.format(repr(err)))
+            return 0
+
+    def _acquire(self, key, rate, burst):
+        collection = self._get_collection()
+        for attempt in range(_MAX_MONGO_ATTEMPTS):
+            now = self._clock()
+            bucket = collection.find_one({'_id': key})
+            if bucket is None:
+                tokens, elapsed = burst, 0
+            else:
+                tokens, elapsed = bucket['tokens'], now - bucket['updated']
+            tokens, retry_after = _take_token(tokens, elapsed, rate, burst)
+            if retry_after:
+                return retry_after
+
+            fields = {'tokens': tokens, 'updated': now,
+                      'expires': datetime.utcnow() + timedelta(seconds=BUCKET_TTL)}
+            if bucket is None:
+                try:
+                    fields['_id'] = key
+                    collection.insert(fields)
+                    return 0
+                except DuplicateKeyError:
+                    continue
+            result = collection.update({'_id': key,
+                                        'updated': bucket['updated']},
+                                       {'$set': fields})
+            if result and result.get('n'):
+                return 0
+        return 0
+
+
+def _take_token(tokens, elapsed, rate, burst):
+    """Refills a bucket for `elapsed` seconds and takes a token from it.
+
+    Returns the tokens left, and 0 or the seconds until a token is
+    available if the bucket was empty.
+    """
+    tokens = min(burst, tokens + max(elapsed, 0) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+
+def _make_limiter():
+    if app.config['RATE_LIMIT_STORAGE'] == 'mongo':
+        return MongoTokenBucketLimiter(lambda: mongo.db.ratelimits)
+    return TokenBucketLimiter()
+
+_limiter = _make_limiter()
+
+
+def ensure_indexes():
+    """Creates the indexes of the rate limit collection, if it is used."""
+    if isinstance(_limiter, MongoTokenBucketLimiter):
+        _limiter.ensure_indexes()
+
+
+@app.before_request
+def limit_request_rate():
+    """Answers 429 Too Many Requests once a user or client has used up the
+    rate limit of the endpoint.
+    """
+    limit = app.config['RATE_LIMITS'].get(request.endpoint)
+    if limit is None:
+        return None
+    requests_per_minute, burst = limit
+
+    retry_after = 0
+    if request.endpoint == 'login':
+        # The email of a sign in is chosen by the client, so each client is
+        # also limited over every email it tries.
+        ip_requests_per_minute, ip_burst = app.config['LOGIN_IP_RATE_LIMIT']
+        key = u'login-ip|{}'.format(request.remote_addr)
+        retry_after = _limiter.acquire(key, ip_requests_per_minute / 60.0,
+                                       ip_burst)
+    if not retry_after:
+        # Signing in is limited per attempted email, whichever address the
+        # attempts come from.
+        email = session.get('email') or request.form.get('email', '').strip()
+        if email:
+            key = u'{}|email|{}'.format(request.endpoint, email.lower())
+        else:
+            key = u'{}|ip|{}'.format(request.endpoint, request.remote_addr)
+        retry_after = _limiter.acquire(key, requests_per_minute / 60.0, burst)
+    if not retry_after:
+        return None
+
+    response = make_response('', 429)
+    response.headers['Retry-After'] = str(int(math.ceil(retry_after)))
+    return response
@@ -1,6 +1,7 @@
 from printapp import app, util
-from flask import render_template, make_response, request, redirect
+from flask import render_template, make_response, request, redirect, abort
 import oauthcredentials
+import metrics
 
 @app.route('/')
 def index():
@@ -35,6 +36,17 @@ def about():
     response = make_response(render_template('about.html', title='About'))
     return response
 
+@app.route('/metrics')
+def metrics_text():
+    """Route for request and upstream latency metrics, in the Prometheus
+    text format. Only clients in the STATS_ALLOWED_IPS setting may read it.
+    """
+    if not util.is_stats_client():
+        abort(403)
+    response = make_response(metrics.REGISTRY.render())
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
 @app.route('/oauthredirect')
 def oauthredirect():
     """Callback route to receive an authorization code for cloud print.
@@ -54,25 +54,73 @@ App.ApplicationController = Ember.Controller.extend({
     return Math.round(this.get('printBudget') / 0.285);
   }.property('printBudget'),
 
+  // The cloud print status arrives with the queue and budget; the cloudprint
+  // controller picks it up from this request.
+  statusRequest: null,
+
   getQueueAndBudget: function() {
     var controller = this;
-    $.get('/api/uniflowstatus')
+    var request = $.get('/api/status');
+    this.set('statusRequest', request);
+    request
     .done(function(data, textStatus, response) {
-      controller.set('controllers.queue.model', data.queue);
-      controller.set('printBudget', data.budget);
-      controller.set('uniflowIsDown', false);
+      controller.setQueueAndBudget(data.uniflow);
     })
     .error(function(data, textStatus, response) {
-      controller.set('loadingFailed', true);
-      if (data.status === 504) {
-        controller.set('uniflowIsDown', true);
-      } 
-      else if (data.status === 401) {
-        //The password in the session cookie is invalid, so sign the use out. 
+      controller.setQueueAndBudget({status: data.status});
+    });
+  },
+
+  setQueueAndBudget: function(uniflow) {
+    if (uniflow.status === 200) {
+      this.set('controllers.queue.model', uniflow.queue);
+      this.set('printBudget', uniflow.budget);
+      this.set('uniflowIsDown', false);
+      this.watchQueueAndBudget();
+      return;
+    }
+    this.set('loadingFailed', true);
+    if (uniflow.status === 504) {
+      this.set('uniflowIsDown', true);
+    } 
+    else if (uniflow.status === 401) {
+      //The password in the session cookie is invalid, so sign the use out. 
+      logout_user();
+    } else {
+      App.util.showAlert('#budgetError, #queueError');
+      this.set('uniflowIsDown', false);
+    }
+  },
+
+  // Keep the queue and budget up to date with server-sent events.
+  // Browsers without EventSource only refresh when the page asks for it.
+  watchQueueAndBudget: function() {
+    if (!window.EventSource || this.get('queueEvents')) {
+      return;
+    }
+    var controller = this;
+    var events = new EventSource('/api/uniflowstream');
+    this.set('queueEvents', events);
+
+    events.addEventListener('snapshot', function(event) {
+      var data = JSON.parse(event.data);
+      controller.set('controllers.queue.model', data.queue);
+      controller.set('printBudget', data.budget);
+    });
+    events.addEventListener('diff', function(event) {
+      var data = JSON.parse(event.data);
+      var queue = controller.get('controllers.queue.model');
+      var replaced = _.pluck(data.changed, 'job_id').concat(data.removed);
+      queue.removeObjects(queue.filter(function(job) {
+        return _.contains(replaced, job.job_id);
+      }));
+      queue.pushObjects(data.changed.concat(data.added));
+      controller.set('printBudget', data.budget);
+    });
+    events.addEventListener('failure', function(event) {
+      if (JSON.parse(event.data).status === 401) {
+        events.close();
         logout_user();
-      } else {
-        App.util.showAlert('#budgetError, #queueError');
-        controller.set('uniflowIsDown', false);
       }
     });
   },
@@ -192,7 +240,19 @@ App.CloudprintController = Ember.ObjectController.extend({
 
   init: function() {
     this._super();
-    this.getCloudPrintStatus();
+    var controller = this;
+    var statusRequest = this.get('controllers.application.statusRequest');
+    if (statusRequest) {
+      statusRequest
+      .done(function(data, textStatus, response) {
+        controller.setCloudPrintStatus(data.cloudprint);
+      })
+      .fail(function(data, textStatus, response) {
+        controller.set('loadingError', true);
+      });
+    } else {
+      this.getCloudPrintStatus();
+    }
   },
 
   haveCloudPrintPermission: null,
@@ -211,15 +271,23 @@ App.CloudprintController = Ember.ObjectController.extend({
     var controller = this;
     return $.get('/api/cloudprintstatus')
     .done(function(data, textStatus, response) {
-      controller.set('haveCloudPrintPermission', data.haveCloudPrintPermission);
-      controller.set('isPrinterInstalled', data.isPrinterInstalled);
-      controller.set('cloudPrintPermissionUrl', data.cloudPrintPermissionUrl);
+      controller.setCloudPrintStatus($.extend({status: 200}, data));
     })
     .fail(function(data, textStatus, response) {
       controller.set('loadingError', true);
     });
   },
 
+  setCloudPrintStatus: function(cloudprint) {
+    if (cloudprint.status !== 200) {
+      this.set('loadingError', true);
+      return;
+    }
+    this.set('haveCloudPrintPermission', cloudprint.haveCloudPrintPermission);
+    this.set('isPrinterInstalled', cloudprint.isPrinterInstalled);
+    this.set('cloudPrintPermissionUrl', cloudprint.cloudPrintPermissionUrl);
+  },
+
   checkIfPrinterAdded: function() {
     var controller = this;
     this.getCloudPrintStatus()
@@ -387,17 +455,20 @@ App.PrintFormController = Ember.ObjectController.extend({
         collate: controller.get('collate'),
         copies: controller.get('copies')
       })
-      .done(function(data, textStatus, response) {
+      .then(function(data, textStatus, response) {
+        return controller.waitForPrintJob(data.print_id);
+      })
+      .done(function() {
         App.util.showAlert('#printSuccess');
         controller.set('uploadProgress', 0.0);
         controller.set('fileName', null);
         controller.set('documentId', null);
         controller.get('controllers.application').getQueueAndBudget();
       })
-      .fail(function(data, textStatus, response) {
+      .fail(function() {
         App.util.showAlert('#printError');
       })
-      .always(function(data, textStatus, response) {
+      .always(function() {
         controller.set('printing', false);
         controller.set('copies', 1);
         controller.clearFileInput();
@@ -413,6 +484,37 @@ App.PrintFormController = Ember.ObjectController.extend({
     }
   },
 
+  // Poll a print job submitted in the background until Google has
+  // processed it. The returned promise fails if the job failed, or is
+  // still not done after `maxPrintJobPolls` polls.
+  maxPrintJobPolls: 120,
+
+  waitForPrintJob: function(printId) {
+    var result = $.Deferred();
+    var polls = 0;
+    var maxPolls = this.get('maxPrintJobPolls');
+    var poll = function() {
+      polls += 1;
+      $.get('/api/printstatus/' + printId)
+      .done(function(data, textStatus, response) {
+        if (data.state === 'done') {
+          result.resolve(data);
+        } else if (data.state === 'failed') {
+          result.reject(data);
+        } else if (polls >= maxPolls) {
+          result.reject({state: 'failed', status: 504});
+        } else {
+          setTimeout(poll, 1000);
+        }
+      })
+      .fail(function(data, textStatus, response) {
+        result.reject(data);
+      });
+    };
+    poll();
+    return result.promise();
+  },
+
   clearFileInput: function() {
     var element = document.getElementById('file-input');
     element.value = '';
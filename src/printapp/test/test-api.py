@@ -1,8 +1,11 @@
 import unittest
 import os
+import time
 import printapp
 import flask
-from printapp.api import _has_supported_filetype
+import gridfs
+from StringIO import StringIO
+from printapp.api import _has_supported_filetype, _get_status_section
 import printapp.test.util
 
 class ApiTestCase(unittest.TestCase):
@@ -10,6 +13,10 @@ class ApiTestCase(unittest.TestCase):
     def setUp(self):
         printapp.app.secret_key = 'test key'
         printapp.app.config['TESTING'] = True
+        # Every test signs in again, which the login rate limit would reject.
+        self.addCleanup(printapp.app.config.__setitem__, 'RATE_LIMITS',
+                        printapp.app.config['RATE_LIMITS'])
+        printapp.app.config['RATE_LIMITS'] = {}
         self.get_client = printapp.app.test_client
         self.username = os.getenv('UNIFLOW_USER')
         self.password = os.getenv('UNIFLOW_PASSWORD')
@@ -83,6 +90,55 @@ class ApiTestCase(unittest.TestCase):
             self.assertIsNotNone(response_json['queue'])
             self.assertIsNotNone(response_json['budget'])
 
+            etag = response.headers['ETag']
+            response = app.get("/api/uniflowstatus",
+                               headers={'If-None-Match': etag})
+            self.assertEqual(self._status(response), 304)
+            self.assertEqual(response.headers['ETag'], etag)
+
+    def test_status(self):
+        with self.get_client() as app:
+            response = app.get('/api/status')
+            self.assertEqual(self._status(response), 401)
+
+            self._sign_in(app)
+
+            response = app.get('/api/status')
+            response_json = flask.json.loads(response.data)
+            self.assertEqual(self._status(response), 200)
+            cloudprint_json = response_json['cloudprint']
+            self.assertEqual(cloudprint_json['status'], 200)
+            self.assertIsNotNone(cloudprint_json['cloudPrintPermissionUrl'])
+            uniflow_json = response_json['uniflow']
+            self.assertEqual(uniflow_json['status'], 200)
+            self.assertIsNotNone(uniflow_json['queue'])
+            self.assertIsNotNone(uniflow_json['budget'])
+
+    def test_uniflowstream(self):
+        with self.get_client() as app:
+            response = app.get('/api/uniflowstream')
+            self.assertEqual(self._status(response), 401)
+
+            self._sign_in(app)
+
+            response = app.get('/api/uniflowstream', buffered=False)
+            self.assertEqual(self._status(response), 200)
+            name, data = self._read_stream_event(response)
+            response.close()
+            self.assertEqual(name, 'snapshot')
+            self.assertIsNotNone(data['queue'])
+            self.assertIsNotNone(data['budget'])
+
+            with app.session_transaction() as session:
+                session['password'] = 'invalidPassword'
+            response = app.get('/api/uniflowstream', buffered=False)
+            self.assertEqual(self._status(response), 200)
+            name, data = self._read_stream_event(response)
+            self.assertEqual((name, data), ('failure', {'status': 401}))
+            # The stream ends instead of signing in again.
+            self.assertEqual(list(response.response), [])
+            response.close()
+
     def test_upload_file(self):
         with self.get_client() as app:
             self._sign_in(app)
@@ -101,6 +157,40 @@ class ApiTestCase(unittest.TestCase):
             response = app.post('/api/upload', data=form_data)
             self.assertEqual(self._status(response), 400)
 
+            form_data = {}
+            form_data['file'] = (StringIO('MZ'), 'test.exe')
+            response = app.post('/api/upload', data=form_data)
+            self.assertEqual(self._status(response), 400)
+
+    def test_upload_file_other_field(self):
+        with self.get_client() as app:
+            self._sign_in(app)
+
+            form_data = {}
+            form_data['document'] = (StringIO('test'), 'other-field.txt')
+            response = app.post('/api/upload', data=form_data)
+            self.assertEqual(self._status(response), 400)
+
+            email = '{}@students.calvin.edu'.format(self.username)
+            with printapp.app.app_context():
+                fs = gridfs.GridFS(printapp.mongo.db, 'document_fs')
+                self.assertFalse(fs.exists(filename='other-field.txt',
+                                           email=email))
+
+    def test_upload_file_too_large(self):
+        with self.get_client() as app:
+            self._sign_in(app)
+
+            max_content_length = printapp.app.config['MAX_CONTENT_LENGTH']
+            printapp.app.config['MAX_CONTENT_LENGTH'] = 1024
+            try:
+                form_data = {}
+                form_data['file'] = (StringIO('a' * 2048), 'test.txt')
+                response = app.post('/api/upload', data=form_data)
+                self.assertEqual(self._status(response), 413)
+            finally:
+                printapp.app.config['MAX_CONTENT_LENGTH'] = max_content_length
+
     def test_has_supported_filetype(self):
         self.assertFalse(_has_supported_filetype('test.file'))
         self.assertFalse(_has_supported_filetype('test.docc'))
@@ -110,6 +200,38 @@ class ApiTestCase(unittest.TestCase):
         self.assertTrue(_has_supported_filetype('test.pdf'))
         self.assertTrue(_has_supported_filetype('test.txt'))
 
+    def test_cachestats(self):
+        with self.get_client() as app:
+            response = app.get('/api/cachestats',
+                               environ_base={'REMOTE_ADDR': '127.0.0.1'})
+            self.assertEqual(self._status(response), 200)
+            self.assertIn('uniflow', flask.json.loads(response.data))
+            response = app.get('/api/cachestats',
+                               environ_base={'REMOTE_ADDR': '192.0.2.1'})
+            self.assertEqual(self._status(response), 403)
+
+    def test_get_status_section(self):
+        def fail(error):
+            raise error
+
+        self.assertEqual(_get_status_section(lambda: {'queue': []}),
+                         {'queue': [], 'status': 200})
+        self.assertEqual(_get_status_section(
+            fail, printapp.printstatus.NetworkError()), {'status': 504})
+        self.assertEqual(_get_status_section(
+            fail, printapp.cloudprint.UpstreamError()), {'status': 502})
+        self.assertEqual(_get_status_section(fail, KeyError('queue')),
+                         {'status': 500})
+
+    def _read_stream_event(self, response):
+        """Returns the name and data of the next server-sent event."""
+        for chunk in response.response:
+            if chunk.startswith(':'):
+                # keep-alive
+                continue
+            lines = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+            return lines['event'], flask.json.loads(lines['data'])
+
     def _status(self, response):
         return int(response.status.split()[0])
 
@@ -125,6 +247,9 @@ class ApiPrintDeleteTestCase(unittest.TestCase):
     def setUp(self):
         printapp.app.secret_key = 'test key'
         printapp.app.config['TESTING'] = True
+        self.addCleanup(printapp.app.config.__setitem__, 'RATE_LIMITS',
+                        printapp.app.config['RATE_LIMITS'])
+        printapp.app.config['RATE_LIMITS'] = {}
         self.get_client = printapp.app.test_client
         self.username = os.getenv('UNIFLOW_USER')
         self.password = os.getenv('UNIFLOW_PASSWORD')
@@ -158,6 +283,32 @@ class ApiPrintDeleteTestCase(unittest.TestCase):
             response_json = flask.json.loads(response.data)
             self.assertEqual(response_json['queue'], [])
 
+    def test_deletejobs(self):
+        """Tests the /api/deletejobs endpoint.
+        """
+        with self.get_client() as app:
+            self._sign_in(app)
+
+            response = app.post('/api/deletejobs')
+            self.assertEqual(self._status(response), 400)
+            response = app.post('/api/deletejobs', data={'job_id': 'invalidJobID'})
+            self.assertEqual(self._status(response), 200)
+            response_json = flask.json.loads(response.data)
+            self.assertEqual(response_json['results'], {'invalidJobID': 'not_found'})
+
+            response = app.get("/api/uniflowstatus")
+            queue = flask.json.loads(response.data)['queue']
+            job_ids = [document['job_id'] for document in queue]
+            response = app.post('/api/deletejobs', data={'job_id': job_ids})
+            self.assertEqual(self._status(response), 200)
+            results = flask.json.loads(response.data)['results']
+            for job_id in job_ids:
+                self.assertEqual(results[job_id], 'deleted')
+
+            response = app.get("/api/uniflowstatus")
+            response_json = flask.json.loads(response.data)
+            self.assertEqual(response_json['queue'], [])
+
     def test_print(self):
         """Tests the /api/upload and /api/print endpoints.
         """
@@ -190,10 +341,28 @@ class ApiPrintDeleteTestCase(unittest.TestCase):
             response = app.post('/api/print', data=form_data)
             self.assertEqual(self._status(response), 400)
 
+            print_ids = []
             for objectid in oid:
                 form_data['file_id'] = objectid
                 response = app.post('/api/print', data=form_data)
-                self.assertEqual(self._status(response), 201)
+                self.assertEqual(self._status(response), 202)
+                print_ids.append(flask.json.loads(response.data)['print_id'])
+
+            for print_id in print_ids:
+                self.assertEqual(self._wait_for_print_job(app, print_id), 'done')
+
+            response = app.get('/api/printstatus/000000000000000000000000')
+            self.assertEqual(self._status(response), 404)
+
+    def _wait_for_print_job(self, app, print_id):
+        for i in range(120):
+            response = app.get('/api/printstatus/{}'.format(print_id))
+            self.assertEqual(self._status(response), 200)
+            state = flask.json.loads(response.data)['state']
+            if state in ('done', 'failed'):
+                return state
+            time.sleep(1)
+        return state
 
     def _status(self, response):
         return int(response.status.split()[0])
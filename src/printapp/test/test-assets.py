@@ -0,0 +1,50 @@
+import unittest
+import os
+import json
+import shutil
+import tempfile
+import buildassets
+
+class TestBuildAssets(unittest.TestCase):
+
+    def setUp(self):
+        self._static_dir = tempfile.mkdtemp()
+        self._write('fonts/icons.woff', 'font')
+        self._write('css/style.css',
+                    "a { background: url('../fonts/icons.woff?v=1'); }")
+        self._write('js/app.js', "$.getJSON('static/data.json');" * 100)
+        self._write('data.json', '{}')
+
+    def tearDown(self):
+        shutil.rmtree(self._static_dir)
+
+    def test_build(self):
+        manifest = buildassets.build(self._static_dir)
+        self.assertEqual(len(manifest), 4)
+        with open(self._path(buildassets.BUILD_DIR,
+                             buildassets.MANIFEST_NAME)) as f:
+            self.assertEqual(json.load(f), manifest)
+
+        font_name = os.path.basename(manifest['fonts/icons.woff'])
+        self.assertIn(font_name, self._read(manifest['css/style.css']))
+        self.assertIn('/static/' + manifest['data.json'],
+                      self._read(manifest['js/app.js']))
+
+        self.assertTrue(os.path.isfile(self._path(manifest['js/app.js'] + '.gz')))
+        self.assertFalse(os.path.isfile(self._path(manifest['data.json'] + '.gz')))
+        self.assertFalse(os.path.isfile(
+            self._path(manifest['fonts/icons.woff'] + '.gz')))
+
+    def _path(self, *path):
+        return os.path.join(self._static_dir, *'/'.join(path).split('/'))
+
+    def _write(self, path, content):
+        filename = self._path(path)
+        if not os.path.isdir(os.path.dirname(filename)):
+            os.makedirs(os.path.dirname(filename))
+        with open(filename, 'w') as f:
+            f.write(content)
+
+    def _read(self, path):
+        with open(self._path(path)) as f:
+            return f.read()
@@ -0,0 +1,46 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+import fakeuniflow
+import printapp.asyncprintstatus as asyncprintstatus
+
+# Fetches a budget and queue from a fake uniFLOW server with the sockets
+# patched by gevent, which must happen before anything else is imported.
+_MONKEY_PATCHED_SCRIPT = """
+import gevent.monkey
+gevent.monkey.patch_all()
+import json
+import fakeuniflow
+from printapp import asyncprintstatus, printstatus
+server = fakeuniflow.start_server(fakeuniflow.FakeUniflow(jobs=3))
+printstatus.set_base_url(server.url)
+client = asyncprintstatus.get_uniflow_client('unittest', 'password').get()
+budget, queue = client.get_budget_and_print_queue().get()
+print json.dumps({'budget': budget, 'job_ids': [job.job_id for job in queue]})
+server.shutdown()
+"""
+
+@unittest.skipIf(asyncprintstatus.gevent is None, 'gevent is not installed')
+class TestAsyncPrintStatus(unittest.TestCase):
+
+    def test_requires_patched_sockets(self):
+        # The tests do not run under gevent.monkey, so uniFLOW requests
+        # would block the event loop.
+        self.assertRaises(RuntimeError, asyncprintstatus.get_uniflow_client,
+                          'invalidUser', 'invalidPassword')
+
+    def test_budget_and_print_queue(self):
+        # Patching this process would change every other test, so the
+        # requests are made from a new one.
+        src_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, os.pardir)
+        output = subprocess.check_output(
+            [sys.executable, '-c', _MONKEY_PATCHED_SCRIPT], cwd=src_path)
+        result = json.loads(output.strip().splitlines()[-1])
+
+        uniflow = fakeuniflow.FakeUniflow(jobs=3)
+        self.assertEqual(result['budget'], uniflow.get_budget('unittest'))
+        self.assertEqual(result['job_ids'],
+                         [job['job_id'] for job in uniflow.get_queue('unittest')])
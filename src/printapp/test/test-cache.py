@@ -0,0 +1,70 @@
+import unittest
+import time
+import threading
+from printapp.cache import TTLCache
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_get_or_load(self):
+        cache = TTLCache(ttl=60)
+        self.assertEqual(cache.get_or_load('a', lambda: 1), 1)
+        self.assertEqual(cache.get_or_load('a', lambda: 2), 1)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_expiry(self):
+        cache = TTLCache(ttl=0)
+        cache.set('a', 1)
+        time.sleep(0.01)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_invalidate(self):
+        cache = TTLCache(ttl=60)
+        cache.set('a', 1)
+        cache.invalidate('a')
+        self.assertIsNone(cache.get('a'))
+
+    def test_invalidate_without_entries(self):
+        cache = TTLCache(ttl=60)
+        for key in range(100):
+            cache.invalidate(key)
+            cache.update(key, lambda value: value + 1)
+        cache.get_or_load('a', lambda: 1)
+        cache.invalidate('a')
+        self.assertEqual(cache._generations, {})
+
+    def test_update(self):
+        cache = TTLCache(ttl=60)
+        cache.update('a', lambda value: value + 1)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', 1)
+        cache.update('a', lambda value: value + 1)
+        self.assertEqual(cache.get('a'), 2)
+
+    def test_stale_load_is_not_stored(self):
+        cache = TTLCache(ttl=60)
+
+        def load():
+            cache.invalidate('a')
+            return 'stale'
+
+        self.assertEqual(cache.get_or_load('a', load), 'stale')
+        self.assertIsNone(cache.get('a'))
+
+    def test_concurrent_loads_are_shared(self):
+        cache = TTLCache(ttl=60)
+        calls = []
+
+        def load():
+            calls.append(1)
+            time.sleep(0.1)
+            return len(calls)
+
+        threads = [threading.Thread(target=cache.get_or_load, args=('a', load))
+                   for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get('a'), 1)
@@ -63,3 +63,13 @@ class TestCloudprint(unittest.TestCase):
                                                color=False, duplex=True,
                                                copies=1, collate=False)
                 test_file.close()
+
+
+class TestPollIntervals(unittest.TestCase):
+
+    def test_backoff(self):
+        intervals = printapp.cloudprint._poll_intervals(0.5, 4)
+        for expected in [0.5, 1, 2, 4, 4, 4]:
+            interval = next(intervals)
+            self.assertLessEqual(interval, expected)
+            self.assertGreaterEqual(interval, expected / 2.0)
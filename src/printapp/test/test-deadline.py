@@ -0,0 +1,30 @@
+import unittest
+import time
+from printapp import deadline
+from printapp.workerpool import WorkerPool
+
+class TestDeadline(unittest.TestCase):
+
+    def tearDown(self):
+        deadline.clear()
+
+    def test_default_timeout(self):
+        deadline.clear()
+        self.assertEqual(deadline.timeout(), (deadline.CONNECT_TIMEOUT,
+                                              deadline.DEFAULT_TIMEOUT))
+
+    def test_timeout(self):
+        deadline.start(2)
+        connect, read = deadline.timeout()
+        self.assertLessEqual(connect, deadline.CONNECT_TIMEOUT)
+        self.assertTrue(0 < read <= 2)
+
+    def test_exceeded(self):
+        deadline.start(0)
+        time.sleep(0.01)
+        self.assertRaises(deadline.DeadlineExceededError, deadline.timeout)
+
+    def test_worker_threads_keep_deadline(self):
+        expected = deadline.start(10)
+        pool = WorkerPool(1)
+        self.assertIs(pool.submit(deadline.current).get(), expected)
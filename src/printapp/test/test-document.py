@@ -5,6 +5,7 @@ import gridfs
 import printapp
 from printapp import app, mongo
 from printapp.document import save_document, get_document, delete_document
+from printapp.document import DocumentWriter, DocumentTooLargeError
 from bson.objectid import ObjectId
 
 class TestDocument(unittest.TestCase):
@@ -79,3 +80,45 @@ class TestDocument(unittest.TestCase):
 
             for i in range(2):
                 self.assertFalse(fs.exists(_id=ObjectId(doc_ids[i]), email=self._email))
+
+    def test_document_writer(self):
+        with app.app_context():
+            file_name = 'test.pdf'
+            path = os.path.join(self._path, 'docs', file_name)
+            with open(path, 'rb') as test_file:
+                expected_data = test_file.read()
+
+            writer = DocumentWriter(file_name, self._email)
+            for i in range(0, len(expected_data), 1024):
+                writer.write(expected_data[i:i + 1024])
+            writer.close()
+            retrieved_file = get_document(document_id=writer.document_id,
+                                          email=self._email)
+            self.assertTrue(retrieved_file.read() == expected_data)
+
+            writer = DocumentWriter(file_name, self._email, max_size=10)
+            writer.write('a' * 10)
+            self.assertRaises(DocumentTooLargeError, writer.write, 'a')
+            self.assertIsNone(writer.document_id)
+
+    def test_document_writer_max_size(self):
+        with app.app_context():
+            writer = DocumentWriter('test.txt', self._email, max_size=10)
+            writer.write('a' * 6)
+            self.assertRaises(DocumentTooLargeError, writer.write, 'a' * 6)
+            self.assertTrue(writer.closed)
+            self.assertIsNone(writer.document_id)
+
+    def test_document_writer_seek(self):
+        with app.app_context():
+            writer = DocumentWriter('test.txt', self._email)
+            writer.write('test')
+            self.assertRaises(IOError, writer.seek, 2)
+            writer.seek(0)
+            self.assertTrue(writer.complete)
+            self.assertIsNone(writer.document_id)
+            self.assertRaises(IOError, writer.write, 'test')
+            writer.close()
+            retrieved_file = get_document(document_id=writer.document_id,
+                                          email=self._email)
+            self.assertEqual(retrieved_file.read(), 'test')
@@ -0,0 +1,66 @@
+import unittest
+import printapp
+from printapp.metrics import Registry, REGISTRY, time_upstream
+
+@printapp.app.route('/test/metrics-failure')
+def metrics_failure():
+    raise KeyError('missing')
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram(self):
+        registry = Registry()
+        histogram = registry.histogram('latency_seconds', 'Latency.',
+                                       labels=('endpoint',), buckets=(0.1, 1))
+        histogram.observe(0.05, endpoint='status')
+        histogram.observe(0.5, endpoint='status')
+        histogram.observe(5, endpoint='status')
+        text = registry.render()
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertIn('latency_seconds_bucket{endpoint="status",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{endpoint="status",le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{endpoint="status",le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_count{endpoint="status"} 3', text)
+        self.assertIn('latency_seconds_sum{endpoint="status"} 5.55', text)
+
+    def test_counter(self):
+        registry = Registry()
+        counter = registry.counter('errors_total', 'Errors.', labels=('error',))
+        counter.inc(error='a "quoted" name')
+        counter.inc(error='a "quoted" name')
+        self.assertIn(r'errors_total{error="a \"quoted\" name"} 2',
+                      registry.render())
+
+    def test_time_upstream(self):
+        def fail():
+            with time_upstream('test', 'fail'):
+                raise KeyError('missing')
+        self.assertRaises(KeyError, fail)
+        text = REGISTRY.render()
+        self.assertIn('printapp_upstream_errors_total{upstream="test",'
+                      'operation="fail",error="KeyError"}', text)
+        self.assertIn('printapp_upstream_duration_seconds_count{upstream="test",'
+                      'operation="fail"}', text)
+
+    def test_metrics_route(self):
+        with printapp.app.test_client() as app:
+            response = app.get('/metrics',
+                               environ_base={'REMOTE_ADDR': '127.0.0.1'})
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('printapp_request_duration_seconds', response.data)
+            response = app.get('/metrics',
+                               environ_base={'REMOTE_ADDR': '192.0.2.1'})
+            self.assertEqual(response.status_code, 403)
+
+    def test_failed_requests_are_timed(self):
+        config = printapp.app.config
+        testing, propagate = config['TESTING'], config['PROPAGATE_EXCEPTIONS']
+        config['TESTING'], config['PROPAGATE_EXCEPTIONS'] = False, False
+        try:
+            response = printapp.app.test_client().get('/test/metrics-failure')
+        finally:
+            config['TESTING'], config['PROPAGATE_EXCEPTIONS'] = testing, propagate
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('printapp_request_duration_seconds_count{'
+                      'endpoint="metrics_failure",method="GET",status="500"} 1',
+                      REGISTRY.render())
@@ -0,0 +1,63 @@
+import unittest
+import cgi
+from StringIO import StringIO
+from printapp import multipart
+
+
+class TestMultipartEncoder(unittest.TestCase):
+
+    def _parse(self, body, encoder):
+        environ = {'REQUEST_METHOD': 'POST',
+                   'CONTENT_TYPE': encoder.content_type,
+                   'CONTENT_LENGTH': str(len(body))}
+        return cgi.FieldStorage(fp=StringIO(body), environ=environ)
+
+    def test_encode(self):
+        content = 'x' * 100000
+        encoder = multipart.MultipartEncoder(
+            [('title', u'caf\xe9'), ('tag', ['a', 'b']), ('skipped', None)],
+            [('content', 'test.pdf', StringIO(content), 'application/pdf')])
+        body = encoder.read()
+        self.assertEqual(len(body), len(encoder))
+        self.assertEqual(encoder.read(), '')
+
+        fields = self._parse(body, encoder)
+        self.assertEqual(fields.getfirst('title'), 'caf\xc3\xa9')
+        self.assertEqual(fields.getlist('tag'), ['a', 'b'])
+        self.assertNotIn('skipped', fields)
+        self.assertEqual(fields['content'].filename, 'test.pdf')
+        self.assertEqual(fields['content'].type, 'application/pdf')
+        self.assertEqual(fields.getfirst('content'), content)
+
+    def test_read_in_blocks(self):
+        content = ''.join(chr(i % 256) for i in range(5000))
+        file = StringIO(content)
+        encoder = multipart.MultipartEncoder(
+            [('printerid', 'id')], [('content', 'test.txt', file, None),
+                                    ('empty', 'empty.txt', StringIO(''), None)])
+        blocks = []
+        while True:
+            block = encoder.read(7)
+            if not block:
+                break
+            self.assertLessEqual(len(block), 7)
+            blocks.append(block)
+        body = ''.join(blocks)
+        self.assertEqual(len(body), len(encoder))
+        self.assertEqual(self._parse(body, encoder).getfirst('content'), content)
+        self.assertEqual(''.join(multipart.MultipartEncoder(
+            [], [('content', 'test.txt', StringIO(content), None)])).count(content), 1)
+
+    def test_file_position(self):
+        file = StringIO('skipped content')
+        file.seek(8)
+        encoder = multipart.MultipartEncoder([], [('content', 'a', file, None)])
+        fields = self._parse(encoder.read(), encoder)
+        self.assertEqual(fields.getfirst('content'), 'content')
+
+    def test_truncated_file(self):
+        file = StringIO('content')
+        encoder = multipart.MultipartEncoder([], [('content', 'a', file, None)])
+        file.truncate(3)
+        with self.assertRaises(IOError):
+            encoder.read()
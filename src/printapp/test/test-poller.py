@@ -0,0 +1,69 @@
+import unittest
+import time
+from printapp.poller import PollerRegistry
+from printapp.printstatus import PrintJob, NetworkError, InvalidCredentialsError
+
+def _make_job(job_id, pages=1):
+    return PrintJob(job_id, 'name', pages, 1, 0.03, 'printer', 'date')
+
+class TestPoller(unittest.TestCase):
+
+    def setUp(self):
+        self.responses = [
+            (10.0, [_make_job('a'), _make_job('b')]),
+            (10.0, [_make_job('a'), _make_job('b')]),
+            (9.0, [_make_job('b', pages=2), _make_job('c')]),
+        ]
+        self.pollers = PollerRegistry(min_interval=0.01, max_interval=0.02)
+
+    def _fetch(self):
+        if len(self.responses) > 1:
+            return self.responses.pop(0)
+        return self.responses[0]
+
+    def test_snapshot_and_diff(self):
+        events = self.pollers.subscribe('user', self._fetch)
+        self.assertEqual(events.get(timeout=1),
+                         ('snapshot', 10.0, [_make_job('a'), _make_job('b')]))
+        self.assertEqual(events.get(timeout=1),
+                         ('diff', 9.0, [_make_job('c')], ['a'],
+                          [_make_job('b', pages=2)]))
+        self.pollers.unsubscribe('user', events)
+        self.assertEqual(len(self.pollers), 0)
+
+    def test_streams_share_a_poller(self):
+        first = self.pollers.subscribe('user', self._fetch)
+        first.get(timeout=1)
+        second = self.pollers.subscribe('user', self._fetch)
+        self.assertEqual(len(self.pollers), 1)
+        self.assertEqual(second.get(timeout=1)[0], 'snapshot')
+        self.pollers.unsubscribe('user', first)
+        self.assertEqual(len(self.pollers), 1)
+        self.pollers.unsubscribe('user', second)
+        self.assertEqual(len(self.pollers), 0)
+
+    def test_errors(self):
+        def fetch():
+            raise NetworkError('down')
+        events = self.pollers.subscribe('user', fetch)
+        self.assertEqual(events.get(timeout=1)[0], 'error')
+        self.pollers.unsubscribe('user', events)
+
+    def test_invalid_credentials_stop_the_poller(self):
+        calls = []
+        def fetch():
+            calls.append(1)
+            raise InvalidCredentialsError()
+        events = self.pollers.subscribe('user', fetch)
+        self.assertEqual(events.get(timeout=1)[0], 'error')
+        self.assertEqual(events.get(timeout=1), ('closed',))
+        time.sleep(0.05)
+        self.assertEqual(len(calls), 1)
+
+        # A new stream, e.g. after signing in again, gets a new poller.
+        second = self.pollers.subscribe('user', self._fetch)
+        self.assertEqual(second.get(timeout=1)[0], 'snapshot')
+        self.pollers.unsubscribe('user', events)
+        self.assertEqual(len(self.pollers), 1)
+        self.pollers.unsubscribe('user', second)
+        self.assertEqual(len(self.pollers), 0)
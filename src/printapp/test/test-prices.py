@@ -0,0 +1,36 @@
+import unittest
+from printapp.prices import PriceIndex
+from printapp.printstatus import PrintJob
+
+PRINTPRICES = [
+    {'name': 'mfd', 'black': 0.0255, 'color': 0.255},
+    {'name': 'laser', 'black': 0.0285, 'color': 0.285}
+]
+
+def make_job(pages, copies, price):
+    return PrintJob(job_id='1', name='doc', pages=pages, copies=copies,
+                    price=price, printer_name='printer', date='')
+
+class TestPriceIndex(unittest.TestCase):
+
+    def test_nearest(self):
+        index = PriceIndex(PRINTPRICES)
+        self.assertEqual(index.nearest(0.26), (0.255, True, 'mfd'))
+        self.assertEqual(index.nearest(0.03), (0.0285, False, 'laser'))
+        self.assertEqual(index.nearest(1.0), (0.285, True, 'laser'))
+        self.assertEqual(index.nearest(0.0), (0.0255, False, 'mfd'))
+        self.assertIsNone(PriceIndex(None).nearest(0.1))
+
+    def test_classify(self):
+        index = PriceIndex(PRINTPRICES)
+        jobs = [make_job(2, 1, 0.51), make_job(5, 2, 0.255),
+                make_job(0, 1, 0.0)]
+        job_infos, totals = index.classify(jobs)
+        self.assertEqual([info['color'] for info in job_infos],
+                         [True, False, False])
+        self.assertEqual(job_infos[1]['printer_class'], 'mfd')
+        self.assertIsNone(job_infos[2]['price_per_page'])
+        self.assertEqual(totals['mfd']['jobs'], 2)
+        self.assertEqual(totals['mfd']['pages'], 12)
+        self.assertAlmostEqual(totals['mfd']['price'], 0.765)
+        self.assertEqual(totals[None]['jobs'], 1)
@@ -0,0 +1,62 @@
+import unittest
+import os
+import json
+import time
+import tempfile
+from printapp.printers import PrinterDirectory
+
+BUILDINGS = [
+    {
+        'id': 'library',
+        'displayName': 'Hekman Library',
+        'printers': [
+            {'name': 'HL102-ITC-LSR1', 'room': '102', 'public': True,
+             'building': 'Hekman Library', 'color': False, 'type': 'Laser'},
+            {'name': 'HL102-ITC-MFDCOLOR', 'room': '102', 'public': True,
+             'building': 'Hekman Library', 'color': True, 'type': 'MFD'},
+            {'name': 'HL106-CIT-MFDCOLOR', 'room': '106', 'public': False,
+             'building': 'Hekman Library', 'color': True, 'type': 'MFD'}
+        ]
+    }
+]
+
+class TestPrinterDirectory(unittest.TestCase):
+
+    def setUp(self):
+        handle, self._filename = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self._write(BUILDINGS)
+        self.directory = PrinterDirectory(self._filename)
+
+    def tearDown(self):
+        os.remove(self._filename)
+
+    def test_get(self):
+        printer = self.directory.get('HL102-ITC-LSR1')
+        self.assertEqual(printer['room'], '102')
+        self.assertEqual(printer['building_id'], 'library')
+        self.assertIsNone(self.directory.get('missing'))
+
+    def test_find(self):
+        self.assertEqual(len(self.directory.find()), 3)
+        self.assertEqual(len(self.directory.find(building_id='library')), 3)
+        printers = self.directory.find(color=True, public=True)
+        self.assertEqual([p['name'] for p in printers], ['HL102-ITC-MFDCOLOR'])
+        self.assertEqual(len(self.directory.find(type='mfd')), 2)
+        self.assertEqual(self.directory.find(building_id='missing'), [])
+
+    def test_reload(self):
+        self.assertIsNotNone(self.directory.get('HL102-ITC-LSR1'))
+        self._write([{'id': 'other', 'printers': []}], mtime=time.time() + 10)
+        self.assertIsNone(self.directory.get('HL102-ITC-LSR1'))
+
+        with open(self._filename, 'w') as f:
+            f.write('not json')
+        os.utime(self._filename, (time.time() + 20, time.time() + 20))
+        self.assertEqual(self.directory.find(), [])
+
+    def _write(self, buildings, mtime=None):
+        with open(self._filename, 'w') as f:
+            json.dump(buildings, f)
+        if mtime is not None:
+            os.utime(self._filename, (mtime, mtime))
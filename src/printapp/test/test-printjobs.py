@@ -0,0 +1,48 @@
+import unittest
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from printapp import app, mongo, printjobs
+
+class TestPrintJobs(unittest.TestCase):
+
+    def setUp(self):
+        self._email = 'test@example.com'
+
+    def test_states(self):
+        with app.app_context():
+            print_id = printjobs.create_print_job(self._email)
+            print_job = printjobs.get_print_job(print_id, self._email)
+            self.assertEqual(print_job['state'], printjobs.QUEUED)
+            self.assertIsNone(printjobs.get_print_job(print_id, 'other@example.com'))
+
+            printjobs.update_print_job(print_id, printjobs.FAILED, 502)
+            print_job = printjobs.get_print_job(print_id, self._email)
+            self.assertEqual(print_job['state'], printjobs.FAILED)
+            self.assertEqual(print_job['status'], 502)
+
+    def test_stale_jobs_fail(self):
+        with app.app_context():
+            print_id = printjobs.create_print_job(self._email)
+            printjobs.update_print_job(print_id, printjobs.SUBMITTING)
+            print_job = printjobs.get_print_job(print_id, self._email,
+                                                stale_after=60)
+            self.assertEqual(print_job['state'], printjobs.SUBMITTING)
+
+            # As if the worker died two minutes ago.
+            mongo.db.printjobs.update(
+                {'_id': ObjectId(print_id)},
+                {'$set': {'updated': datetime.utcnow() - timedelta(minutes=2)}})
+            print_job = printjobs.get_print_job(print_id, self._email,
+                                                stale_after=60)
+            self.assertEqual(print_job['state'], printjobs.FAILED)
+            self.assertEqual(print_job['status'], 504)
+            print_job = printjobs.get_print_job(print_id, self._email)
+            self.assertEqual(print_job['state'], printjobs.SUBMITTING)
+
+            printjobs.update_print_job(print_id, printjobs.DONE)
+            mongo.db.printjobs.update(
+                {'_id': ObjectId(print_id)},
+                {'$set': {'updated': datetime.utcnow() - timedelta(minutes=2)}})
+            print_job = printjobs.get_print_job(print_id, self._email,
+                                                stale_after=60)
+            self.assertEqual(print_job['state'], printjobs.DONE)
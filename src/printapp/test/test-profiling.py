@@ -0,0 +1,32 @@
+import unittest
+import shutil
+import tempfile
+import cProfile
+import printapp
+from printapp import app
+from printapp.profiling import ProfileStore, make_token, _is_valid_token
+
+class TestProfileStore(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_save_and_evict(self):
+        store = ProfileStore(self._directory, max_files=2)
+        for i in range(3):
+            profile = cProfile.Profile()
+            profile.runcall(sum, range(10))
+            store.save(profile, {'endpoint': 'test', 'duration': i})
+
+        profiles = store.load()
+        self.assertEqual([metadata['duration'] for metadata, _ in profiles],
+                         [1, 2])
+
+    def test_token(self):
+        with app.app_context():
+            self.assertTrue(_is_valid_token(make_token()))
+            self.assertFalse(_is_valid_token(make_token() + 'x'))
+            self.assertFalse(_is_valid_token('profile'))
@@ -0,0 +1,88 @@
+import unittest
+import printapp
+from printapp import printstatus
+from printapp.ratelimit import TokenBucketLimiter, BUCKET_TTL
+
+class TestTokenBucketLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.limiter = TokenBucketLimiter(clock=lambda: self.now)
+
+    def test_burst(self):
+        self.assertEqual(self.limiter.acquire('a', 1.0, 2), 0)
+        self.assertEqual(self.limiter.acquire('a', 1.0, 2), 0)
+        self.assertEqual(self.limiter.acquire('a', 1.0, 2), 1.0)
+        self.assertEqual(self.limiter.acquire('b', 1.0, 2), 0)
+
+    def test_refill(self):
+        self.limiter.acquire('a', 2.0, 1)
+        self.now = 0.25
+        self.assertEqual(self.limiter.acquire('a', 2.0, 1), 0.25)
+        self.now = 0.5
+        self.assertEqual(self.limiter.acquire('a', 2.0, 1), 0)
+
+    def test_sweep(self):
+        self.limiter.acquire('a', 1.0, 1)
+        self.now = BUCKET_TTL + 1
+        self.limiter.acquire('b', 1.0, 1)
+        self.assertEqual(self.limiter.acquire('a', 1.0, 1), 0)
+
+def _reject_sign_in(username, password):
+    raise printstatus.InvalidCredentialsError()
+
+class TestRateLimitedEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        printapp.app.config['TESTING'] = True
+        self._get_uniflow_client = printstatus.get_uniflow_client
+        printstatus.get_uniflow_client = _reject_sign_in
+        self._login_ip_limit = printapp.app.config['LOGIN_IP_RATE_LIMIT']
+
+    def tearDown(self):
+        printstatus.get_uniflow_client = self._get_uniflow_client
+        printapp.app.config['LOGIN_IP_RATE_LIMIT'] = self._login_ip_limit
+
+    def test_login_limit(self):
+        requests_per_minute, burst = printapp.app.config['RATE_LIMITS']['login']
+        with printapp.app.test_client() as app:
+            form_data = {'email': 'ratelimit@example.com', 'password': 'invalid'}
+            environ = {'REMOTE_ADDR': '192.0.2.1'}
+            for i in range(burst):
+                response = app.post('/api/login', data=form_data,
+                                    environ_base=environ)
+                self.assertEqual(response.status_code, 401)
+            response = app.post('/api/login', data=form_data,
+                                environ_base=environ)
+            self.assertEqual(response.status_code, 429)
+            self.assertGreater(int(response.headers['Retry-After']), 0)
+
+    def test_login_limit_across_addresses(self):
+        requests_per_minute, burst = printapp.app.config['RATE_LIMITS']['login']
+        with printapp.app.test_client() as app:
+            form_data = {'email': 'ratelimit-moving@example.com',
+                         'password': 'invalid'}
+            for i in range(burst):
+                response = app.post('/api/login', data=form_data, environ_base={
+                    'REMOTE_ADDR': '198.51.100.{}'.format(i)})
+                self.assertEqual(response.status_code, 401)
+            response = app.post('/api/login', data=form_data,
+                                environ_base={'REMOTE_ADDR': '198.51.100.99'})
+            self.assertEqual(response.status_code, 429)
+
+    def test_login_ip_limit(self):
+        printapp.app.config['LOGIN_IP_RATE_LIMIT'] = (1, 3)
+        with printapp.app.test_client() as app:
+            environ = {'REMOTE_ADDR': '192.0.2.2'}
+            for i in range(3):
+                response = app.post('/api/login', environ_base=environ, data={
+                    'email': 'ratelimit{}@example.com'.format(i),
+                    'password': 'invalid'})
+                self.assertEqual(response.status_code, 401)
+            response = app.post('/api/login', environ_base=environ, data={
+                'email': 'ratelimit3@example.com', 'password': 'invalid'})
+            self.assertEqual(response.status_code, 429)
+            response = app.post('/api/login', data={
+                'email': 'ratelimit3@example.com', 'password': 'invalid'},
+                environ_base={'REMOTE_ADDR': '192.0.2.3'})
+            self.assertEqual(response.status_code, 401)
@@ -1,6 +1,10 @@
 import unittest
 import os
+import time
+import threading
 from printapp.printstatus import *
+from printapp.printstatus import _ClientPool, _parse_print_queue
+from printapp.benchmark import pages
 
 class TestPrintQueue(unittest.TestCase):
 
@@ -22,6 +26,12 @@ class TestPrintQueue(unittest.TestCase):
         uc.get_print_queue()
         uc.get_print_queue()
 
+    def test_budget_and_queue(self):
+        uc = get_uniflow_client(self.username, self.password)
+        budget, queue = uc.get_budget_and_print_queue()
+        self.assertIsInstance(budget, float)
+        self.assertIsInstance(queue, list)
+
     def test_invalid_credentials(self):
         self.assertRaises(InvalidCredentialsError, get_uniflow_client,
                           'invalidUser', 'invalidPassword')
@@ -33,3 +43,117 @@ class TestPrintQueue(unittest.TestCase):
                           'invalidUser', '')
         self.assertRaises(InvalidCredentialsError, get_uniflow_client,
                           '', 'invalidPassword')
+
+    def test_pooled_client(self):
+        uc = get_uniflow_client(self.username, self.password)
+        self.assertIs(uc, get_uniflow_client(self.username, self.password))
+        self.assertRaises(InvalidCredentialsError, get_uniflow_client,
+                          self.username, 'invalidPassword')
+        discard_uniflow_client(self.username)
+        self.assertIsNot(uc, get_uniflow_client(self.username, self.password))
+
+
+class _FakeClient:
+    def __init__(self, username, password):
+        self.username = username
+        self.password = password
+        self.is_valid = True
+
+    def has_credentials(self, username, password):
+        return self.username == username and self.password == password
+
+
+class _RejectingClient(_FakeClient):
+    def __init__(self, username, password):
+        if password == 'wrong':
+            raise InvalidCredentialsError()
+        _FakeClient.__init__(self, username, password)
+
+
+class _SlowClient(_FakeClient):
+    created = 0
+
+    def __init__(self, username, password):
+        time.sleep(0.05)
+        _SlowClient.created += 1
+        _FakeClient.__init__(self, username, password)
+
+
+class TestClientPool(unittest.TestCase):
+
+    def test_reuse(self):
+        pool = _ClientPool(max_size=10, idle_ttl=60, factory=_FakeClient)
+        client = pool.get('a', 'password')
+        self.assertIs(client, pool.get('a', 'password'))
+        self.assertIsNot(client, pool.get('a', 'other password'))
+        self.assertEqual(len(pool), 1)
+
+    def test_invalid_client_is_replaced(self):
+        pool = _ClientPool(max_size=10, idle_ttl=60, factory=_FakeClient)
+        client = pool.get('a', 'password')
+        client.is_valid = False
+        self.assertIsNot(client, pool.get('a', 'password'))
+
+    def test_failed_sign_in_keeps_client(self):
+        pool = _ClientPool(max_size=10, idle_ttl=60, factory=_RejectingClient)
+        client = pool.get('a', 'password')
+        self.assertRaises(InvalidCredentialsError, pool.get, 'a', 'wrong')
+        self.assertIs(client, pool.get('a', 'password'))
+
+    def test_concurrent_sign_ins(self):
+        _SlowClient.created = 0
+        pool = _ClientPool(max_size=10, idle_ttl=60, factory=_SlowClient)
+        threads = [threading.Thread(target=pool.get, args=('a', 'password'))
+                   for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(_SlowClient.created, 1)
+        self.assertEqual(pool._sign_in_locks, {})
+
+    def test_lru_eviction(self):
+        pool = _ClientPool(max_size=2, idle_ttl=60, factory=_FakeClient)
+        a = pool.get('a', 'password')
+        pool.get('b', 'password')
+        pool.get('a', 'password')
+        pool.get('c', 'password')
+        self.assertEqual(len(pool), 2)
+        self.assertIs(a, pool.get('a', 'password'))
+        self.assertEqual(len(pool), 2)
+
+    def test_idle_ttl(self):
+        pool = _ClientPool(max_size=10, idle_ttl=0, factory=_FakeClient)
+        client = pool.get('a', 'password')
+        time.sleep(0.01)
+        self.assertIsNot(client, pool.get('a', 'password'))
+
+
+class TestQueueParser(unittest.TestCase):
+
+    def test_parse_print_queue(self):
+        jobs = pages.make_print_jobs(25)
+        print_jobs = _parse_print_queue(pages.make_queue_page(jobs))
+        self.assertEqual(len(print_jobs), 25)
+        for job, print_job in zip(jobs, print_jobs):
+            self.assertEqual(print_job.job_id, job['job_id'])
+            self.assertEqual(print_job.name, job['name'])
+            self.assertEqual(print_job.pages, job['pages'])
+            self.assertEqual(print_job.copies, job['copies'])
+            self.assertAlmostEqual(print_job.price, job['price'], places=4)
+            self.assertEqual(print_job.printer_name, job['printer'])
+            self.assertEqual(print_job.date, job['date'])
+
+    def test_empty_queue(self):
+        self.assertEqual(_parse_print_queue(pages.make_queue_page([])), [])
+        self.assertEqual(_parse_print_queue('<html><title>a</title></html>'), [])
+
+    def test_scraping_errors(self):
+        self.assertRaises(ScrapingError, _parse_print_queue, '<html></html>')
+        page = pages.make_queue_page(pages.make_print_jobs(3))
+        self.assertRaises(ScrapingError, _parse_print_queue,
+                          page.replace('c_OnSelectJob', 'c_OnSelect'))
+        self.assertRaises(ScrapingError, _parse_print_queue,
+                          page.replace('<td class="Middle">Waiting</td>',
+                                       '<td class="Middle">Waiting</td>'
+                                       '<td class="Middle">x</td>', 1))
@@ -1,6 +1,39 @@
 from pymongo import MongoClient
-from flask import request, session
+import time
+from flask import request, session, g
 from printapp import app
+import deadline
+import metrics
+
+@app.before_request
+def start_request_deadline():
+    deadline.start(app.config['REQUEST_DEADLINE'])
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.time()
+
+@app.after_request
+def save_response_status(response):
+    g.response_status = response.status_code
+    return response
+
+@app.teardown_request
+def record_request_duration(exception=None):
+    # Unhandled exceptions skip after_request, and are answered with a 500.
+    start = getattr(g, 'request_start', None)
+    if start is not None:
+        status = getattr(g, 'response_status', 500)
+        if exception is not None:
+            status = 500
+        metrics.REQUEST_DURATION.observe(time.time() - start,
+                                         endpoint=request.endpoint,
+                                         method=request.method,
+                                         status=status)
+
+@app.teardown_request
+def clear_request_deadline(exception=None):
+    deadline.clear()
 
 def get_current_user_credentials():
     """Returns the email and password of the currently signed in user.
@@ -15,3 +48,9 @@ def get_current_user_credentials():
         raise ValueError('No session cookie found.')
 
     return email, password
+
+def is_stats_client():
+    """Returns True if the current request comes from an address in the
+    STATS_ALLOWED_IPS setting, which may read the app's statistics.
+    """
+    return request.remote_addr in app.config['STATS_ALLOWED_IPS']
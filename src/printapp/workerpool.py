@@ -0,0 +1,42 @@
+"""Bounded pools of worker threads for running blocking calls in parallel.
+"""
+import threading
+from multiprocessing.pool import ThreadPool
+import deadline
+
+
+class WorkerPool(object):
+    """A fixed number of worker threads, started on first use.
+
+    Work submitted while every thread is busy waits in a queue, so the pool
+    bounds how many calls run at once.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """Runs `func(*args, **kwargs)` in a worker thread.
+
+        Returns an AsyncResult. Its `get()` method waits for the call to
+        finish and returns its result, or raises the exception it raised.
+        The call keeps the deadline of the calling thread.
+        """
+        return self._get_pool().apply_async(deadline.bind(func), args, kwargs)
+
+    def resize(self, size):
+        """Changes the number of threads. Running work is not interrupted.
+        """
+        with self._lock:
+            self.size = size
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPool(self.size)
+            return self._pool
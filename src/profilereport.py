@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# Summarizes the request profiles written by `printapp/profiling.py`.
+#
+# Prints the number of profiles and their mean and slowest durations per
+# endpoint, then the functions with the most time of their own and the most
+# cumulative time across all profiles (or those of one endpoint).
+#
+# `profilereport.py token` prints a value for the X-Profile header, which has
+# a request profiled even when it is not sampled.
+
+import sys
+import pstats
+from printapp import app
+from printapp import profiling
+
+
+def summarize(profiles, out=sys.stdout):
+    """Prints the count, mean and slowest duration of the profiles of each
+    endpoint.
+    """
+    durations = {}
+    for metadata, filename in profiles:
+        durations.setdefault(metadata.get('endpoint'), []).append(
+            metadata['duration'])
+
+    out.write('{:<30} {:>8} {:>10} {:>10}\n'.format('endpoint', 'profiles',
+                                                    'mean ms', 'max ms'))
+    for endpoint, values in sorted(durations.items(),
+                                   key=lambda item: -sum(item[1])):
+        out.write('{:<30} {:>8} {:>10.1f} {:>10.1f}\n'.format(
+            endpoint, len(values), 1000 * sum(values) / len(values),
+            1000 * max(values)))
+
+
+def report_hot_functions(profiles, top, out=sys.stdout):
+    """Prints the `top` functions by own time and by cumulative time,
+    across all of the profiles.
+    """
+    stats = pstats.Stats(*[filename for metadata, filename in profiles],
+                         stream=out)
+    stats.strip_dirs()
+    for sort_key in ('tottime', 'cumulative'):
+        out.write('\nTop {} functions by {}:\n'.format(top, sort_key))
+        stats.sort_stats(sort_key).print_stats(top)
+
+
+def main(directory, top=20, endpoint=None):
+    store = profiling.ProfileStore(directory, app.config['PROFILE_MAX_FILES'])
+    profiles = store.load()
+    if endpoint is not None:
+        profiles = [profile for profile in profiles
+                    if profile[0].get('endpoint') == endpoint]
+    if not profiles:
+        print 'No profiles found in {}'.format(directory)
+        return
+
+    summarize(profiles)
+    report_hot_functions(profiles, top)
+
+
+if __name__ == '__main__':
+    usage = ('Usage: {0} [directory] [top] [endpoint]\n'
+             '       {0} token').format(sys.argv[0])
+    if sys.argv[1:] == ['token']:
+        with app.app_context():
+            print profiling.make_token()
+    elif len(sys.argv) > 4:
+        print usage
+    else:
+        directory = sys.argv[1] if len(sys.argv) > 1 else app.config['PROFILE_DIR']
+        top = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+        endpoint = sys.argv[3] if len(sys.argv) > 3 else None
+        main(directory, top, endpoint)
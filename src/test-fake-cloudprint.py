@@ -0,0 +1,119 @@
+import unittest
+import time
+from StringIO import StringIO
+import fakecloudprint
+from printapp import client, auth, cloudprint, httpsessions, api
+
+class TestFakeCloudPrint(unittest.TestCase):
+
+    def setUp(self):
+        self._cloudprint = fakecloudprint.FakeCloudPrint(processing_delay=0)
+        self._server = fakecloudprint.start_server(self._cloudprint)
+        self._base_url = client.CLOUDPRINT_URL
+        client.set_base_url(self._server.url)
+        self._auth = auth.OAuth2(access_token='unittest', token_type='Bearer')
+
+    def tearDown(self):
+        client.set_base_url(self._base_url)
+        self._server.shutdown()
+        self._server.server_close()
+        httpsessions.close_connections()
+
+    def test_search(self):
+        printers = client.list_printers(auth=self._auth)['printers']
+        self.assertIn(cloudprint.UNIFLOW_ID,
+                      [printer['id'] for printer in printers])
+
+        oauth = auth.OAuth2(access_token='noprinter', token_type='Bearer')
+        printers = client.list_printers(auth=oauth)['printers']
+        self.assertNotIn(cloudprint.UNIFLOW_ID,
+                         [printer['id'] for printer in printers])
+
+    def test_submit_list_and_delete(self):
+        content = ('test.txt', StringIO('test'))
+        job = client.submit_job(cloudprint.UNIFLOW_ID, content, '{}',
+                                auth=self._auth)['job']
+        self.assertEqual(job['status'], fakecloudprint.DONE)
+        self.assertEqual(job['fileSize'], '4')
+
+        jobs = client.list_jobs(auth=self._auth)['jobs']
+        self.assertEqual([job['id']], [listed['id'] for listed in jobs])
+        self.assertEqual(client.list_jobs(printer='other',
+                                          auth=self._auth)['jobs'], [])
+
+        self.assertTrue(client.delete_job(job['id'], auth=self._auth)['success'])
+        self.assertFalse(client.delete_job(job['id'], auth=self._auth)['success'])
+        self.assertEqual(client.list_jobs(auth=self._auth)['jobs'], [])
+
+    def test_failed_jobs(self):
+        self._cloudprint.failure_rate = 1
+        content = ('test.txt', StringIO('test'))
+        job = client.submit_job(cloudprint.UNIFLOW_ID, content, '{}',
+                                auth=self._auth)['job']
+        self.assertEqual(job['status'], fakecloudprint.ERROR)
+
+    def test_missing_token(self):
+        response = client.list_printers()
+        self.assertEqual(response.status_code, 403)
+
+    def test_wait_for_job_processing(self):
+        content = ('test.txt', StringIO('test'))
+        job = client.submit_job(cloudprint.UNIFLOW_ID, content, '{}',
+                                auth=self._auth)['job']
+        start = time.time()
+        cloudprint._wait_for_job_processing(self._auth, job['id'])
+        self.assertLess(time.time() - start, 1)
+
+        self._cloudprint.failure_rate = 1
+        job = client.submit_job(cloudprint.UNIFLOW_ID, content, '{}',
+                                auth=self._auth)['job']
+        with self.assertRaises(cloudprint.JobSubmissionError):
+            cloudprint._wait_for_job_processing(self._auth, job['id'])
+
+    def test_unreachable(self):
+        self._server.shutdown()
+        self._server.server_close()
+        httpsessions.close_connections()
+        document = StringIO('test')
+        document.name = 'test.txt'
+        with self.assertRaises(cloudprint.UpstreamTimeoutError):
+            cloudprint.submit_job('unittest', document)
+        with self.assertRaises(cloudprint.UpstreamTimeoutError):
+            cloudprint._wait_for_job_processing(self._auth, 'unittest')
+
+    def test_connections_are_reused(self):
+        for i in range(5):
+            client.list_printers(auth=self._auth)
+        host = self._server.url.rsplit('/', 1)[0]
+        pool = httpsessions.stats()[host]
+        self.assertEqual(pool['connections'], 1)
+        self.assertGreaterEqual(pool['requests'], 5)
+        self.assertEqual(pool['idle'], 1)
+
+    def test_has_uniflow_printer(self):
+        self.assertTrue(cloudprint.has_uniflow_printer('unittest'))
+        self.assertFalse(cloudprint.has_uniflow_printer('noprinter'))
+
+        self._cloudprint.error_rate = 1
+        with self.assertRaises(cloudprint.UpstreamError):
+            cloudprint.has_uniflow_printer('unittest')
+
+        self._server.shutdown()
+        self._server.server_close()
+        httpsessions.close_connections()
+        with self.assertRaises(cloudprint.UpstreamTimeoutError):
+            cloudprint.has_uniflow_printer('unittest')
+
+    def test_printer_cache(self):
+        email = 'unittest@students.calvin.edu'
+        api._printer_cache.invalidate(email)
+        self.assertTrue(api._has_uniflow_printer(email, 'unittest'))
+        count = self._cloudprint.request_count
+        self.assertTrue(api._has_uniflow_printer(email, 'unittest'))
+        self.assertEqual(self._cloudprint.request_count, count)
+
+        # A new token looks for the printer again.
+        self.assertFalse(api._has_uniflow_printer(email, 'unittest-noprinter'))
+        self.assertFalse(api._has_uniflow_printer(email, 'unittest-noprinter'))
+        self.assertEqual(self._cloudprint.request_count, count + 2)
+        api._printer_cache.invalidate(email)